@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: N lượt trích xuất song song bằng EnhancedScraper
+
+Chạy một server aiohttp cục bộ có độ trễ giả lập, rồi so sánh thời gian
+của 1 lượt trích xuất với N lượt chạy đồng thời. Với scraper không chặn
+event loop, N lượt song song phải xong trong khoảng thời gian của 1 lượt.
+
+Chạy: python -m benchmarks.bench_enhanced_scraper [N]
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from aiohttp import web
+from config import Config
+from scrapers.enhanced_scraper import EnhancedScraper
+
+PAGE_DELAY = 0.5
+
+PAGE_HTML = """
+<html><body>
+<iframe src="https://streamtape.com/e/abc123"></iframe>
+<script>var player = {file: "https://cdn.example.com/hls/720p/index.m3u8"};</script>
+<a href="https://cdn.example.com/movie_1080p.mp4">Tải về</a>
+</body></html>
+"""
+
+async def page_handler(request: web.Request) -> web.Response:
+    """Trang phim giả lập với độ trễ cố định"""
+    await asyncio.sleep(PAGE_DELAY)
+    if request.path.endswith(('/embed', '/player', '/stream')):
+        return web.Response(status=404)
+    return web.Response(text=PAGE_HTML, content_type='text/html')
+
+async def run_extractions(base_url: str, count: int, mode: str) -> float:
+    """Chạy `count` lượt trích xuất đồng thời, trả về thời gian (giây)"""
+    async def one(i: int):
+        async with EnhancedScraper(mode=mode) as scraper:
+            return await scraper.extract_all_streams(f"{base_url}/phim-{i}")
+    
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - start
+    assert all(results), "Có lượt trích xuất không tìm thấy link"
+    return elapsed
+
+async def main(count: int):
+    logging.disable(logging.WARNING)
+    Config.ENHANCED_REQUEST_DELAY = 0.2
+    # Mỗi lượt có tối đa 1 + len(COMMON_HOST_SUFFIXES) fetch blocking đồng thời
+    Config.ENHANCED_EXECUTOR_WORKERS = count * (1 + len(EnhancedScraper.COMMON_HOST_SUFFIXES))
+    
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', page_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+    
+    try:
+        for mode in (EnhancedScraper.MODE_ASYNC, EnhancedScraper.MODE_EXECUTOR):
+            single = await run_extractions(base_url, 1, mode)
+            parallel = await run_extractions(base_url, count, mode)
+            print(f"[{mode}] 1 lượt: {single:.2f}s | {count} lượt song song: {parallel:.2f}s "
+                  f"(tỉ lệ {parallel / single:.2f}x)")
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: parse trang kiểu tvhay bằng cây BeautifulSoup đầy đủ (cách cũ:
+dựng cây rồi find_all từng loại thẻ) so với các backend parse một phần
+
+Mỗi cách chạy trong một process riêng để đo bộ nhớ đỉnh: tracemalloc cho heap
+Python và ru_maxrss cho cả process (gồm bộ nhớ C của libxml2).
+
+Chạy: python -m benchmarks.bench_html_elements
+"""
+
+import multiprocessing
+import resource
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+from utils.html_elements import available_backends, parse_elements
+
+REPEAT = 5
+
+def build_page(cards: int) -> str:
+    """Trang phim giả lập: menu, lưới phim, bình luận, vài iframe player và script"""
+    parts = [
+        '<!DOCTYPE html><html lang="vi"><head><meta charset="utf-8"><title>Phim hay</title>',
+        ''.join(f'<link rel="stylesheet" href="/static/css/{i}.css">' for i in range(20)),
+        '<script>window.dataLayer=window.dataLayer||[];function gtag(){dataLayer.push(arguments);}</script>',
+        '</head><body><nav><ul>',
+        ''.join(f'<li class="menu-item"><a href="/the-loai/{i}">Thể loại {i}</a></li>' for i in range(80)),
+        '</ul></nav><main><div class="player">',
+        '<iframe src="https://streamtape.com/e/abc123" allowfullscreen></iframe>',
+        '<iframe src="//player.example.com/embed/xyz"></iframe>',
+        '<video controls><source src="https://cdn.example.com/hls/720p/index.m3u8" type="application/x-mpegURL"></video>',
+        '<script>var player = {file: "https://cdn.example.com/hls/1080p/index.m3u8", '
+        'sources: [{file: "https://cdn.example.com/movie_720p.mp4"}]};</script>',
+        '</div><div class="list-film">',
+    ]
+    for i in range(cards):
+        parts.append(
+            f'<div class="item"><a href="/phim/phim-so-{i}.html" title="Phim số {i}">'
+            f'<img src="/poster/{i}.jpg" alt="Phim số {i}" loading="lazy">'
+            f'<span class="label">HD Vietsub</span><span class="views">{i * 37} lượt xem</span></a>'
+            f'<div class="info"><h3>Phim số {i}</h3><p>Mô tả ngắn của phim số {i}, '
+            f'diễn viên, đạo diễn và năm phát hành.</p></div></div>'
+        )
+    parts.append('</div><div class="comments">')
+    for i in range(cards // 2):
+        parts.append(f'<div class="comment"><b>user{i}</b><p>Phim hay quá, cảm ơn admin! #{i}</p></div>')
+    parts.append('</div><a href="https://cdn.example.com/movie_1080p.mp4">Tải về</a></main></body></html>')
+    return ''.join(parts)
+
+def full_soup(html: str) -> int:
+    """Cách cũ: cây BeautifulSoup + find_all video/source/iframe/a + script"""
+    soup = BeautifulSoup(html, 'lxml')
+    count = 0
+    for name in ('video', 'source', 'iframe'):
+        count += sum(1 for tag in soup.find_all(name) if tag.get('src'))
+    count += len(soup.find_all('a', href=True))
+    count += sum(1 for script in soup.find_all('script') if script.string)
+    return count
+
+def measure(name: str, html: str, queue):
+    """Chạy trong process con: thời gian trung bình, bộ nhớ đỉnh và số thẻ"""
+    if name == 'full soup':
+        run = full_soup
+    else:
+        def run(page: str) -> int:
+            elements = parse_elements(page, name)
+            return (sum(1 for element in elements.videos + elements.sources + elements.iframes
+                        if element.get('src'))
+                    + len(elements.anchors) + len(elements.scripts))
+    
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    count = run(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        run(html)
+    elapsed = (time.perf_counter() - start) / REPEAT
+    queue.put((count, elapsed, peak, rss_after - rss_before))
+
+def main():
+    context = multiprocessing.get_context('spawn')
+    for cards in (500, 5000):
+        html = build_page(cards)
+        print(f"=== {cards} phim, {len(html.encode()) / 1024:.0f} KB ===")
+        
+        counts = set()
+        for name in ['full soup'] + available_backends():
+            queue = context.Queue()
+            process = context.Process(target=measure, args=(name, html, queue))
+            process.start()
+            count, elapsed, peak, rss = queue.get()
+            process.join()
+            counts.add(count)
+            print(f"  {name:12s} {elapsed * 1000:8.1f} ms   heap đỉnh {peak / 1024 / 1024:6.1f} MB   "
+                  f"RSS tăng {rss / 1024:6.1f} MB   ({count} thẻ)")
+        assert len(counts) == 1, f"Các backend trả số thẻ khác nhau: {counts}"
+
+if __name__ == '__main__':
+    main()
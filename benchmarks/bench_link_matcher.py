@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark: LinkMatcher (pattern compile sẵn, lowercase tài liệu một lần)
+so với vòng lặp `re.findall(..., re.IGNORECASE)` theo từng pattern như trước đây
+
+Chạy: python -m benchmarks.bench_link_matcher
+"""
+
+import random
+import re
+import time
+from utils.link_matcher import get_matcher
+
+# Bộ pattern cũ của EnhancedScraper._extract_with_trafilatura
+LEGACY_ENHANCED_RAW = [
+    r'(https?://[^\s"\'<>]+\.(?:mp4|m3u8|mkv|avi|mov|wmv|flv|webm)(?:\?[^\s"\'<>]*)?)',
+    r'(https?://(?:www\.)?streamtape\.com/[^\s"\'<>]+)',
+    r'(https?://(?:www\.)?doodstream\.com/[^\s"\'<>]+)',
+    r'(https?://(?:www\.)?mixdrop\.co/[^\s"\'<>]+)',
+    r'(https?://(?:www\.)?upstream\.to/[^\s"\'<>]+)',
+    r'(https?://(?:www\.)?filesupload\.org/[^\s"\'<>]+)',
+    r'(https?://(?:www\.)?streamlare\.com/[^\s"\'<>]+)',
+    r'(https?://(?:www\.)?supervideo\.tv/[^\s"\'<>]+)',
+    r'(?:player|embed|iframe)[^"\']*["\']([^"\']*(?:\.mp4|\.m3u8|streamtape|doodstream|mixdrop)[^"\']*)["\']',
+    r'(?:src|url|file)[^"\']*["\']([^"\']*(?:\.mp4|\.m3u8|streamtape|doodstream|mixdrop)[^"\']*)["\']',
+    r'(?:data-src|data-url)[^"\']*["\']([^"\']+)["\']',
+]
+
+# Bộ pattern cũ của EnhancedScraper._extract_with_requests
+LEGACY_ENHANCED_ADVANCED = [
+    r'(?:videoUrl|streamUrl|playerUrl|fileUrl)\s*[=:]\s*["\']([^"\']+)["\']',
+    r'(?:src|source|url|file)\s*[=:]\s*["\']([^"\']*(?:\.mp4|\.m3u8|streamtape|doodstream|mixdrop)[^"\']*)["\']',
+    r'"(?:url|src|file|source)"\s*:\s*"([^"]+)"',
+    r"'(?:url|src|file|source)'\s*:\s*'([^']+)'",
+    r'<iframe[^>]+src=["\']([^"\']+)["\'][^>]*>',
+    r'<video[^>]+src=["\']([^"\']+)["\'][^>]*>',
+    r'<source[^>]+src=["\']([^"\']+)["\'][^>]*>',
+    r'(https?://[^\s"\'<>()]+\.(?:mp4|m3u8|mkv|avi|mov)(?:\?[^\s"\'<>()]*)?)',
+    r'(https?://(?:[a-zA-Z0-9-]+\.)?(?:streamtape|doodstream|mixdrop|upstream|filesupload|streamlare|supervideo)\.(?:com|co|tv|org)/[^\s"\'<>()]+)',
+]
+
+FILLER = [
+    '<div class="movie-item"><a href="/phim/ten-phim-{n}">Phim {n}</a><img src="/img/{n}.jpg"></div>\n',
+    '<p>Nội dung mô tả phim số {n}, diễn viên, đạo diễn, năm sản xuất...</p>\n',
+    '<script>var cfg{n} = {{"id": {n}, "title": "Tập {n}", "thumb": "/t/{n}.png"}};</script>\n',
+    '<li class="episode"><a href="/xem/{n}" title="Tập {n}">Tập {n}</a></li>\n',
+]
+
+LINKS = [
+    '<iframe src="https://streamtape.com/e/{n}abc" allowfullscreen></iframe>\n',
+    '<script>player.setup({{file: "https://cdn.example.com/hls/{n}/720p/index.m3u8"}});</script>\n',
+    '<a href="https://cdn.example.com/video_{n}_1080p.mp4">Tải về</a>\n',
+    '<video src="https://media.example.com/{n}.mp4"></video>\n',
+    '<div data-src="https://doodstream.com/e/{n}xyz"></div>\n',
+]
+
+def build_page(size_bytes: int, seed: int = 42) -> str:
+    """Tạo trang HTML giả lập khoảng `size_bytes` bytes"""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    n = 0
+    while total < size_bytes:
+        n += 1
+        template = rng.choice(LINKS) if rng.random() < 0.02 else rng.choice(FILLER)
+        chunk = template.format(n=n)
+        parts.append(chunk)
+        total += len(chunk)
+    return '<html><body>\n' + ''.join(parts) + '</body></html>'
+
+def legacy_scan(patterns, text: str):
+    """Vòng lặp cũ: re.findall cho từng pattern"""
+    urls = []
+    for pattern in patterns:
+        for match in re.findall(pattern, text, re.IGNORECASE | re.MULTILINE):
+            if isinstance(match, tuple):
+                match = match[0]
+            urls.append(match)
+    return urls
+
+def timed(func, *args, repeat: int = 3):
+    """Thời gian tốt nhất sau `repeat` lần chạy"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    for profile, legacy in (('enhanced_raw', LEGACY_ENHANCED_RAW),
+                            ('enhanced_advanced', LEGACY_ENHANCED_ADVANCED)):
+        matcher = get_matcher(profile)
+        print(f"=== Profile {profile} ({len(legacy)} pattern cũ) ===")
+        for size_mb in (1, 3, 5):
+            page = build_page(size_mb * 1024 * 1024)
+            legacy_time, legacy_urls = timed(legacy_scan, legacy, page)
+            matcher_time, matcher_urls = timed(matcher.urls, page)
+            missing = set(legacy_urls) - set(matcher_urls)
+            print(f"{size_mb} MB: cũ {legacy_time * 1000:.1f} ms | matcher {matcher_time * 1000:.1f} ms "
+                  f"| nhanh hơn {legacy_time / matcher_time:.2f}x "
+                  f"| URL: {len(set(legacy_urls))} / {len(set(matcher_urls))} (thiếu {len(missing)})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: theo dõi live playlist bằng LivePlaylistTracker (chỉ parse phần
+mới) so với parse lại cả playlist ở mỗi lần poll
+
+Chạy: python -m benchmarks.bench_live_playlist
+"""
+
+import time
+from utils.live_playlist import LivePlaylistTracker
+from utils.m3u8_parser import parse_m3u8
+
+def build_window(first: int, size: int) -> bytes:
+    """Live playlist với cửa sổ `size` segment bắt đầu từ sequence `first`"""
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        '#EXT-X-TARGETDURATION:2',
+        f'#EXT-X-MEDIA-SEQUENCE:{first}',
+        '#EXT-X-KEY:METHOD=AES-128,URI="https://keys.example.com/live/k"',
+    ]
+    for sequence in range(first, first + size):
+        lines.append('#EXTINF:2.000,')
+        lines.append(f'https://cdn.example.com/live/chunk_{sequence:08d}.ts?token=abcdef0123456789')
+    return ('\n'.join(lines) + '\n').encode()
+
+def full_reparse(bodies):
+    """Cách cũ: parse lại cả playlist, tự so sequence để tìm segment mới"""
+    last_sequence = None
+    new_segments = 0
+    for body in bodies:
+        playlist = parse_m3u8(body)
+        for segment in playlist.segments:
+            if last_sequence is None or segment.sequence > last_sequence:
+                new_segments += 1
+                last_sequence = segment.sequence
+    return new_segments
+
+def tracked(bodies):
+    """Tracker: header + đếm các segment đã thấy, chỉ parse phần mới"""
+    tracker = LivePlaylistTracker('https://cdn.example.com/live/index.m3u8', window=64)
+    new_segments = 0
+    for body in bodies:
+        new_segments += len(tracker.apply(body))
+    return new_segments
+
+def main():
+    polls = 300
+    for size in (30, 300, 3000):
+        bodies = [build_window(1000 + poll, size) for poll in range(polls)]
+        expected = size + polls - 1
+        
+        results = {}
+        for name, func in (('parse lại', full_reparse), ('tracker', tracked)):
+            start = time.perf_counter()
+            assert func(bodies) == expected
+            results[name] = time.perf_counter() - start
+        
+        print(f"=== cửa sổ {size} segment, {polls} lần poll ===")
+        for name, elapsed in results.items():
+            print(f"{name:9}: {elapsed * 1000:8.1f} ms | {elapsed / polls * 1e6:8.1f} µs/poll")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: parser M3U8 dạng streaming (bảng segment theo cột) so với cách
+parse thường gặp (đọc cả file, splitlines, một dict cho mỗi segment) trên
+playlist VOD lớn
+
+Chạy: python -m benchmarks.bench_m3u8_parser
+"""
+
+import gc
+import time
+import tracemalloc
+from utils.m3u8_parser import parse_m3u8
+
+CHUNK_SIZE = 64 * 1024
+
+def build_playlist(segments: int) -> bytes:
+    """Tạo media playlist VOD với `segments` segment (có KEY, MAP, BYTERANGE)"""
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:7',
+        '#EXT-X-TARGETDURATION:6',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+        '#EXT-X-MAP:URI="init.mp4",BYTERANGE="720@0"',
+    ]
+    for index in range(segments):
+        if index % 1000 == 0:
+            lines.append(f'#EXT-X-KEY:METHOD=AES-128,URI="https://keys.example.com/k/{index // 1000}",'
+                         f'IV=0x{index:032x}')
+        lines.append('#EXTINF:6.006,')
+        if index % 2:
+            lines.append(f'#EXT-X-BYTERANGE:1048576@{index * 1048576}')
+            lines.append('video_1080p.mp4')
+        else:
+            lines.append(f'https://cdn.example.com/vod/title/1080p/segment_{index:06d}.ts?token=abcdef0123456789')
+    lines.append('#EXT-X-ENDLIST')
+    return ('\n'.join(lines) + '\n').encode()
+
+def naive_parse(data: bytes):
+    """Cách parse cũ: decode cả file, một dict cho mỗi segment"""
+    segments = []
+    pending = {}
+    key = None
+    for line in data.decode().splitlines():
+        line = line.strip()
+        if line.startswith('#EXTINF:'):
+            pending['duration'] = float(line[8:].split(',')[0])
+        elif line.startswith('#EXT-X-BYTERANGE:'):
+            pending['byterange'] = line[17:]
+        elif line.startswith('#EXT-X-KEY:'):
+            key = dict(item.split('=', 1) for item in line[11:].split(','))
+        elif line and not line.startswith('#'):
+            pending['uri'] = line
+            pending['key'] = key
+            segments.append(pending)
+            pending = {}
+    return segments
+
+def streamed_parse(data: bytes):
+    """Parser mới, nhận dữ liệu theo chunk như khi đọc từ response"""
+    return parse_m3u8(data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE))
+
+def measure(func, data: bytes, repeat: int = 3):
+    """(thời gian tốt nhất, peak memory khi parse, memory còn giữ sau parse)"""
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start)
+    
+    gc.collect()
+    tracemalloc.start()
+    result = func(data)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, peak, retained
+
+def main():
+    for segments in (10_000, 50_000, 100_000):
+        data = build_playlist(segments)
+        playlist = streamed_parse(data)
+        assert len(playlist.segments) == segments == len(naive_parse(data))
+        
+        naive_time, naive_peak, naive_retained = measure(naive_parse, data)
+        parser_time, parser_peak, parser_retained = measure(streamed_parse, data)
+        
+        print(f"=== {segments} segment ({len(data) / 1024 / 1024:.1f} MB) ===")
+        print(f"cũ    : {naive_time * 1000:7.1f} ms | peak {naive_peak / 1024 / 1024:6.1f} MB "
+              f"| giữ lại {naive_retained / 1024 / 1024:6.1f} MB")
+        print(f"parser: {parser_time * 1000:7.1f} ms | peak {parser_peak / 1024 / 1024:6.1f} MB "
+              f"| giữ lại {parser_retained / 1024 / 1024:6.1f} MB "
+              f"| {len(data) / parser_time / 1024 / 1024:.0f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,10 @@ from pyrogram.types import Message
 import logging
 from config import Config, Messages
 from bot.handlers import BotHandlers
+from utils.cpu_pool import get_cpu_pool, shutdown_cpu_pool
+from utils.hls_relay import HlsRelay
+from utils.http_client import HttpClient
+from utils.loop_monitor import LoopLagMonitor
 
 class StreamBot:
     """Lớp bot chính"""
@@ -29,7 +33,16 @@ class StreamBot:
             bot_token=bot_token
         )
         
-        self.handlers = BotHandlers()
+        # Transport HTTP dùng chung cho mọi scraper
+        self.http_client = HttpClient()
+        
+        # Relay HLS cho các link cần đúng Referer/User-Agent (tuỳ chọn)
+        self.relay = HlsRelay(self.http_client) if Config.RELAY_ENABLED else None
+        
+        # Đo thời gian event loop bị chặn (hiển thị trong /stats)
+        self.loop_monitor = LoopLagMonitor()
+        
+        self.handlers = BotHandlers(self.http_client, self.relay, self.loop_monitor)
         self.logger = logging.getLogger(__name__)
         
         # Đăng ký handlers
@@ -53,24 +66,51 @@ class StreamBot:
         async def supported_handler(client: Client, message: Message):
             await self.handlers.supported_command(client, message)
         
+        # Stats command (admin)
+        @self.app.on_message(filters.command("stats"))
+        async def stats_handler(client: Client, message: Message):
+            await self.handlers.stats_command(client, message)
+        
+        # Purge command (admin)
+        @self.app.on_message(filters.command("purge"))
+        async def purge_handler(client: Client, message: Message):
+            await self.handlers.purge_command(client, message)
+        
+        # Download command (trước URL handler vì lệnh cũng chứa URL)
+        @self.app.on_message(filters.command("download"))
+        async def download_handler(client: Client, message: Message):
+            await self.handlers.download_command(client, message)
+        
         # URL handler
         @self.app.on_message(filters.regex(r'https?://\S+'))
         async def url_handler(client: Client, message: Message):
             await self.handlers.url_handler(client, message)
         
         # Default message handler
-        @self.app.on_message(filters.text & ~filters.command(["start", "help", "supported"]))
+        @self.app.on_message(filters.text & ~filters.command(["start", "help", "supported", "stats", "purge", "download"]))
         async def default_handler(client: Client, message: Message):
             await self.handlers.default_handler(client, message)
     
     async def start(self):
         """Khởi động bot"""
+        await self.http_client.start()
+        # Khởi động sẵn worker parse để lượt trích xuất đầu tiên không phải chờ
+        get_cpu_pool().start()
+        self.loop_monitor.start()
+        if self.relay:
+            await self.relay.start()
         await self.app.start()
         self.logger.info("Bot đã khởi động thành công!")
     
     async def stop(self):
         """Dừng bot"""
         await self.app.stop()
+        self.handlers.close()
+        if self.relay:
+            await self.relay.stop()
+        await self.http_client.close()
+        await self.loop_monitor.stop()
+        shutdown_cpu_pool()
         self.logger.info("Bot đã dừng hoạt động")
     
     async def idle(self):
@@ -4,22 +4,97 @@
 Handlers cho các lệnh và tin nhắn của bot
 """
 
+import asyncio
 import logging
-import re
-from typing import List
+import os
+import time
+from typing import Dict, List, Optional
 from pyrogram import Client
 from pyrogram.types import Message
 from pyrogram.enums import ParseMode
-from config import Messages
+from config import Config, Messages
+from scrapers.extraction_service import ExtractionService, UnsupportedSiteError
 from scrapers.scraper_factory import ScraperFactory
-from utils.validators import is_valid_url, is_supported_site
+from utils.hls_downloader import DownloadError, DownloadResult, HlsDownloader
+from utils.hls_relay import HlsRelay
+from utils.host_limiter import HostUnavailableError
+from utils.http_client import HttpClient
+from utils.cpu_pool import get_cpu_pool
+from utils.deadline import deadline_scope, deadline_stats
+from utils.job_queue import JobQueue, QueueFullError
+from utils.link_matcher import get_matcher
+from utils.loop_monitor import LoopLagMonitor
+from utils.negative_cache import (
+    NegativeEntry, REASON_BLOCKED, REASON_NOT_FOUND, REASON_UNSUPPORTED
+)
+from utils.url_classifier import classify_url
+from utils.validators import is_allowed_download_host, is_valid_url, is_supported_site
+
+class QueueStatusMessage:
+    """Cập nhật tin nhắn "đang xử lý" theo vị trí trong hàng đợi"""
+    
+    def __init__(self, message: Message):
+        self.message = message
+        self._lock = asyncio.Lock()
+        self._closed = False
+    
+    async def update(self, position: int):
+        """Hiển thị vị trí (0 = đã bắt đầu xử lý)"""
+        async with self._lock:
+            if self._closed:
+                return
+            if position:
+                text = Messages.QUEUE_POSITION_MESSAGE.format(position=position)
+            else:
+                text = Messages.PROCESSING_MESSAGE
+            try:
+                await self.message.edit_text(text, parse_mode=ParseMode.MARKDOWN)
+            except Exception as e:
+                logging.getLogger(__name__).debug(f"Không thể cập nhật vị trí hàng đợi: {e}")
+    
+    async def close(self):
+        """Ngừng cập nhật (trước khi sửa tin nhắn thành kết quả)"""
+        async with self._lock:
+            self._closed = True
+
+class ThrottledStatusMessage:
+    """Sửa tin nhắn trạng thái không quá một lần mỗi `interval` giây (tránh FloodWait)"""
+    
+    def __init__(self, message: Message, interval: float = None):
+        self.message = message
+        self.interval = interval if interval is not None else Config.DOWNLOAD_PROGRESS_INTERVAL
+        self._last_text = None
+        self._last_edit = 0.0
+    
+    async def update(self, text: str, force: bool = False):
+        """Hiển thị text nếu đã đủ thời gian từ lần sửa trước (hoặc force)"""
+        now = time.monotonic()
+        if text == self._last_text or (not force and now - self._last_edit < self.interval):
+            return
+        self._last_text, self._last_edit = text, now
+        try:
+            await self.message.edit_text(text, parse_mode=ParseMode.MARKDOWN)
+        except Exception as e:
+            logging.getLogger(__name__).debug(f"Không thể cập nhật tiến độ: {e}")
 
 class BotHandlers:
     """Lớp xử lý các handlers của bot"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[HttpClient] = None, relay: Optional[HlsRelay] = None,
+                 loop_monitor: Optional[LoopLagMonitor] = None):
         self.logger = logging.getLogger(__name__)
-        self.scraper_factory = ScraperFactory()
+        self.http_client = http_client
+        self.relay = relay
+        self.loop_monitor = loop_monitor
+        self.scraper_factory = ScraperFactory(http_client)
+        self.extraction_service = ExtractionService(self.scraper_factory)
+        self.downloader = HlsDownloader(http_client)
+        self.download_queue = JobQueue(Config.DOWNLOAD_MAX_ACTIVE, Config.DOWNLOAD_QUEUE_SIZE)
+    
+    def close(self):
+        """Giải phóng tài nguyên của handlers"""
+        self.extraction_service.close()
+        self.download_queue.close()
     
     async def start_command(self, client: Client, message: Message):
         """Xử lý lệnh /start"""
@@ -57,6 +132,173 @@ class BotHandlers:
         except Exception as e:
             self.logger.error(f"Lỗi khi xử lý lệnh supported: {e}")
     
+    async def stats_command(self, client: Client, message: Message):
+        """Xử lý lệnh /stats (chỉ admin)"""
+        try:
+            if message.from_user.id not in Config.ADMIN_USER_IDS:
+                await message.reply_text(Messages.ADMIN_ONLY_MESSAGE)
+                return
+            
+            result_message = f"{Messages.STATS_HEADER}\n"
+            for section, stats in self.collect_stats().items():
+                result_message += f"\n**{section}**\n"
+                for key, value in stats.items():
+                    result_message += f"• `{key}`: {value}\n"
+            
+            await message.reply_text(
+                result_message,
+                parse_mode=ParseMode.MARKDOWN,
+                disable_web_page_preview=True
+            )
+        except Exception as e:
+            self.logger.error(f"Lỗi khi xử lý lệnh stats: {e}")
+    
+    async def purge_command(self, client: Client, message: Message):
+        """Xử lý lệnh /purge [pattern]: xoá cache thất bại (chỉ admin)"""
+        try:
+            if message.from_user.id not in Config.ADMIN_USER_IDS:
+                await message.reply_text(Messages.ADMIN_ONLY_MESSAGE)
+                return
+            
+            parts = message.text.split(maxsplit=1)
+            pattern = parts[1].strip() if len(parts) > 1 else ''
+            count = self.extraction_service.purge_negative(pattern)
+            await message.reply_text(Messages.PURGE_DONE_MESSAGE.format(count=count))
+        except Exception as e:
+            self.logger.error(f"Lỗi khi xử lý lệnh purge: {e}")
+    
+    def collect_stats(self) -> Dict[str, Dict]:
+        """
+        Gom thống kê của các thành phần
+        
+        Returns:
+            Dict tên thành phần -> dict thống kê
+        """
+        stats = {}
+        if self.http_client:
+            stats['HTTP pool'] = self.http_client.stats()
+            stats['Single-flight (documents)'] = self.http_client.flights.stats()
+            stats['Host limiter'] = self.http_client.limiter.stats()
+            stats['Hedging'] = self.http_client.hedger.stats()
+            stats['Page cache'] = self.http_client.page_cache.stats()
+        stats.update(self.extraction_service.stats())
+        stats['Download queue'] = self.download_queue.stats()
+        stats['HLS download'] = self.downloader.stats()
+        stats['CPU pool'] = get_cpu_pool().stats()
+        stats['Request deadline'] = deadline_stats()
+        if self.loop_monitor:
+            stats['Event loop'] = self.loop_monitor.stats()
+        if self.relay:
+            stats['HLS relay'] = self.relay.stats()
+        return stats
+    
+    async def download_command(self, client: Client, message: Message):
+        """Xử lý lệnh /download: tải stream HLS và gửi file qua Telegram"""
+        try:
+            is_admin = message.from_user.id in Config.ADMIN_USER_IDS
+            if Config.DOWNLOAD_ADMIN_ONLY and not is_admin:
+                await message.reply_text(Messages.ADMIN_ONLY_MESSAGE)
+                return
+            
+            parts = message.text.split(maxsplit=1)
+            url = parts[1].strip() if len(parts) > 1 else ''
+            if not is_valid_url(url):
+                await message.reply_text(Messages.DOWNLOAD_USAGE_MESSAGE, parse_mode=ParseMode.MARKDOWN)
+                return
+            # Link m3u8 trực tiếp: chỉ từ trang được hỗ trợ/host được phép (admin thì mọi host)
+            if classify_url(url).type == 'HLS' and not is_admin and not is_allowed_download_host(url):
+                await message.reply_text(Messages.DOWNLOAD_HOST_NOT_ALLOWED_MESSAGE)
+                return
+            
+            user_id = message.from_user.id
+            self.logger.info(f"Người dùng {user_id} yêu cầu tải: {url}")
+            processing_msg = await message.reply_text(Messages.PROCESSING_MESSAGE)
+            
+            try:
+                # Deadline chỉ áp cho phần tìm playlist, không cho việc tải
+                with deadline_scope():
+                    playlist_url = await self._playlist_for_download(url, processing_msg)
+                if not playlist_url:
+                    await processing_msg.edit_text(Messages.DOWNLOAD_NO_HLS_MESSAGE)
+                    return
+                
+                queue_status = QueueStatusMessage(processing_msg)
+                await self.download_queue.submit(
+                    lambda: self._download_and_upload(message, processing_msg, playlist_url, queue_status),
+                    on_position=queue_status.update
+                )
+            except UnsupportedSiteError:
+                await processing_msg.edit_text(Messages.UNSUPPORTED_SITE_MESSAGE)
+            except QueueFullError:
+                await processing_msg.edit_text(Messages.QUEUE_FULL_MESSAGE)
+            except HostUnavailableError as e:
+                await processing_msg.edit_text(
+                    Messages.HOST_UNAVAILABLE_MESSAGE.format(seconds=int(e.retry_in) + 1)
+                )
+            except DownloadError as e:
+                self.logger.warning(f"Tải thất bại cho người dùng {user_id}: {e}")
+                await processing_msg.edit_text(Messages.DOWNLOAD_FAILED_MESSAGE.format(error=e))
+            
+        except Exception as e:
+            self.logger.error(f"Lỗi khi xử lý lệnh download: {e}")
+            await message.reply_text(Messages.ERROR_MESSAGE.format(error=str(e)))
+    
+    async def _playlist_for_download(self, url: str, processing_msg: Message) -> Optional[str]:
+        """URL m3u8 để tải: chính URL nếu là HLS, nếu không thì link HLS tốt nhất trích xuất từ trang"""
+        if classify_url(url).type == 'HLS':
+            return url
+        # Trang vừa thất bại gần đây: không tải lại
+        if self.extraction_service.negative(url):
+            return None
+        
+        stream_links = await self.extraction_service.cached(url)
+        if stream_links is None:
+            stream_links = await self._extract_queued(url, processing_msg)
+        for link in stream_links:
+            if link.get('type') == 'HLS' or classify_url(link['url']).type == 'HLS':
+                if link.get('probe', {}).get('alive') is not False:
+                    return link['url']
+        return None
+    
+    async def _download_and_upload(self, message: Message, processing_msg: Message,
+                                   playlist_url: str, queue_status: QueueStatusMessage):
+        """Job của hàng đợi tải: tải vào file tạm, gửi lên Telegram rồi xoá file"""
+        await queue_status.close()
+        status = ThrottledStatusMessage(processing_msg)
+        
+        async def on_download(done: int, total: int, written: int):
+            await status.update(Messages.DOWNLOAD_PROGRESS_MESSAGE.format(
+                done=done, total=total, size=written / 1024 / 1024
+            ), force=done == total)
+        
+        result = await self.downloader.download(playlist_url, on_download, Config.DOWNLOAD_DIR)
+        try:
+            await self._upload(message, status, result)
+        finally:
+            os.unlink(result.path)
+        
+        try:
+            await processing_msg.delete()
+        except Exception as e:
+            self.logger.debug(f"Không thể xoá tin nhắn tiến độ: {e}")
+    
+    async def _upload(self, message: Message, status: ThrottledStatusMessage, result: DownloadResult):
+        """Gửi file đã tải qua Pyrogram, cập nhật % đã gửi"""
+        size_mb = result.bytes / 1024 / 1024
+        
+        async def on_upload(current: int, total: int):
+            await status.update(Messages.UPLOAD_PROGRESS_MESSAGE.format(
+                percent=int(current * 100 / total) if total else 0, size=size_mb
+            ))
+        
+        minutes, seconds = divmod(int(result.duration), 60)
+        await message.reply_document(
+            result.path,
+            file_name=f"video{result.extension}",
+            caption=Messages.DOWNLOAD_CAPTION.format(duration=f"{minutes}:{seconds:02d}", size=size_mb),
+            progress=on_upload
+        )
+    
     async def url_handler(self, client: Client, message: Message):
         """Xử lý URL được gửi bởi người dùng"""
         try:
@@ -70,43 +312,59 @@ class BotHandlers:
                 await message.reply_text(Messages.INVALID_URL_MESSAGE)
                 return
             
+            # Trang (hoặc domain) vừa thất bại gần đây: trả lời ngay lý do, không tải lại
+            failure = self.extraction_service.negative(url)
+            if failure:
+                await message.reply_text(self._failure_message(failure))
+                self.logger.info(f"Trả lỗi đã nhớ ({failure.reason}) cho người dùng {user_id}")
+                return
+            
             # Kiểm tra trang web được hỗ trợ
             if not is_supported_site(url):
+                self.extraction_service.mark_unsupported(url)
                 await message.reply_text(Messages.UNSUPPORTED_SITE_MESSAGE)
                 return
             
+            # Kết quả đã cache: trả lời ngay, không cần tin nhắn "đang xử lý"
+            stream_links = await self.extraction_service.cached(url)
+            if stream_links:
+                await message.reply_text(
+                    self._format_stream_links(stream_links),
+                    parse_mode=ParseMode.MARKDOWN,
+                    disable_web_page_preview=True
+                )
+                self.logger.info(f"Trả {len(stream_links)} link từ cache cho người dùng {user_id}")
+                return
+            
             # Gửi thông báo đang xử lý
             processing_msg = await message.reply_text(Messages.PROCESSING_MESSAGE)
             
-            # Lấy scraper phù hợp
-            scraper = self.scraper_factory.get_scraper(url)
-            if not scraper:
+            # Trích xuất link stream (qua hàng đợi, tin nhắn hiển thị vị trí chờ),
+            # mọi bước bên trong tự cắt timeout theo deadline của yêu cầu
+            try:
+                with deadline_scope():
+                    stream_links = await self._extract_queued(url, processing_msg)
+            except UnsupportedSiteError:
                 await processing_msg.edit_text(Messages.UNSUPPORTED_SITE_MESSAGE)
                 return
-            
-            # Trích xuất link stream
-            stream_links = await scraper.extract_stream_links(url)
+            except QueueFullError:
+                await processing_msg.edit_text(Messages.QUEUE_FULL_MESSAGE)
+                self.logger.warning(f"Hàng đợi đầy, từ chối URL của người dùng {user_id}")
+                return
+            except HostUnavailableError as e:
+                await processing_msg.edit_text(
+                    Messages.HOST_UNAVAILABLE_MESSAGE.format(seconds=int(e.retry_in) + 1)
+                )
+                self.logger.warning(f"Bỏ URL của người dùng {user_id}: {e}")
+                return
             
             if not stream_links:
                 await processing_msg.edit_text(Messages.NO_STREAM_FOUND_MESSAGE)
                 return
             
-            # Tạo thông điệp kết quả
-            result_message = f"{Messages.SUCCESS_MESSAGE}\n\n"
-            
-            for i, link_info in enumerate(stream_links, 1):
-                quality = link_info.get('quality', 'Unknown')
-                link = link_info.get('url', '')
-                source = link_info.get('source', 'Unknown')
-                
-                result_message += f"**{i}. {quality} - {source}**\n"
-                result_message += f"`{link}`\n\n"
-            
-            result_message += "💡 **Lưu ý:** Nhấn vào link để copy, sau đó dán vào trình phát video."
-            
             # Gửi kết quả
             await processing_msg.edit_text(
-                result_message,
+                self._format_stream_links(stream_links),
                 parse_mode=ParseMode.MARKDOWN,
                 disable_web_page_preview=True
             )
@@ -125,24 +383,75 @@ class BotHandlers:
             except:
                 await message.reply_text(error_message)
     
+    async def _extract_queued(self, url: str, processing_msg: Message) -> List[Dict[str, str]]:
+        """Trích xuất qua hàng đợi, cập nhật vị trí chờ lên tin nhắn đang xử lý"""
+        queue_status = QueueStatusMessage(processing_msg)
+        try:
+            return await self.extraction_service.extract(
+                url, check_cache=False, on_position=queue_status.update
+            )
+        finally:
+            # Không để cập nhật vị trí đến muộn ghi đè kết quả
+            await queue_status.close()
+    
+    @staticmethod
+    def _failure_message(failure: NegativeEntry) -> str:
+        """Thông điệp trả lời cho một lần thất bại đã nhớ"""
+        if failure.reason == REASON_UNSUPPORTED:
+            return Messages.UNSUPPORTED_SITE_MESSAGE
+        if failure.reason == REASON_NOT_FOUND:
+            return Messages.PAGE_NOT_FOUND_MESSAGE
+        if failure.reason == REASON_BLOCKED:
+            return Messages.HOST_UNAVAILABLE_MESSAGE.format(seconds=int(failure.retry_in) + 1)
+        return Messages.NO_STREAM_FOUND_MESSAGE
+    
+    def _format_stream_links(self, stream_links: List[Dict[str, str]]) -> str:
+        """Tạo thông điệp kết quả từ danh sách link"""
+        result_message = f"{Messages.SUCCESS_MESSAGE}\n\n"
+        
+        for i, link_info in enumerate(stream_links, 1):
+            quality = link_info.get('quality', 'Unknown')
+            link = link_info.get('url', '')
+            source = link_info.get('source', 'Unknown')
+            
+            details = ""
+            if link_info.get('bandwidth'):
+                details = f" ({link_info['bandwidth'] / 1_000_000:.1f} Mbps"
+                if link_info.get('resolution'):
+                    details += f", {link_info['resolution']}"
+                details += ")"
+
+            mirror = link_info.get('mirror', {})
+            if mirror.get('throughput'):
+                details += f" ⚡ {mirror['throughput'] / 1024 / 1024:.1f} MB/s"
+
+            # Link chết chỉ được giữ lại (và đánh dấu) khi LINK_PROBE_DROP_DEAD tắt
+            if link_info.get('probe', {}).get('alive') is False:
+                details += " ⚠️ không phản hồi"
+            elif link_info.get('probe', {}).get('live'):
+                details += " 🔴 Live"
+            
+            result_message += f"**{i}. {quality} - {source}**{details}\n"
+            result_message += f"`{link}`\n"
+            if self.relay and link_info.get('type') == 'HLS':
+                result_message += f"▶️ Relay: `{self.relay.relay_url(link)}`\n"
+            result_message += "\n"
+        
+        result_message += "💡 **Lưu ý:** Nhấn vào link để copy, sau đó dán vào trình phát video."
+        return result_message
+    
     async def default_handler(self, client: Client, message: Message):
         """Xử lý tin nhắn mặc định"""
         try:
             # Kiểm tra nếu tin nhắn chứa direct streaming link
             text = message.text.strip()
             
-            # Patterns cho direct video links
-            video_patterns = [
-                r'(https?://[^\s]+\.(?:mp4|m3u8|mkv|avi|mov)(?:\?[^\s]*)?)',
-                r'(https?://(?:streamtape|doodstream|mixdrop|upstream|filesupload)\.(?:com|co|org)/[^\s]+)'
-            ]
-            
-            for pattern in video_patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                if matches:
-                    # Xử lý direct streaming links
-                    await self._handle_direct_stream_links(client, message, matches)
-                    return
+            # Direct video links
+            matches = get_matcher('direct_message').urls(text)
+            if matches:
+                # Xử lý direct streaming links
+                await self._handle_direct_stream_links(client, message, matches)
+                return
             
             help_text = """
 ❓ **Không hiểu tin nhắn của bạn**
@@ -174,8 +483,9 @@ Vui lòng:
             
             for i, link in enumerate(links, 1):
                 # Detect quality and source
-                quality = self._detect_quality_from_url(link)
-                source = self._detect_source_from_url(link)
+                info = classify_url(link)
+                quality = info.quality
+                source = info.source or 'Direct'
                 
                 result_message += f"**{i}. {quality} - {source}**\n"
                 result_message += f"`{link}`\n\n"
@@ -192,37 +502,3 @@ Vui lòng:
             
         except Exception as e:
             self.logger.error(f"Lỗi khi xử lý direct streaming links: {e}")
-    
-    def _detect_quality_from_url(self, url: str) -> str:
-        """Phát hiện chất lượng từ URL"""
-        url_lower = url.lower()
-        if any(q in url_lower for q in ['2160p', '4k']):
-            return '4K'
-        elif any(q in url_lower for q in ['1080p', 'fhd']):
-            return '1080p'
-        elif any(q in url_lower for q in ['720p', 'hd']):
-            return '720p'
-        elif any(q in url_lower for q in ['480p', 'sd']):
-            return '480p'
-        elif '360p' in url_lower:
-            return '360p'
-        else:
-            return 'Unknown'
-    
-    def _detect_source_from_url(self, url: str) -> str:
-        """Phát hiện nguồn từ URL"""
-        from urllib.parse import urlparse
-        domain = urlparse(url).netloc.lower()
-        
-        if 'streamtape.com' in domain:
-            return 'StreamTape'
-        elif 'doodstream.com' in domain:
-            return 'DoodStream'
-        elif 'mixdrop.co' in domain:
-            return 'MixDrop'
-        elif 'upstream.to' in domain:
-            return 'Upstream'
-        elif 'filesupload.org' in domain:
-            return 'FilesUpload'
-        else:
-            return 'Direct'
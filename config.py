@@ -19,6 +19,12 @@ class Config:
     BOT_NAME = "Stream Link Extractor Bot"
     BOT_USERNAME = "@streamlinkbot"
     
+    # Telegram user IDs được dùng lệnh quản trị (phân tách bằng dấu phẩy)
+    ADMIN_USER_IDS = [
+        int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",")
+        if user_id.strip().isdigit()
+    ]
+    
     # Supported websites
     SUPPORTED_SITES = {
         "tvhay.fm": "TVHay",
@@ -32,6 +38,185 @@ class Config:
     REQUEST_TIMEOUT = 30
     MAX_RETRIES = 3
     
+    # Deadline cho mỗi yêu cầu của người dùng (giây, tính cả thời gian chờ trong
+    # hàng đợi): mọi bước tải/probe tự cắt timeout theo thời gian còn lại. Ngân
+    # sách thử lại là tổng số lần retry cho mọi request tải trang của yêu cầu đó.
+    REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "60"))
+    REQUEST_RETRY_BUDGET = int(os.getenv("REQUEST_RETRY_BUDGET", "4"))
+    
+    # Enhanced scraper: "async" (aiohttp) hoặc "executor" (requests trong thread pool)
+    ENHANCED_SCRAPER_MODE = os.getenv("ENHANCED_SCRAPER_MODE", "async")
+    ENHANCED_EXECUTOR_WORKERS = int(os.getenv("ENHANCED_EXECUTOR_WORKERS", "8"))
+    ENHANCED_REQUEST_DELAY = float(os.getenv("ENHANCED_REQUEST_DELAY", "2"))
+    
+    # Tải trang theo luồng: số bytes tối đa được đọc của một trang (content-type
+    # không phải HTML bị bỏ ngay) và dừng đọc sớm khi phần đầu trang đã đủ link
+    # theo EXTRACTION_SUFFICIENCY
+    HTML_MAX_BYTES = int(os.getenv("HTML_MAX_BYTES", str(4 * 1024 * 1024)))
+    HTML_EARLY_STOP = os.getenv("HTML_EARLY_STOP", "false").lower() == "true"
+    
+    # Backend parse trang khi trích xuất: "lxml" (theo sự kiện, chỉ giữ
+    # video/source/iframe/a/script), "html.parser" (thuần Python) hoặc
+    # "soup" (dựng cả cây BeautifulSoup như trước)
+    HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "lxml")
+    
+    # Parse trang và quét regex ngoài event loop: "inline" (chạy ngay trên loop),
+    # "thread" hoặc "process" (process pool khởi động sẵn); tài liệu nhỏ hơn
+    # CPU_POOL_MIN_BYTES luôn chạy inline
+    CPU_POOL_MODE = os.getenv("CPU_POOL_MODE", "process")
+    CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "2"))
+    CPU_POOL_MIN_BYTES = int(os.getenv("CPU_POOL_MIN_BYTES", str(64 * 1024)))
+    
+    # Đo event loop bị chặn: chu kỳ lấy mẫu và độ trễ tối thiểu tính là bị chặn (giây)
+    LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+    LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.05"))
+    
+    # Lập lịch strategy: deadline cho cả lượt trích xuất và quy tắc dừng sớm
+    # (ví dụ "hls:1,mirror:1", "links:3"; để rỗng để luôn chạy hết các strategy)
+    EXTRACTION_DEADLINE = float(os.getenv("EXTRACTION_DEADLINE", "25"))
+    EXTRACTION_SUFFICIENCY = os.getenv("EXTRACTION_SUFFICIENCY", "hls:1,mirror:1")
+    
+    # Tải iframe player song song: giới hạn cho cả trang, cho mỗi host,
+    # số tầng iframe lồng nhau và deadline chung (giây)
+    IFRAME_CONCURRENCY = int(os.getenv("IFRAME_CONCURRENCY", "6"))
+    IFRAME_PER_HOST = int(os.getenv("IFRAME_PER_HOST", "2"))
+    IFRAME_MAX_DEPTH = int(os.getenv("IFRAME_MAX_DEPTH", "2"))
+    IFRAME_DEADLINE = float(os.getenv("IFRAME_DEADLINE", "20"))
+    
+    # Connection pool dùng chung (HttpClient)
+    HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+    HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10"))
+    HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+    
+    # Giới hạn tốc độ tải trang theo host (token bucket dùng chung): tốc độ ban
+    # đầu/thấp nhất/cao nhất (request/giây), burst và thời gian chờ token tối đa
+    # trước khi bỏ request (giây); 403/429 giảm một nửa tốc độ, Retry-After được tôn trọng
+    HOST_RATE_INITIAL = float(os.getenv("HOST_RATE_INITIAL", "2"))
+    HOST_RATE_MIN = float(os.getenv("HOST_RATE_MIN", "0.2"))
+    HOST_RATE_MAX = float(os.getenv("HOST_RATE_MAX", "10"))
+    HOST_RATE_BURST = float(os.getenv("HOST_RATE_BURST", "5"))
+    HOST_RATE_MAX_WAIT = float(os.getenv("HOST_RATE_MAX_WAIT", "10"))
+    HOST_LIMITER_SIZE = int(os.getenv("HOST_LIMITER_SIZE", "1024"))
+    
+    # Circuit breaker theo host: số lần lỗi/bị chặn liên tiếp để tạm ngưng gửi
+    # request tới host và thời gian tạm ngưng tối thiểu (giây)
+    HOST_CIRCUIT_THRESHOLD = int(os.getenv("HOST_CIRCUIT_THRESHOLD", "5"))
+    HOST_CIRCUIT_COOLDOWN = float(os.getenv("HOST_CIRCUIT_COOLDOWN", "60"))
+    
+    # Hedged request khi tải trang (tắt mặc định): request chưa có header sau
+    # phân vị HEDGE_PERCENTILE thời gian chờ header của host thì gửi thêm một
+    # request (trên kết nối mới nếu HEDGE_FRESH_CONNECTION), bên nào có header
+    # trước thì dùng. HEDGE_BUDGET là tỉ lệ request tối đa được hedge của mỗi host.
+    HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+    HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))
+    HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "10"))
+    HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.2"))
+    HEDGE_FRESH_CONNECTION = os.getenv("HEDGE_FRESH_CONNECTION", "true").lower() == "true"
+    
+    # Hàng đợi trích xuất: số lượt scrape chạy đồng thời và số job chờ tối đa
+    EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "4"))
+    EXTRACTION_QUEUE_SIZE = int(os.getenv("EXTRACTION_QUEUE_SIZE", "50"))
+    
+    # Mở rộng link HLS thành các variant của master playlist (cache master playlist)
+    HLS_EXPAND_VARIANTS = os.getenv("HLS_EXPAND_VARIANTS", "true").lower() == "true"
+    HLS_MASTER_TIMEOUT = float(os.getenv("HLS_MASTER_TIMEOUT", "8"))
+    HLS_MASTER_CACHE_SIZE = int(os.getenv("HLS_MASTER_CACHE_SIZE", "1024"))
+    HLS_MASTER_CACHE_TTL = float(os.getenv("HLS_MASTER_CACHE_TTL", "600"))
+    HLS_EXPAND_CONCURRENCY = int(os.getenv("HLS_EXPAND_CONCURRENCY", "4"))
+    
+    # Kiểm tra link còn sống sau khi trích xuất: số probe đồng thời (cả process),
+    # deadline mỗi probe (giây), cache kết quả và bỏ (true) hay chỉ đánh dấu link chết
+    LINK_PROBE_ENABLED = os.getenv("LINK_PROBE_ENABLED", "true").lower() == "true"
+    LINK_PROBE_CONCURRENCY = int(os.getenv("LINK_PROBE_CONCURRENCY", "16"))
+    LINK_PROBE_TIMEOUT = float(os.getenv("LINK_PROBE_TIMEOUT", "5"))
+    LINK_PROBE_CACHE_SIZE = int(os.getenv("LINK_PROBE_CACHE_SIZE", "4096"))
+    LINK_PROBE_CACHE_TTL = float(os.getenv("LINK_PROBE_CACHE_TTL", "120"))
+    LINK_PROBE_DROP_DEAD = os.getenv("LINK_PROBE_DROP_DEAD", "true").lower() == "true"
+    
+    # Cache thất bại: yêu cầu lặp lại tới trang không có link, trang 404, trang
+    # đang chặn bot hoặc domain không hỗ trợ được trả lời ngay trong TTL (giây)
+    NEGATIVE_CACHE_SIZE = int(os.getenv("NEGATIVE_CACHE_SIZE", "4096"))
+    NEGATIVE_TTL_NO_STREAMS = float(os.getenv("NEGATIVE_TTL_NO_STREAMS", "600"))
+    NEGATIVE_TTL_NOT_FOUND = float(os.getenv("NEGATIVE_TTL_NOT_FOUND", "3600"))
+    NEGATIVE_TTL_BLOCKED = float(os.getenv("NEGATIVE_TTL_BLOCKED", "120"))
+    NEGATIVE_TTL_UNSUPPORTED = float(os.getenv("NEGATIVE_TTL_UNSUPPORTED", "86400"))
+    
+    # Xếp hạng mirror theo TTFB/throughput: bảng hiệu năng theo host suy giảm theo thời gian
+    # (half-life, giây); tải mẫu song song (tắt mặc định) giới hạn số bytes, deadline và số mẫu
+    # đồng thời; host đã đo trong MIRROR_HISTORY_MAX_AGE giây thì dùng lịch sử, không đo lại
+    MIRROR_RANKING_ENABLED = os.getenv("MIRROR_RANKING_ENABLED", "true").lower() == "true"
+    MIRROR_BENCHMARK_ENABLED = os.getenv("MIRROR_BENCHMARK_ENABLED", "false").lower() == "true"
+    MIRROR_SAMPLE_BYTES = int(os.getenv("MIRROR_SAMPLE_BYTES", "262144"))
+    MIRROR_SAMPLE_TIMEOUT = float(os.getenv("MIRROR_SAMPLE_TIMEOUT", "6"))
+    MIRROR_SAMPLE_CONCURRENCY = int(os.getenv("MIRROR_SAMPLE_CONCURRENCY", "6"))
+    MIRROR_HALF_LIFE = float(os.getenv("MIRROR_HALF_LIFE", "1800"))
+    MIRROR_HISTORY_MAX_AGE = float(os.getenv("MIRROR_HISTORY_MAX_AGE", "600"))
+    MIRROR_TABLE_SIZE = int(os.getenv("MIRROR_TABLE_SIZE", "512"))
+    
+    # /download: số lượt tải chạy cùng lúc và số lượt chờ, số segment tải đồng thời
+    # mỗi lượt và tới mỗi host, thử lại/timeout mỗi segment, giới hạn thời lượng (giây),
+    # dung lượng (bytes) và độ phân giải; thư mục file tạm (rỗng = thư mục tạm hệ thống)
+    DOWNLOAD_MAX_ACTIVE = int(os.getenv("DOWNLOAD_MAX_ACTIVE", "2"))
+    DOWNLOAD_QUEUE_SIZE = int(os.getenv("DOWNLOAD_QUEUE_SIZE", "10"))
+    DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+    DOWNLOAD_PER_HOST = int(os.getenv("DOWNLOAD_PER_HOST", "6"))
+    DOWNLOAD_SEGMENT_RETRIES = int(os.getenv("DOWNLOAD_SEGMENT_RETRIES", "3"))
+    DOWNLOAD_SEGMENT_TIMEOUT = float(os.getenv("DOWNLOAD_SEGMENT_TIMEOUT", "30"))
+    DOWNLOAD_MAX_DURATION = float(os.getenv("DOWNLOAD_MAX_DURATION", "900"))
+    DOWNLOAD_MAX_BYTES = int(os.getenv("DOWNLOAD_MAX_BYTES", str(1024 * 1024 * 1024)))
+    DOWNLOAD_MAX_HEIGHT = int(os.getenv("DOWNLOAD_MAX_HEIGHT", "720"))
+    DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", "") or None
+    DOWNLOAD_PROGRESS_INTERVAL = float(os.getenv("DOWNLOAD_PROGRESS_INTERVAL", "3"))
+    
+    # /download chỉ cho admin, và host được phép tải link m3u8 trực tiếp ngoài các
+    # trang được hỗ trợ (phân tách bằng dấu phẩy, gồm cả subdomain); admin tải
+    # được mọi host công khai. Mọi request tải đều bị chặn tới địa chỉ nội bộ.
+    DOWNLOAD_ADMIN_ONLY = os.getenv("DOWNLOAD_ADMIN_ONLY", "false").lower() == "true"
+    DOWNLOAD_ALLOWED_HOSTS = [
+        host.strip().lower() for host in os.getenv("DOWNLOAD_ALLOWED_HOSTS", "").split(",")
+        if host.strip()
+    ]
+    
+    # Relay HLS tích hợp (tắt mặc định): địa chỉ lắng nghe, URL gốc người dùng truy cập
+    # được, khoá ký URL và thời hạn link (giây), dung lượng cache segment, segment lớn
+    # hơn RELAY_MAX_SEGMENT_BYTES chuyển thẳng không cache, số stream được thống kê
+    RELAY_ENABLED = os.getenv("RELAY_ENABLED", "false").lower() == "true"
+    RELAY_HOST = os.getenv("RELAY_HOST", "0.0.0.0")
+    RELAY_PORT = int(os.getenv("RELAY_PORT", "8080"))
+    RELAY_PUBLIC_URL = os.getenv("RELAY_PUBLIC_URL", "")
+    RELAY_SECRET = os.getenv("RELAY_SECRET", "")
+    RELAY_LINK_TTL = float(os.getenv("RELAY_LINK_TTL", "21600"))
+    RELAY_CACHE_BYTES = int(os.getenv("RELAY_CACHE_BYTES", str(256 * 1024 * 1024)))
+    RELAY_MAX_SEGMENT_BYTES = int(os.getenv("RELAY_MAX_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+    RELAY_STREAM_STATS = int(os.getenv("RELAY_STREAM_STATS", "256"))
+    
+    # Theo dõi live playlist: số segment gần nhất giữ trong ring buffer, số lần
+    # TARGETDURATION không có segment mới thì coi là stall, TARGETDURATION mặc định (giây)
+    LIVE_WINDOW = int(os.getenv("LIVE_WINDOW", "64"))
+    LIVE_STALL_FACTOR = float(os.getenv("LIVE_STALL_FACTOR", "3"))
+    LIVE_DEFAULT_TARGET_DURATION = float(os.getenv("LIVE_DEFAULT_TARGET_DURATION", "6"))
+    # Probe link HLS: playlist nhỏ hơn LIVE_DETECT_BYTES được đọc hết để biết có ENDLIST
+    # không (không có = live); tracker của live playlist được giữ giữa các lần probe
+    # (số tracker, thời gian giữ tính từ lần probe cuối) để phát hiện stall
+    LIVE_DETECT_BYTES = int(os.getenv("LIVE_DETECT_BYTES", str(256 * 1024)))
+    LIVE_TRACKERS = int(os.getenv("LIVE_TRACKERS", "256"))
+    LIVE_TRACKER_TTL = float(os.getenv("LIVE_TRACKER_TTL", "900"))
+    
+    # Cache trang gốc trên đĩa (để rỗng path để tắt): body nén kèm ETag/Last-Modified,
+    # tải lại có điều kiện sau PAGE_CACHE_FRESH giây, giới hạn tổng dung lượng đã nén
+    PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", "data/page_cache.sqlite3")
+    PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    PAGE_CACHE_FRESH = float(os.getenv("PAGE_CACHE_FRESH", "30"))
+    
+    # Cache kết quả trích xuất (LRU trong bộ nhớ + SQLite; để rỗng path để tắt cache đĩa)
+    RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "data/result_cache.sqlite3")
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+    RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "1800"))
+    RESULT_CACHE_MIN_TTL = float(os.getenv("RESULT_CACHE_MIN_TTL", "60"))
+    RESULT_CACHE_MAX_TTL = float(os.getenv("RESULT_CACHE_MAX_TTL", "21600"))
+    
     # Headers for requests
     DEFAULT_HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -68,8 +253,23 @@ class Config:
         'upstream.to',
         'filesupload.org',
         'streamlare.com',
-        'supervideo.tv'
+        'supervideo.tv',
+        'vidcloud.co',
+        'fembed.com',
+        'embedgram.com'
     ]
+    
+    # Tên hiển thị của nguồn theo domain
+    SOURCE_NAMES = {
+        'streamtape.com': 'StreamTape',
+        'doodstream.com': 'DoodStream',
+        'mixdrop.co': 'MixDrop',
+        'upstream.to': 'Upstream',
+        'filesupload.org': 'FilesUpload',
+        'streamlare.com': 'StreamLare',
+        'supervideo.tv': 'SuperVideo',
+        'tvhay.fm': 'TVHay Direct'
+    }
 
 class Messages:
     """Các thông điệp của bot"""
@@ -94,6 +294,7 @@ Bot này giúp bạn trích xuất link phát trực tiếp từ các trang web
 /start - Bắt đầu sử dụng bot
 /help - Xem hướng dẫn
 /supported - Danh sách trang web được hỗ trợ
+/download - Tải video ngắn (link m3u8) về Telegram
 """
 
     HELP_MESSAGE = """
@@ -135,3 +336,17 @@ Nếu bạn muốn bot hỗ trợ thêm trang web nào, hãy liên hệ admin!
     UNSUPPORTED_SITE_MESSAGE = "❌ Trang web này chưa được hỗ trợ. Sử dụng /supported để xem danh sách trang web được hỗ trợ."
     INVALID_URL_MESSAGE = "❌ Link không hợp lệ. Vui lòng gửi một URL đúng định dạng."
     NO_STREAM_FOUND_MESSAGE = "❌ Không tìm thấy link phát trực tiếp từ trang này."
+    QUEUE_POSITION_MESSAGE = "⏳ Đang chờ xử lý... Vị trí của bạn trong hàng đợi: **{position}**"
+    QUEUE_FULL_MESSAGE = "⏳ Bot đang quá tải, vui lòng thử lại sau ít phút."
+    HOST_UNAVAILABLE_MESSAGE = "🚧 Trang nguồn đang chặn truy cập, vui lòng thử lại sau khoảng {seconds} giây."
+    PAGE_NOT_FOUND_MESSAGE = "❌ Trang này không tồn tại (404). Vui lòng kiểm tra lại link."
+    PURGE_DONE_MESSAGE = "🧹 Đã xoá {count} mục khỏi cache thất bại."
+    ADMIN_ONLY_MESSAGE = "⛔ Lệnh này chỉ dành cho admin."
+    STATS_HEADER = "📊 **Thống kê bot:**"
+    DOWNLOAD_USAGE_MESSAGE = "📥 Cách dùng: `/download <link m3u8 hoặc link trang phim>`"
+    DOWNLOAD_HOST_NOT_ALLOWED_MESSAGE = "⛔ Chỉ tải được link m3u8 từ các trang được hỗ trợ."
+    DOWNLOAD_NO_HLS_MESSAGE = "❌ Không tìm thấy link HLS (m3u8) để tải từ link này."
+    DOWNLOAD_PROGRESS_MESSAGE = "⬇️ Đang tải video: **{done}/{total}** segment ({size:.1f} MB)"
+    UPLOAD_PROGRESS_MESSAGE = "⬆️ Đang gửi video: **{percent}%** ({size:.1f} MB)"
+    DOWNLOAD_FAILED_MESSAGE = "❌ **Không tải được video:** {error}"
+    DOWNLOAD_CAPTION = "🎬 {duration} • {size:.1f} MB"
@@ -11,43 +11,105 @@ from abc import ABC, abstractmethod
 from typing import List, Dict, Optional
 from bs4 import BeautifulSoup
 from config import Config
+from scrapers.strategy_scheduler import SufficiencyRule
+from utils.html_elements import PageElements, parse_elements
+from utils.cpu_pool import ParsedPage, get_cpu_pool, parse_page
+from utils.deadline import allow_retry, clamp_timeout, deadline_expired
+from utils.hedging import RequestHedger
+from utils.host_limiter import THROTTLE_STATUSES, HostLimiter, HostUnavailableError
+from utils.host_performance import host_of
+from utils.html_reader import EnoughCallback, HtmlBody, NonHtmlContent, read_html
+from utils.http_client import HttpClient
+from utils.link_matcher import get_matcher
+from utils.url_classifier import classify_url
 
 class BaseScraper(ABC):
     """Lớp cơ sở cho tất cả các scrapers"""
     
-    def __init__(self):
+    # Profile của link matcher dùng để đếm link trong phần đầu trang khi bật
+    # HTML_EARLY_STOP (None = luôn đọc hết trang)
+    EARLY_STOP_PROFILE: Optional[str] = None
+    
+    # Profile của link matcher quét các script inline ngay khi parse trang
+    # (None = giữ nguyên nội dung script trong PageElements)
+    SCRIPT_PROFILE: Optional[str] = None
+    
+    def __init__(self, http_client: Optional[HttpClient] = None):
+        """
+        Khởi tạo scraper
+        
+        Args:
+            http_client: HTTP client dùng chung (nếu None sẽ tự tạo session riêng)
+        """
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.http_client = http_client
         self.session: Optional[aiohttp.ClientSession] = None
         self.timeout = aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT)
+        # Giới hạn tốc độ theo host: dùng chung qua HttpClient để mọi lượt trích xuất cùng tuân theo
+        self.limiter = http_client.limiter if http_client else HostLimiter()
+        self.hedger = http_client.hedger if http_client else RequestHedger()
+        # Cache trang gốc (chỉ khi dùng HttpClient chung)
+        self.page_cache = http_client.page_cache if http_client and http_client.page_cache.enabled else None
     
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession(
-            timeout=self.timeout,
-            headers=Config.DEFAULT_HEADERS
-        )
+        if self.http_client:
+            self.session = self.http_client.session
+        else:
+            self.session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                headers=Config.DEFAULT_HEADERS
+            )
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
+        # Session dùng chung thuộc về HttpClient, không đóng ở đây
+        if self.session and not self.http_client:
             await self.session.close()
+        self.session = None
     
-    async def fetch_html(self, url: str, max_retries: int = None) -> Optional[str]:
+    async def fetch_html(self, url: str, max_retries: int = None,
+                         enough: Optional[EnoughCallback] = None) -> Optional[str]:
         """
         Lấy HTML từ URL
         
         Args:
             url: URL cần lấy
             max_retries: Số lần thử lại tối đa
-            
+            enough: Callback dừng đọc sớm (None = theo HTML_EARLY_STOP)
+        
+        Returns:
+            HTML content (có thể chỉ là phần đầu trang) hoặc None nếu lỗi
+        """
+        page = await self.fetch_page(url, max_retries, enough)
+        return page.text if page else None
+    
+    async def fetch_page(self, url: str, max_retries: int = None,
+                         enough: Optional[EnoughCallback] = None) -> Optional[HtmlBody]:
+        """
+        Lấy trang từ URL (cả bytes gốc và text)
+        
+        Body được đọc theo luồng, tối đa HTML_MAX_BYTES; response không phải
+        HTML (video, file...) bị bỏ ngay mà không đọc body và không thử lại.
+        Mỗi lần gửi đều lấy token từ bucket của host; host đang mở circuit
+        hoặc phải chờ quá lâu thì bỏ ngay. Khi bật HEDGE_ENABLED, request
+        chậm có header hơn p95 của host được gửi thêm một bản (xem _send).
+        
+        Args:
+            url: URL cần lấy
+            max_retries: Số lần thử lại tối đa
+            enough: Callback dừng đọc sớm (None = theo HTML_EARLY_STOP)
+        
         Returns:
-            HTML content hoặc None nếu lỗi
+            HtmlBody hoặc None nếu lỗi
         """
         if max_retries is None:
             max_retries = Config.MAX_RETRIES
         
-        if not self.session:
+        if not self.session and self.http_client:
+            self.session = self.http_client.session
+        elif not self.session:
             # Tạo connector với SSL verification disabled cho một số trang web
             connector = aiohttp.TCPConnector(ssl=False, limit=100, limit_per_host=30)
             self.session = aiohttp.ClientSession(
@@ -56,90 +118,207 @@ class BaseScraper(ABC):
                 connector=connector
             )
         
+        # Trang vừa tải/xác nhận thì dùng luôn, bản cũ hơn được hỏi lại có điều kiện
+        cached = await self.page_cache.get(url) if self.page_cache else None
+        if cached is not None and self.page_cache.is_fresh(cached):
+            # Bản trong cache còn mới được tải thành công gần đây
+            if self.http_client:
+                self.http_client.record_status(url, 200)
+            return cached.html_body()
+        
+        host = host_of(url)
+        # Số request thực sự đã gửi (vòng lặp có thể dừng trước khi gửi lần thử)
+        sent = 0
         for attempt in range(max_retries + 1):
+            if deadline_expired():
+                self.logger.warning(f"Hết thời gian của yêu cầu, dừng lấy {url}")
+                break
+            # Chờ trước lần thử kế tiếp (bị 403/429 thì limiter đã tự giãn nhịp)
+            backoff = 2 ** attempt
             try:
                 self.logger.info(f"Đang lấy HTML từ: {url} (lần thử {attempt + 1})")
                 
-                # Thêm delay ngẫu nhiên để tránh bị chặn
-                if attempt > 0:
-                    import random
-                    delay = random.uniform(1, 3)
-                    await asyncio.sleep(delay)
+                # Chờ tới lượt theo tốc độ hiện tại của host (chung cho mọi request)
+                await self.limiter.acquire(host)
                 
-                async with self.session.get(
-                    url, 
-                    allow_redirects=True,
-                    timeout=aiohttp.ClientTimeout(total=45)
-                ) as response:
+                sent += 1
+                response = await self._send(url, host, clamp_timeout(45),
+                                            cached.conditional_headers() if cached else None)
+                async with response:
+                    self.limiter.record(host, response.status, response.headers.get('Retry-After'))
+                    if self.http_client:
+                        self.http_client.record_status(url, response.status)
+                    if response.status == 304 and cached is not None:
+                        await self.page_cache.mark_revalidated(cached, response.headers)
+                        self.logger.info(f"Trang không đổi (304), dùng bản trong cache: {url}")
+                        return cached.html_body()
                     if response.status == 200:
-                        html = await response.text(encoding='utf-8')
+                        check = enough
+                        if check is None and Config.HTML_EARLY_STOP:
+                            check = self.early_stop_check()
+                        page = await read_html(response, Config.HTML_MAX_BYTES, check)
+                        if page.truncated:
+                            self.logger.warning(f"Trang vượt {Config.HTML_MAX_BYTES} bytes, chỉ dùng phần đầu: {url}")
+                        elif page.stopped_early:
+                            self.logger.info(f"Phần đầu trang đã đủ link, dừng đọc sau {len(page.body)} bytes: {url}")
+                        elif self.page_cache:
+                            await self.page_cache.put(url, page.body, page.encoding, response.headers, cached)
                         self.logger.info(f"Lấy HTML thành công từ: {url}")
-                        return html
-                    elif response.status in [403, 429]:
+                        return page
+                    elif response.status in THROTTLE_STATUSES:
                         self.logger.warning(f"Bị chặn truy cập: HTTP {response.status} từ {url}")
-                        # Tăng delay khi bị chặn
-                        await asyncio.sleep(5 * (attempt + 1))
+                        # Limiter đã giảm tốc độ của host, lần thử sau chờ ở acquire()
+                        backoff = 0
+                    elif response.status in (404, 410):
+                        # Trang không tồn tại: thử lại cũng không có
+                        self.logger.warning(f"HTTP {response.status} từ {url}, không thử lại")
+                        return None
                     else:
                         self.logger.warning(f"HTTP {response.status} từ {url}")
-                        
+            
+            except HostUnavailableError as e:
+                self.logger.warning(f"Bỏ qua {url}: {e}")
+                return None
+            except asyncio.CancelledError:
+                self.limiter.release(host)
+                raise
+            except NonHtmlContent as e:
+                self.logger.warning(str(e))
+                return None
             except asyncio.TimeoutError:
+                self.limiter.record_failure(host)
                 self.logger.warning(f"Timeout khi lấy {url} (lần thử {attempt + 1})")
             except aiohttp.ClientError as e:
+                self.limiter.record_failure(host)
                 self.logger.error(f"Lỗi client khi lấy {url}: {e} (lần thử {attempt + 1})")
             except Exception as e:
+                self.limiter.record_failure(host)
                 self.logger.error(f"Lỗi không xác định khi lấy {url}: {e} (lần thử {attempt + 1})")
             
-            if attempt < max_retries:
-                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+            if attempt == max_retries:
+                break
+            # Retry dùng chung ngân sách của cả yêu cầu và phải kịp trước deadline
+            if not allow_retry(backoff):
+                self.logger.warning(f"Hết ngân sách thử lại hoặc thời gian của yêu cầu, dừng lấy {url}")
+                break
+            if backoff:
+                await asyncio.sleep(backoff)  # Exponential backoff
         
-        self.logger.error(f"Không thể lấy HTML từ {url} sau {max_retries + 1} lần thử")
+        self.logger.error(f"Không thể lấy HTML từ {url} sau {sent} lần thử")
         return None
     
+    async def _send(self, url: str, host: str, timeout: float,
+                    headers: Optional[Dict[str, str]] = None) -> aiohttp.ClientResponse:
+        """
+        Gửi GET và trả response khi đã có header, hedge nếu request đầu chậm
+        
+        Request hedge chỉ được gửi khi limiter của host còn token ngay lúc đó,
+        và đi trên kết nối mới nếu HEDGE_FRESH_CONNECTION.
+        """
+        async def send(fresh: bool) -> aiohttp.ClientResponse:
+            session = self.session
+            if fresh and Config.HEDGE_FRESH_CONNECTION and self.http_client:
+                session = self.http_client.fresh_session
+            return await session.get(url, allow_redirects=True, headers=headers,
+                                     timeout=aiohttp.ClientTimeout(total=timeout))
+        
+        return await self.hedger.first_response(
+            host, send, discard=lambda response: response.release(),
+            allow=lambda: self.limiter.try_acquire(host)
+        )
+    
+    def early_stop_check(self) -> Optional[EnoughCallback]:
+        """
+        Tạo callback dừng đọc trang khi phần đầu đã thoả EXTRACTION_SUFFICIENCY
+        
+        Mỗi lần gọi callback chỉ quét phần text mới (kèm một đoạn chồng lấn),
+        link đã thấy được giữ lại giữa các lần gọi.
+        
+        Returns:
+            Callback hoặc None nếu scraper không khai báo EARLY_STOP_PROFILE
+        """
+        rule = SufficiencyRule.parse(Config.EXTRACTION_SUFFICIENCY)
+        if not self.EARLY_STOP_PROFILE or not rule.enabled:
+            return None
+        
+        matcher = get_matcher(self.EARLY_STOP_PROFILE)
+        links: Dict[str, Dict[str, str]] = {}
+        
+        def enough(text: str) -> bool:
+            for url in matcher.urls(text):
+                if url not in links and self.is_video_url(url):
+                    links[url] = self.stream_info_for(url)
+            return rule.is_satisfied(list(links.values()))
+        
+        return enough
+    
     def parse_html(self, html: str) -> BeautifulSoup:
         """
         Parse HTML với BeautifulSoup
         
         Args:
             html: HTML content
-            
+        
         Returns:
             BeautifulSoup object
         """
         return BeautifulSoup(html, 'lxml')
     
-    def extract_video_urls(self, soup: BeautifulSoup) -> List[str]:
+    def parse_elements(self, html: str) -> PageElements:
+        """
+        Parse trang một lượt, chỉ giữ các thẻ cần cho trích xuất
+        (video, source, iframe, a[href], script) theo HTML_PARSER_BACKEND
+        
+        Args:
+            html: HTML content
+            
+        Returns:
+            PageElements
+        """
+        return parse_elements(html)
+    
+    async def parse_page(self, body: bytes, encoding: Optional[str]) -> ParsedPage:
+        """
+        Parse trang (và quét script theo SCRIPT_PROFILE) qua CPU pool
+        
+        Args:
+            body: Nội dung gốc
+            encoding: Encoding của body
+            
+        Returns:
+            ParsedPage
+        """
+        return await get_cpu_pool().run(
+            parse_page, body, encoding, Config.HTML_PARSER_BACKEND, self.SCRIPT_PROFILE, size=len(body)
+        )
+    
+    def extract_video_urls(self, page: PageElements) -> List[str]:
         """
-        Trích xuất URLs video từ HTML
+        Trích xuất URLs video từ các thẻ đã parse
         
         Args:
-            soup: BeautifulSoup object
+            page: PageElements của trang
             
         Returns:
             List các URLs video
         """
         video_urls = []
         
-        # Tìm trong các thẻ video
-        for video in soup.find_all('video'):
-            src = video.get('src')
-            if src and self.is_video_url(src):
-                video_urls.append(src)
-        
-        # Tìm trong các thẻ source
-        for source in soup.find_all('source'):
-            src = source.get('src')
+        # Tìm trong các thẻ video và source
+        for element in page.videos + page.sources:
+            src = element.get('src')
             if src and self.is_video_url(src):
                 video_urls.append(src)
         
         # Tìm trong các thẻ iframe
-        for iframe in soup.find_all('iframe'):
+        for iframe in page.iframes:
             src = iframe.get('src')
-            if src and any(host in src for host in Config.VIDEO_HOSTS):
+            if src and classify_url(src).host:
                 video_urls.append(src)
         
         # Tìm trong các thẻ a có chứa link video
-        for link in soup.find_all('a', href=True):
-            href = link['href']
+        for link in page.anchors:
+            href = link.get('href')
             if self.is_video_url(href):
                 video_urls.append(href)
         
@@ -151,28 +330,18 @@ class BaseScraper(ABC):
         
         Args:
             url: URL cần kiểm tra
-            
+        
         Returns:
             True nếu là video URL
         """
         if not url:
             return False
         
-        url_lower = url.lower()
-        
-        # Kiểm tra extension
-        for ext in Config.VIDEO_FORMATS:
-            if ext in url_lower:
-                return True
-        
-        # Kiểm tra video hosts
-        for host in Config.VIDEO_HOSTS:
-            if host in url_lower:
-                return True
-        
-        return False
+        # Kiểm tra extension và video hosts
+        return classify_url(url).is_video
     
-    def format_stream_info(self, url: str, quality: str = "Unknown", source: str = "Unknown") -> Dict[str, str]:
+    def format_stream_info(self, url: str, quality: str = "Unknown", source: str = "Unknown",
+                           stream_type: Optional[str] = None) -> Dict[str, str]:
         """
         Format thông tin stream
         
@@ -180,15 +349,37 @@ class BaseScraper(ABC):
             url: Stream URL
             quality: Chất lượng video
             source: Nguồn video
-            
+            stream_type: Loại stream (HLS, MP4...)
+        
         Returns:
             Dict chứa thông tin stream
         """
-        return {
+        info = {
             'url': url,
             'quality': quality,
             'source': source
         }
+        if stream_type:
+            info['type'] = stream_type
+        return info
+    
+    def stream_info_for(self, url: str) -> Dict[str, str]:
+        """
+        Tạo thông tin stream với chất lượng, nguồn và loại lấy từ classifier
+        
+        Args:
+            url: Stream URL
+        
+        Returns:
+            Dict chứa thông tin stream
+        """
+        info = classify_url(url)
+        return self.format_stream_info(
+            url=url,
+            quality=info.quality,
+            source=info.source or 'Unknown',
+            stream_type=info.type
+        )
     
     @abstractmethod
     async def extract_stream_links(self, url: str) -> List[Dict[str, str]]:
@@ -197,7 +388,7 @@ class BaseScraper(ABC):
         
         Args:
             url: URL trang phim
-            
+        
         Returns:
             List các stream links với thông tin
         """
@@ -58,6 +58,9 @@ class DemoScraper:
             # Trả về 2-3 link ngẫu nhiên
             num_links = random.randint(2, 3)
             selected_links = random.sample(demo_links, num_links)
+            # Đánh dấu để service không cache như kết quả thật
+            for link in selected_links:
+                link['demo'] = 'true'
             
             self.logger.info(f"Demo: Tạo thành công {len(selected_links)} link mẫu")
             return selected_links
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Document store theo từng lượt trích xuất: mỗi URL chỉ tải một lần
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+class Document:
+    """Nội dung một URL đã tải (bytes gốc + text giải mã một lần)"""
+    
+    __slots__ = ('url', 'status', 'body', 'encoding', 'headers', '_text')
+    
+    def __init__(self, url: str, status: int, body: bytes, encoding: Optional[str] = None,
+                 headers: Optional[Dict[str, str]] = None, text: Optional[str] = None):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.encoding = encoding or 'utf-8'
+        self.headers = headers or {}
+        self._text: Optional[str] = text
+    
+    @property
+    def ok(self) -> bool:
+        """True nếu HTTP 200"""
+        return self.status == 200
+    
+    @property
+    def size(self) -> int:
+        """Số bytes của body"""
+        return len(self.body)
+    
+    @property
+    def text(self) -> str:
+        """Body đã giải mã (chỉ giải mã lần đầu truy cập)"""
+        if self._text is None:
+            try:
+                self._text = self.body.decode(self.encoding, errors='replace')
+            except LookupError:
+                self._text = self.body.decode('utf-8', errors='replace')
+        return self._text
+
+DocumentFetcher = Callable[[str, float], Awaitable[Optional[Document]]]
+
+class DocumentStore:
+    """
+    Kho tài liệu cho một lượt trích xuất
+    
+    Mọi strategy xin tài liệu qua `get()`; URL được tải đúng một lần kể cả
+    khi nhiều strategy yêu cầu đồng thời, các lần sau dùng lại cùng bytes/text.
+    """
+    
+    def __init__(self, fetcher: DocumentFetcher):
+        """
+        Khởi tạo store
+        
+        Args:
+            fetcher: Coroutine function (url, timeout) -> Document hoặc None
+        """
+        self.logger = logging.getLogger(__name__)
+        self._fetcher = fetcher
+        self._documents: Dict[str, asyncio.Future] = {}
+        self.origin_hits = 0
+        self.store_hits = 0
+        self.bytes_fetched = 0
+        self.bytes_saved = 0
+    
+    async def get(self, url: str, timeout: float) -> Optional[Document]:
+        """
+        Lấy tài liệu, tải từ origin nếu chưa có
+        
+        Args:
+            url: URL cần lấy
+            timeout: Timeout cho lần tải đầu tiên (giây)
+        
+        Returns:
+            Document (có thể status khác 200) hoặc None nếu lỗi kết nối
+        """
+        future = self._documents.get(url)
+        if future is not None:
+            try:
+                document = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Lần tải gốc bị huỷ (không phải strategy này) thì tự tải lại
+                if future.cancelled() and self._documents.get(url) is not future:
+                    return await self.get(url, timeout)
+                raise
+            self.store_hits += 1
+            if document is not None:
+                self.bytes_saved += document.size
+            return document
+        
+        future = asyncio.get_running_loop().create_future()
+        self._documents[url] = future
+        self.origin_hits += 1
+        
+        try:
+            document = await self._fetcher(url, timeout)
+        except asyncio.CancelledError:
+            # Cho phép strategy khác thử tải lại
+            del self._documents[url]
+            future.cancel()
+            raise
+        except Exception as e:
+            self.logger.warning(f"Không thể tải {url}: {e}")
+            document = None
+        
+        if document is not None:
+            self.bytes_fetched += document.size
+        future.set_result(document)
+        return document
+    
+    def __contains__(self, url: str) -> bool:
+        """True nếu URL đã được tải hoặc đang được tải"""
+        return url in self._documents
+    
+    def peek(self, url: str) -> Optional[Document]:
+        """Lấy tài liệu đã tải xong mà không kích hoạt fetch"""
+        future = self._documents.get(url)
+        if future is None or not future.done() or future.cancelled():
+            return None
+        return future.result()
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Thống kê của store
+        
+        Returns:
+            Dict gồm số lần tải từ origin, số lần dùng lại và số bytes
+        """
+        return {
+            'origin_hits': self.origin_hits,
+            'store_hits': self.store_hits,
+            'bytes_fetched': self.bytes_fetched,
+            'bytes_saved': self.bytes_saved,
+        }
@@ -4,14 +4,25 @@
 Enhanced scraper với nhiều phương pháp trích xuất
 """
 
+import aiohttp
+import asyncio
 import requests
-import trafilatura
-import re
 import logging
-import time
-from typing import List, Dict, Optional
-from urllib.parse import urlparse, urljoin, unquote
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Mapping, Optional
+from urllib.parse import urljoin, unquote
 import urllib3
+from config import Config
+from scrapers.document_store import Document, DocumentStore
+from scrapers.strategy_scheduler import StrategyScheduler
+from utils.cpu_pool import get_cpu_pool, match_urls
+from utils.deadline import check_deadline, clamp_timeout
+from utils.host_limiter import HostLimiter
+from utils.host_performance import host_of
+from utils.html_reader import HtmlBody, NonHtmlContent, read_html, read_html_sync
+from utils.http_client import HttpClient
+from utils.page_cache import CachedPage
+from utils.url_classifier import classify_url, stream_sort_key
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -19,201 +30,342 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 class EnhancedScraper:
     """Enhanced scraper với multiple strategies"""
     
-    def __init__(self):
+    MODE_ASYNC = "async"
+    MODE_EXECUTOR = "executor"
+    
+    # Common hosting URL patterns for tvhay.fm
+    COMMON_HOST_SUFFIXES = ('/embed', '/player', '/stream')
+    
+    # Updated headers to mimic real browser
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+        'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Cache-Control': 'no-cache',
+        'Pragma': 'no-cache',
+        'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+        'Sec-Ch-Ua-Mobile': '?0',
+        'Sec-Ch-Ua-Platform': '"Windows"',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+        'Upgrade-Insecure-Requests': '1',
+        'Connection': 'keep-alive',
+    }
+    
+    # Executor dùng chung cho chế độ executor (giới hạn số thread blocking)
+    _executor: Optional[ThreadPoolExecutor] = None
+    
+    def __init__(self, mode: str = None, http_client: Optional[HttpClient] = None):
+        """
+        Khởi tạo scraper
+        
+        Args:
+            mode: "async" (aiohttp, mặc định) hoặc "executor" (requests chạy
+                  trong thread pool giới hạn)
+            http_client: HTTP client dùng chung (nếu None sẽ tự tạo session riêng)
+        """
         self.logger = logging.getLogger(__name__)
-        self.session = requests.Session()
-        self.session.verify = False  # Disable SSL verification
+        self.mode = (mode or Config.ENHANCED_SCRAPER_MODE).lower()
+        if self.mode not in (self.MODE_ASYNC, self.MODE_EXECUTOR):
+            raise ValueError(f"Chế độ scraper không hợp lệ: {self.mode}")
+        
+        self.http_client = http_client
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.sync_session: Optional[requests.Session] = None
+        self.limiter = http_client.limiter if http_client else HostLimiter()
+        self.page_cache = http_client.page_cache if http_client and http_client.page_cache.enabled else None
+        
+        if self.mode == self.MODE_EXECUTOR and http_client:
+            self.sync_session = http_client.sync_session
+        elif self.mode == self.MODE_EXECUTOR:
+            self.sync_session = requests.Session()
+            self.sync_session.verify = False  # Disable SSL verification
+            self.sync_session.headers.update(self.HEADERS)
+    
+    async def __aenter__(self):
+        """Async context manager entry"""
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit"""
+        await self.close()
+    
+    async def close(self):
+        """Đóng các session đang mở"""
+        # Session dùng chung thuộc về HttpClient, không đóng ở đây
+        if self.http_client:
+            self.session = None
+            self.sync_session = None
+            return
+        if self.session:
+            await self.session.close()
+            self.session = None
+        if self.sync_session:
+            self.sync_session.close()
+            self.sync_session = None
+    
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """Lấy thread pool dùng chung cho chế độ executor"""
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=Config.ENHANCED_EXECUTOR_WORKERS,
+                thread_name_prefix="enhanced-scraper"
+            )
+        return cls._executor
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Tạo aiohttp session khi cần"""
+        if not self.session and self.http_client:
+            self.session = self.http_client.session
+        elif not self.session:
+            connector = aiohttp.TCPConnector(ssl=False, limit=100, limit_per_host=30)
+            self.session = aiohttp.ClientSession(
+                headers=self.HEADERS,
+                connector=connector
+            )
+        return self.session
+    
+    async def fetch_document(self, url: str, timeout: float) -> Optional[Document]:
+        """
+        Tải một URL mà không chặn event loop (fetcher cho DocumentStore)
+        
+        Args:
+            url: URL cần lấy
+            timeout: Timeout (giây)
         
-        # Updated headers to mimic real browser
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'vi-VN,vi;q=0.9,en-US;q=0.8,en;q=0.7',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Cache-Control': 'no-cache',
-            'Pragma': 'no-cache',
-            'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-            'Sec-Ch-Ua-Mobile': '?0',
-            'Sec-Ch-Ua-Platform': '"Windows"',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'Upgrade-Insecure-Requests': '1',
-            'Connection': 'keep-alive',
-        })
+        Returns:
+            Document chứa status, bytes và encoding
+        """
+        if self.http_client:
+            # Các lượt trích xuất đồng thời (vd: cùng iframe/embed) dùng chung một lần tải
+            return await self.http_client.flights.do(url, lambda: self._fetch_document(url, timeout))
+        return await self._fetch_document(url, timeout)
+    
+    async def _fetch_document(self, url: str, timeout: float) -> Optional[Document]:
+        """
+        Tải URL theo mode đã chọn, qua bucket/circuit của host
+        
+        Host đang bị giới hạn thì raise HostUnavailableError, yêu cầu đã hết
+        thời gian thì raise DeadlineExceeded ngay (store trả None).
+        """
+        check_deadline()
+        # Trang vừa tải/xác nhận (vd: bởi lượt khác) thì không gửi request
+        cached = await self.page_cache.get(url) if self.page_cache else None
+        if cached is not None and self.page_cache.is_fresh(cached):
+            # Bản trong cache còn mới được tải thành công gần đây
+            if self.http_client:
+                self.http_client.record_status(url, 200)
+            return self._cached_document(url, cached, {})
+        
+        host = host_of(url)
+        await self.limiter.acquire(host)
+        # Cắt timeout theo deadline (tính ở đây vì thread của executor không có context)
+        timeout = clamp_timeout(timeout)
+        try:
+            if self.mode == self.MODE_EXECUTOR:
+                loop = asyncio.get_running_loop()
+                document = await loop.run_in_executor(
+                    self._get_executor(), self._fetch_document_sync, url, timeout, cached
+                )
+            else:
+                document = await self._fetch_document_async(url, timeout, cached)
+        except NonHtmlContent as e:
+            self.limiter.record(host, e.status)
+            raise
+        except asyncio.CancelledError:
+            self.limiter.release(host)
+            raise
+        except Exception:
+            self.limiter.record_failure(host)
+            raise
+        self.limiter.record(host, document.status, document.headers.get('Retry-After'))
+        if self.http_client:
+            self.http_client.record_status(url, document.status)
+        return document
+    
+    async def _fetch_document_async(self, url: str, timeout: float,
+                                    cached: Optional[CachedPage] = None) -> Document:
+        """Tải URL bằng aiohttp (có điều kiện nếu đã có bản trong cache)"""
+        session = self._get_session()
+        async with session.get(
+            url,
+            headers=self._request_headers(cached),
+            allow_redirects=True,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            if response.status == 304 and cached is not None:
+                await self.page_cache.mark_revalidated(cached, response.headers)
+                return self._cached_document(url, cached, response.headers)
+            # Đọc theo luồng: content-type không phải HTML raise NonHtmlContent (store trả None)
+            page = await read_html(response, Config.HTML_MAX_BYTES)
+            if response.status == 200 and self.page_cache and not page.truncated:
+                await self.page_cache.put(url, page.body, page.encoding, response.headers, cached)
+            return self._document(url, response.status, page, response.headers)
+    
+    def _fetch_document_sync(self, url: str, timeout: float,
+                             cached: Optional[CachedPage] = None) -> Document:
+        """Phiên bản blocking của fetch_document, chỉ chạy trong executor"""
+        with self.sync_session.get(url, headers=self._request_headers(cached),
+                                   timeout=timeout, stream=True) as response:
+            if response.status_code == 304 and cached is not None:
+                self.page_cache.revalidated(cached, response.headers)
+                return self._cached_document(url, cached, response.headers)
+            page = read_html_sync(response, Config.HTML_MAX_BYTES)
+            if response.status_code == 200 and self.page_cache and not page.truncated:
+                self.page_cache.store(url, page.body, page.encoding, response.headers, cached)
+            return self._document(url, response.status_code, page, response.headers)
+    
+    def _request_headers(self, cached: Optional[CachedPage]) -> Dict[str, str]:
+        """Header của request, kèm If-None-Match/If-Modified-Since khi có bản trong cache"""
+        if cached is None:
+            return self.HEADERS
+        return {**self.HEADERS, **cached.conditional_headers()}
+    
+    def _cached_document(self, url: str, cached: CachedPage, headers: Mapping[str, str]) -> Document:
+        """Document từ bản trong cache (trang không đổi)"""
+        return Document(
+            url=url,
+            status=200,
+            body=cached.body,
+            encoding=cached.encoding,
+            headers=dict(headers),
+            text=cached.text
+        )
+    
+    def _document(self, url: str, status: int, page: HtmlBody, headers: Mapping[str, str]) -> Document:
+        """Tạo Document từ phần body đã đọc (text đã giải mã sẵn)"""
+        if page.truncated:
+            self.logger.warning(f"Trang vượt {Config.HTML_MAX_BYTES} bytes, chỉ dùng phần đầu: {url}")
+        return Document(
+            url=url,
+            status=status,
+            body=page.body,
+            encoding=page.encoding,
+            headers=dict(headers),
+            text=page.text
+        )
+    
+    async def _get_document(self, store: DocumentStore, url: str, timeout: float) -> Optional[Document]:
+        """Lấy tài liệu từ store, None nếu HTTP status khác 200"""
+        document = await store.get(url, timeout)
+        if document is None:
+            return None
+        if not document.ok:
+            self.logger.warning(f"HTTP {document.status} từ {url}")
+            return None
+        return document
+    
+    async def _match(self, document: Document, profile: str) -> List[str]:
+        """Quét link qua CPU pool (gửi bytes gốc, không chặn event loop với trang lớn)"""
+        return await get_cpu_pool().run(
+            match_urls, document.body, document.encoding, profile, size=document.size
+        )
     
-    def extract_all_streams(self, url: str) -> List[Dict[str, str]]:
+    async def extract_all_streams(self, url: str, store: Optional[DocumentStore] = None) -> List[Dict[str, str]]:
         """
         Trích xuất tất cả streaming links từ URL
         
         Args:
             url: URL trang phim
-            
+            store: Document store của lượt trích xuất (tạo mới nếu None)
+        
         Returns:
             List các streaming links
         """
-        all_links = []
-        
-        # Method 1: Trafilatura
-        trafilatura_links = self._extract_with_trafilatura(url)
-        all_links.extend(trafilatura_links)
+        if store is None:
+            store = DocumentStore(self.fetch_document)
         
-        # Method 2: Direct requests
-        requests_links = self._extract_with_requests(url)
-        all_links.extend(requests_links)
+        # Các strategy chạy đồng thời; probes /embed, /player, /stream là các strategy riêng
+        strategies = {
+            'trafilatura': lambda: self._extract_with_trafilatura(url, store),
+            'requests': lambda: self._extract_with_requests(url, store),
+        }
+        for suffix in self.COMMON_HOST_SUFFIXES:
+            strategies[f"common{suffix}"] = (
+                lambda suffix=suffix: self._extract_common_host(url, suffix, store)
+            )
         
-        # Method 3: Common video hosting patterns
-        hosting_links = self._extract_common_hosts(url)
-        all_links.extend(hosting_links)
+        scheduler = StrategyScheduler()
+        all_links = await scheduler.run(strategies)
         
         # Remove duplicates and sort
         unique_links = self._process_links(all_links)
         
         self.logger.info(f"Tổng cộng tìm thấy {len(unique_links)} unique streaming links")
+        self.logger.info(f"Document store: {store.stats()}, scheduler: {scheduler.last_stats}")
         return unique_links
     
-    def _extract_with_trafilatura(self, url: str) -> List[Dict[str, str]]:
-        """Sử dụng trafilatura để trích xuất"""
+    async def _extract_with_trafilatura(self, url: str, store: DocumentStore) -> List[Dict[str, str]]:
+        """Quét link trực tiếp trên HTML gốc (trước đây tải qua trafilatura)"""
         try:
             self.logger.info(f"Trafilatura: Đang trích xuất từ {url}")
             
-            downloaded = trafilatura.fetch_url(url)
-            if not downloaded:
+            document = await self._get_document(store, url, Config.REQUEST_TIMEOUT)
+            if not document or not document.body:
                 return []
             
             links = []
             
-            # Enhanced patterns for video detection
-            patterns = [
-                # Direct video files
-                r'(https?://[^\s"\'<>]+\.(?:mp4|m3u8|mkv|avi|mov|wmv|flv|webm)(?:\?[^\s"\'<>]*)?)',
-                
-                # Streaming services
-                r'(https?://(?:www\.)?streamtape\.com/[^\s"\'<>]+)',
-                r'(https?://(?:www\.)?doodstream\.com/[^\s"\'<>]+)',
-                r'(https?://(?:www\.)?mixdrop\.co/[^\s"\'<>]+)',
-                r'(https?://(?:www\.)?upstream\.to/[^\s"\'<>]+)',
-                r'(https?://(?:www\.)?filesupload\.org/[^\s"\'<>]+)',
-                r'(https?://(?:www\.)?streamlare\.com/[^\s"\'<>]+)',
-                r'(https?://(?:www\.)?supervideo\.tv/[^\s"\'<>]+)',
-                
-                # Embedded players
-                r'(?:player|embed|iframe)[^"\']*["\']([^"\']*(?:\.mp4|\.m3u8|streamtape|doodstream|mixdrop)[^"\']*)["\']',
-                r'(?:src|url|file)[^"\']*["\']([^"\']*(?:\.mp4|\.m3u8|streamtape|doodstream|mixdrop)[^"\']*)["\']',
-                
-                # Base64 or encoded URLs
-                r'(?:data-src|data-url)[^"\']*["\']([^"\']+)["\']',
-            ]
-            
-            for pattern in patterns:
-                matches = re.findall(pattern, downloaded, re.IGNORECASE | re.MULTILINE)
-                for match in matches:
-                    if isinstance(match, tuple):
-                        match = match[0]
-                    
-                    if self._is_valid_stream_url(match):
-                        links.append(self._create_link_info(match, url))
+            for match in await self._match(document, 'enhanced_raw'):
+                if self._is_valid_stream_url(match):
+                    links.append(self._create_link_info(match, url))
             
             self.logger.info(f"Trafilatura tìm thấy {len(links)} links")
             return links
-            
+        
         except Exception as e:
             self.logger.error(f"Lỗi trafilatura: {e}")
             return []
     
-    def _extract_with_requests(self, url: str) -> List[Dict[str, str]]:
-        """Sử dụng requests để trích xuất"""
+    async def _extract_with_requests(self, url: str, store: DocumentStore) -> List[Dict[str, str]]:
+        """Quét link bằng các pattern nâng cao trên cùng tài liệu"""
         try:
             self.logger.info(f"Requests: Đang trích xuất từ {url}")
             
-            # Add delay to avoid being blocked
-            time.sleep(2)
+            # Chỉ chờ khi strategy này là bên tải trang (tránh bị chặn)
+            if url not in store:
+                await asyncio.sleep(Config.ENHANCED_REQUEST_DELAY)
             
-            response = self.session.get(url, timeout=30)
-            if response.status_code != 200:
-                self.logger.warning(f"HTTP {response.status_code} từ {url}")
+            document = await self._get_document(store, url, 30)
+            if document is None:
                 return []
             
-            content = response.text
             links = []
             
-            # Advanced patterns
-            patterns = [
-                # JavaScript variable assignments
-                r'(?:videoUrl|streamUrl|playerUrl|fileUrl)\s*[=:]\s*["\']([^"\']+)["\']',
-                r'(?:src|source|url|file)\s*[=:]\s*["\']([^"\']*(?:\.mp4|\.m3u8|streamtape|doodstream|mixdrop)[^"\']*)["\']',
-                
-                # JSON-like structures
-                r'"(?:url|src|file|source)"\s*:\s*"([^"]+)"',
-                r"'(?:url|src|file|source)'\s*:\s*'([^']+)'",
-                
-                # Iframe sources
-                r'<iframe[^>]+src=["\']([^"\']+)["\'][^>]*>',
-                
-                # Video tags
-                r'<video[^>]+src=["\']([^"\']+)["\'][^>]*>',
-                r'<source[^>]+src=["\']([^"\']+)["\'][^>]*>',
-                
-                # Direct links in text
-                r'(https?://[^\s"\'<>()]+\.(?:mp4|m3u8|mkv|avi|mov)(?:\?[^\s"\'<>()]*)?)',
-                
-                # Hosting services
-                r'(https?://(?:[a-zA-Z0-9-]+\.)?(?:streamtape|doodstream|mixdrop|upstream|filesupload|streamlare|supervideo)\.(?:com|co|tv|org)/[^\s"\'<>()]+)',
-            ]
-            
-            for pattern in patterns:
-                matches = re.findall(pattern, content, re.IGNORECASE | re.MULTILINE)
-                for match in matches:
-                    if isinstance(match, tuple):
-                        match = match[0]
-                    
-                    # Clean and validate URL
-                    clean_url = self._clean_url(match, url)
-                    if clean_url and self._is_valid_stream_url(clean_url):
-                        links.append(self._create_link_info(clean_url, url))
+            for match in await self._match(document, 'enhanced_advanced'):
+                # Clean and validate URL
+                clean_url = self._clean_url(match, url)
+                if clean_url and self._is_valid_stream_url(clean_url):
+                    links.append(self._create_link_info(clean_url, url))
             
             self.logger.info(f"Requests tìm thấy {len(links)} links")
             return links
-            
+        
         except Exception as e:
             self.logger.error(f"Lỗi requests: {e}")
             return []
     
-    def _extract_common_hosts(self, url: str) -> List[Dict[str, str]]:
-        """Tìm kiếm các hosting phổ biến"""
+    async def _extract_common_host(self, url: str, suffix: str, store: DocumentStore) -> List[Dict[str, str]]:
+        """Tìm embedded players ở một đường dẫn hosting phổ biến (vd: /embed)"""
+        test_url = f"{url.rstrip('/')}{suffix}"
+        links = []
         try:
-            # Common hosting URL patterns for tvhay.fm
-            common_patterns = [
-                f"{url.rstrip('/')}/embed",
-                f"{url.rstrip('/')}/player",
-                f"{url.rstrip('/')}/stream",
-            ]
-            
-            links = []
-            for test_url in common_patterns:
-                try:
-                    response = self.session.get(test_url, timeout=15)
-                    if response.status_code == 200:
-                        content = response.text
-                        
-                        # Look for embedded players
-                        iframe_pattern = r'<iframe[^>]+src=["\']([^"\']+)["\']'
-                        matches = re.findall(iframe_pattern, content, re.IGNORECASE)
-                        
-                        for match in matches:
-                            clean_url = self._clean_url(match, test_url)
-                            if clean_url and self._is_valid_stream_url(clean_url):
-                                links.append(self._create_link_info(clean_url, url))
-                
-                except:
-                    continue
-            
-            return links
-            
+            document = await self._get_document(store, test_url, 15)
+            if document is not None:
+                # Look for embedded players
+                for match in await self._match(document, 'iframe'):
+                    clean_url = self._clean_url(match, test_url)
+                    if clean_url and self._is_valid_stream_url(clean_url):
+                        links.append(self._create_link_info(clean_url, url))
+        
         except Exception as e:
-            self.logger.error(f"Lỗi common hosts: {e}")
-            return []
+            self.logger.error(f"Lỗi common hosts ({suffix}): {e}")
+        
+        return links
     
     def _clean_url(self, url: str, base_url: str) -> Optional[str]:
         """Clean và normalize URL"""
@@ -241,7 +393,7 @@ class EnhancedScraper:
                     return base_part
             
             return url
-            
+        
         except Exception:
             return None
     
@@ -250,92 +402,26 @@ class EnhancedScraper:
         if not url or len(url) < 10:
             return False
         
-        url_lower = url.lower()
-        
-        # Video file extensions
-        video_exts = ['.mp4', '.m3u8', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm']
-        if any(ext in url_lower for ext in video_exts):
-            return True
-        
-        # Streaming hosts
-        hosts = [
-            'streamtape.com', 'doodstream.com', 'mixdrop.co', 'upstream.to',
-            'filesupload.org', 'streamlare.com', 'supervideo.tv',
-            'vidcloud.co', 'fembed.com', 'embedgram.com'
-        ]
-        if any(host in url_lower for host in hosts):
-            return True
-        
-        return False
+        # Video file extensions hoặc streaming hosts
+        return classify_url(url).is_video
     
     def _create_link_info(self, url: str, source_url: str) -> Dict[str, str]:
         """Tạo thông tin link"""
+        info = classify_url(url)
         return {
             'url': url,
-            'quality': self._detect_quality(url),
-            'source': self._detect_source(url),
-            'type': self._detect_type(url)
+            'quality': info.quality,
+            'source': info.source or 'Unknown',
+            'type': info.type
         }
     
-    def _detect_quality(self, url: str) -> str:
-        """Phát hiện chất lượng"""
-        url_lower = url.lower()
-        
-        if any(q in url_lower for q in ['2160p', '4k', 'uhd']):
-            return '4K'
-        elif any(q in url_lower for q in ['1080p', 'fhd', 'fullhd']):
-            return '1080p'
-        elif any(q in url_lower for q in ['720p', 'hd']):
-            return '720p'
-        elif any(q in url_lower for q in ['480p', 'sd']):
-            return '480p'
-        elif '360p' in url_lower:
-            return '360p'
-        else:
-            return 'Unknown'
-    
-    def _detect_source(self, url: str) -> str:
-        """Phát hiện nguồn"""
-        domain = urlparse(url).netloc.lower()
-        
-        source_map = {
-            'streamtape.com': 'StreamTape',
-            'doodstream.com': 'DoodStream',
-            'mixdrop.co': 'MixDrop', 
-            'upstream.to': 'Upstream',
-            'filesupload.org': 'FilesUpload',
-            'streamlare.com': 'StreamLare',
-            'supervideo.tv': 'SuperVideo',
-            'tvhay.fm': 'TVHay Direct'
-        }
-        
-        for host, source_name in source_map.items():
-            if host in domain:
-                return source_name
-        
-        return 'Unknown'
-    
-    def _detect_type(self, url: str) -> str:
-        """Phát hiện loại file"""
-        url_lower = url.lower()
-        
-        if '.m3u8' in url_lower:
-            return 'HLS'
-        elif '.mp4' in url_lower:
-            return 'MP4'
-        elif '.mkv' in url_lower:
-            return 'MKV'
-        else:
-            return 'Stream'
-    
     def _process_links(self, links: List[Dict[str, str]]) -> List[Dict[str, str]]:
         """Xử lý và loại bỏ duplicate links"""
         seen_urls = set()
         unique_links = []
         
-        # Sort by quality
-        quality_order = {'4K': 0, '1080p': 1, '720p': 2, '480p': 3, '360p': 4, 'Unknown': 5}
-        sorted_links = sorted(links, key=lambda x: quality_order.get(x['quality'], 5))
+        # Sort by quality, then real bandwidth
+        sorted_links = sorted(links, key=stream_sort_key)
         
         for link in sorted_links:
             url = link['url']
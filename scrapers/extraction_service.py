@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lớp dịch vụ trích xuất đứng trước ScraperFactory (cache kết quả theo URL trang)
+"""
+
+import logging
+from typing import Dict, List, Optional
+from config import Config
+from scrapers.base_scraper import BaseScraper
+from scrapers.hls_variants import HlsVariantResolver
+from scrapers.link_prober import LinkProber
+from scrapers.mirror_ranker import MirrorRanker
+from scrapers.scraper_factory import ScraperFactory
+from utils.deadline import deadline_expired
+from utils.host_limiter import HostUnavailableError
+from utils.host_performance import HostPerformanceTable, host_of
+from utils.job_queue import JobQueue, PositionCallback
+from utils.negative_cache import (
+    NegativeCache, NegativeEntry, REASON_BLOCKED, REASON_NO_STREAMS, REASON_NOT_FOUND,
+    REASON_UNSUPPORTED
+)
+from utils.page_cache import content_hash
+from utils.result_cache import ResultCache
+from utils.single_flight import SingleFlight
+from utils.validators import normalize_url
+
+class UnsupportedSiteError(Exception):
+    """Không có scraper cho URL"""
+
+class ExtractionService:
+    """
+    Điểm vào duy nhất để lấy link stream cho một URL trang
+    
+    Kết quả được cache theo URL đã chuẩn hoá; handler kiểm tra `cached()`
+    trước để trả lời ngay mà không cần tin nhắn "đang xử lý". Các request
+    đồng thời cho cùng một trang chỉ chạy một lượt scrape (single-flight),
+    và các lượt scrape đi qua hàng đợi có giới hạn số worker. Trang không
+    có link (kể cả chỉ có link demo), trang 404/bị chặn và domain không có
+    scraper được nhớ trong cache thất bại; handler kiểm tra `negative()`
+    để trả lời ngay mà không tải lại trang.
+    """
+    
+    def __init__(self, scraper_factory: ScraperFactory, result_cache: Optional[ResultCache] = None,
+                 job_queue: Optional[JobQueue] = None, negative_cache: Optional[NegativeCache] = None):
+        """
+        Khởi tạo service
+        
+        Args:
+            scraper_factory: Factory tạo scraper theo domain
+            result_cache: Cache kết quả (None = tạo theo Config)
+            job_queue: Hàng đợi scrape (None = tạo theo Config)
+            negative_cache: Cache thất bại (None = tạo theo Config)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.scraper_factory = scraper_factory
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        self.job_queue = job_queue if job_queue is not None else JobQueue()
+        self.negative_cache = negative_cache if negative_cache is not None else NegativeCache()
+        self.flights = SingleFlight('pages')
+        self.variant_resolver = HlsVariantResolver(scraper_factory.http_client)
+        self.host_performance = HostPerformanceTable()
+        self.link_prober = LinkProber(scraper_factory.http_client, performance=self.host_performance)
+        self.mirror_ranker = MirrorRanker(scraper_factory.http_client, self.host_performance)
+        http_client = scraper_factory.http_client
+        self.page_cache = http_client.page_cache if http_client and http_client.page_cache.enabled else None
+    
+    async def cached(self, url: str) -> Optional[List[Dict[str, str]]]:
+        """
+        Lấy kết quả đã cache (không scrape)
+        
+        Args:
+            url: URL trang
+        
+        Returns:
+            Danh sách link hoặc None nếu chưa có
+        """
+        return await self.result_cache.get(normalize_url(url))
+    
+    def negative(self, url: str) -> Optional[NegativeEntry]:
+        """
+        Lần thất bại còn hạn của URL (không scrape)
+        
+        Args:
+            url: URL trang
+        
+        Returns:
+            Lý do và thời điểm hết hạn, None nếu trang chưa từng thất bại gần đây
+        """
+        return self.negative_cache.get(host_of(url)) or self.negative_cache.get(normalize_url(url))
+    
+    def mark_unsupported(self, url: str):
+        """
+        Nhớ domain của URL là không được hỗ trợ (khoá theo domain, `negative()`
+        của mọi trang trên domain đó trả lời ngay)
+        
+        Args:
+            url: URL trang
+        """
+        self.negative_cache.add(host_of(url), REASON_UNSUPPORTED)
+    
+    def purge_negative(self, pattern: str = '') -> int:
+        """
+        Xoá các lần thất bại có URL/domain chứa `pattern` (rỗng = xoá hết)
+        
+        Returns:
+            Số mục đã xoá
+        """
+        count = self.negative_cache.purge(pattern)
+        self.logger.info(f"Đã xoá {count} mục khỏi cache thất bại (pattern={pattern!r})")
+        return count
+    
+    async def extract(self, url: str, check_cache: bool = True,
+                      on_position: Optional[PositionCallback] = None) -> List[Dict[str, str]]:
+        """
+        Trích xuất link stream, dùng cache nếu có
+        
+        Args:
+            url: URL trang
+            check_cache: False nếu caller vừa gọi `cached()` và bị miss
+            on_position: Callback vị trí trong hàng đợi (chỉ dùng khi request
+                         này khởi chạy lượt scrape, không phải khi được gộp)
+        
+        Returns:
+            Danh sách link (có thể rỗng)
+        
+        Raises:
+            UnsupportedSiteError: Không có scraper cho domain
+            QueueFullError: Hàng đợi scrape đã đầy
+            HostUnavailableError: Circuit của host đang mở
+        """
+        key = normalize_url(url)
+        
+        if check_cache:
+            links = await self.result_cache.get(key)
+            if links is not None:
+                return links
+        
+        scraper = self.scraper_factory.get_scraper(url)
+        if not scraper:
+            self.mark_unsupported(url)
+            raise UnsupportedSiteError(url)
+        # Host đang bị chặn: báo ngay thay vì chiếm chỗ trong hàng đợi
+        scraper.limiter.check(host_of(url))
+        
+        # Chỉ request khởi chạy lượt scrape mới chiếm chỗ trong hàng đợi
+        return await self.flights.do(
+            key, lambda: self.job_queue.submit(lambda: self._scrape(scraper, url, key), on_position)
+        )
+    
+    async def _scrape(self, scraper: BaseScraper, url: str, key: str) -> List[Dict[str, str]]:
+        """Scrape trang, hậu xử lý link và lưu cache"""
+        # Status của lượt trước không được dùng để đoán lý do thất bại của lượt này
+        if self.scraper_factory.http_client:
+            self.scraper_factory.http_client.forget_status(url)
+        digest = await self._page_hash(scraper, url)
+        links = await self.page_cache.get_links(key, digest) if digest else None
+        # Link có hạn sắp hết thì phải trích xuất lại dù trang không đổi
+        if links is not None and self.result_cache.ttl_for(links) > 0:
+            self.logger.info(f"Trang không đổi kể từ lần trích xuất trước, dùng lại {len(links)} link: {url}")
+        else:
+            links = await scraper.extract_stream_links(url)
+            if digest and self._real_links(links):
+                await self.page_cache.put_links(key, digest, links)
+        # Hết thời gian của yêu cầu thì trả link thô, bỏ qua các bước hậu xử lý
+        if links and Config.HLS_EXPAND_VARIANTS and not deadline_expired():
+            links = await self.variant_resolver.expand(links)
+        if links and Config.LINK_PROBE_ENABLED and not deadline_expired():
+            links = await self.link_prober.probe_links(links)
+        if links and Config.MIRROR_RANKING_ENABLED and not deadline_expired():
+            links = await self.mirror_ranker.rank(links)
+        # Kết quả rỗng hoặc chỉ có link demo: nhớ lý do thất bại thay vì cache như
+        # kết quả thật; rỗng do hết thời gian hoặc lỗi tạm thời thì không nhớ
+        # (lần sau có thể tìm thấy)
+        if self._real_links(links):
+            await self.result_cache.set(key, links)
+        elif not deadline_expired():
+            reason = self._failure_reason(scraper, url)
+            if reason:
+                self.negative_cache.add(key, reason)
+                self.logger.info(f"Không có link thật ({reason}), nhớ thất bại của {url}")
+        return links
+    
+    @staticmethod
+    def _real_links(links: List[Dict[str, str]]) -> bool:
+        """Có ít nhất một link không phải link demo (DemoScraper)"""
+        return any(not link.get('demo') for link in links)
+    
+    def _failure_reason(self, scraper: BaseScraper, url: str) -> Optional[str]:
+        """
+        Lý do trang không có link, theo circuit của host và HTTP status của lượt scrape
+        
+        Returns:
+            Lý do, None nếu thất bại có thể chỉ là tạm thời (timeout, lỗi DNS,
+            5xx, bị giới hạn tốc độ: không có status hoặc status lỗi server)
+        """
+        try:
+            scraper.limiter.check(host_of(url))
+        except HostUnavailableError:
+            return REASON_BLOCKED
+        http_client = self.scraper_factory.http_client
+        status = http_client.last_status(url) if http_client else None
+        if status in (404, 410):
+            return REASON_NOT_FOUND
+        if status in (403, 429, 451):
+            return REASON_BLOCKED
+        # Chỉ nhớ "không có link" khi trang thực sự tải được
+        if status is not None and (200 <= status < 300 or status == 304):
+            return REASON_NO_STREAMS
+        return None
+    
+    async def _page_hash(self, scraper: BaseScraper, url: str) -> Optional[str]:
+        """
+        Hash nội dung hiện tại của trang (qua page cache: thường là 304 hoặc
+        bản vừa tải, và lượt scrape sau đó dùng lại bản này)
+        
+        Returns:
+            Hash, None nếu không có page cache hoặc chỉ đọc được một phần trang
+        """
+        if not self.page_cache:
+            return None
+        page = await scraper.fetch_page(url)
+        if page is None or page.truncated or page.stopped_early:
+            return None
+        return content_hash(page.body)
+    
+    def close(self):
+        """Giải phóng tài nguyên (worker, file cache)"""
+        self.job_queue.close()
+        self.result_cache.close()
+    
+    def stats(self) -> Dict[str, Dict]:
+        """
+        Thống kê của service
+        
+        Returns:
+            Dict tên thành phần -> dict thống kê
+        """
+        return {
+            'Job queue': self.job_queue.stats(),
+            'Result cache': self.result_cache.stats(),
+            'Negative cache': self.negative_cache.stats(),
+            'Single-flight (pages)': self.flights.stats(),
+            'HLS variants': self.variant_resolver.stats(),
+            'Link probe': self.link_prober.stats(),
+            'Mirror ranking': self.mirror_ranker.stats(),
+        }
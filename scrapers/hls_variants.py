@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mở rộng link HLS thành các variant thật đọc từ master playlist
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional
+import aiohttp
+from config import Config
+from utils.deadline import clamp_timeout
+from utils.http_client import HttpClient
+from utils.m3u8_parser import M3U8Error, M3U8Parser, Variant
+from utils.single_flight import SingleFlight
+from utils.ttl_cache import TTLCache
+from utils.url_classifier import classify_url, quality_for_height, stream_sort_key
+from utils.url_guard import BlockedAddressError, public_connector, public_trace_config
+
+class HlsVariantResolver:
+    """
+    Tải master playlist của các link HLS (một lần, có cache) và trả về
+    mỗi variant như một link riêng với RESOLUTION/BANDWIDTH/CODECS thật
+    
+    Link không phải master (media playlist) giữ nguyên; việc đọc dừng ngay
+    khi gặp segment đầu tiên nên media playlist dài không bị tải hết.
+    """
+    
+    def __init__(self, http_client: Optional[HttpClient] = None, cache: Optional[TTLCache] = None,
+                 timeout: float = None, concurrency: int = None):
+        """
+        Args:
+            http_client: HTTP client dùng chung
+            cache: Cache master playlist (None = tạo theo Config)
+            timeout: Timeout tải một playlist (giây)
+            concurrency: Số playlist tải đồng thời cho một lượt
+        """
+        self.logger = logging.getLogger(__name__)
+        self.http_client = http_client
+        self.cache = cache if cache is not None else TTLCache(
+            Config.HLS_MASTER_CACHE_SIZE, Config.HLS_MASTER_CACHE_TTL
+        )
+        self.timeout = timeout if timeout is not None else Config.HLS_MASTER_TIMEOUT
+        self.concurrency = concurrency if concurrency is not None else Config.HLS_EXPAND_CONCURRENCY
+        self.flights = SingleFlight('hls-master')
+        self.expanded = 0
+        self.failed = 0
+    
+    async def expand(self, links: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Thay mỗi link master playlist bằng các variant của nó
+        
+        Args:
+            links: Các link stream
+        
+        Returns:
+            Danh sách link đã mở rộng và xếp hạng (chất lượng thật, rồi bandwidth)
+        """
+        hls_urls = {link['url'] for link in links if classify_url(link['url']).type == 'HLS'}
+        if not hls_urls:
+            return links
+        
+        limit = asyncio.Semaphore(self.concurrency)
+        # Playlist lấy từ trang bên ngoài: chỉ tải từ địa chỉ công khai
+        own_session = None
+        if self.http_client:
+            session = self.http_client.public_session
+        else:
+            session = own_session = aiohttp.ClientSession(
+                connector=public_connector(),
+                headers=Config.DEFAULT_HEADERS,
+                trace_configs=[public_trace_config()]
+            )
+        
+        async def resolve(url: str):
+            async with limit:
+                return url, await self.variants(session, url)
+        
+        try:
+            results = dict(await asyncio.gather(*(resolve(url) for url in hls_urls)))
+        finally:
+            if own_session:
+                await own_session.close()
+        
+        expanded = []
+        seen_urls = set()
+        for link in links:
+            variants = results.get(link['url'])
+            if variants:
+                candidates = [self._variant_link(link, variant) for variant in variants]
+                # Giữ master playlist (adaptive) cho trình phát tự chọn chất lượng
+                candidates.append({**link, 'quality': 'Auto'})
+            else:
+                candidates = [link]
+            
+            for candidate in candidates:
+                if candidate['url'] not in seen_urls:
+                    seen_urls.add(candidate['url'])
+                    expanded.append(candidate)
+        
+        return sorted(expanded, key=stream_sort_key)
+    
+    async def variants(self, session: aiohttp.ClientSession, url: str) -> List[Variant]:
+        """
+        Các variant của một master playlist (đọc từ cache nếu có)
+        
+        Args:
+            session: aiohttp session
+            url: URL playlist
+        
+        Returns:
+            Các variant (rỗng nếu là media playlist hoặc tải lỗi)
+        """
+        variants = self.cache.get(url)
+        if variants is not None:
+            return variants
+        
+        try:
+            variants = await self.flights.do(url, lambda: self._fetch_variants(session, url))
+        except (aiohttp.ClientError, asyncio.TimeoutError, M3U8Error, ValueError, BlockedAddressError) as e:
+            self.failed += 1
+            self.logger.warning(f"Không đọc được playlist {url}: {e}")
+            return []
+        
+        self.cache.set(url, variants)
+        if variants:
+            self.expanded += 1
+        return variants
+    
+    async def _fetch_variants(self, session: aiohttp.ClientSession, url: str) -> List[Variant]:
+        """Tải playlist theo chunk, dừng ngay khi biết đó là media playlist"""
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=clamp_timeout(self.timeout))) as response:
+            response.raise_for_status()
+            parser = M3U8Parser(str(response.url))
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                parser.feed(chunk)
+                if len(parser.playlist.segments):
+                    return []
+            playlist = parser.close()
+        
+        return sorted(playlist.variants, key=lambda variant: variant.bandwidth, reverse=True)
+    
+    @staticmethod
+    def _variant_link(link: Dict[str, str], variant: Variant) -> Dict[str, str]:
+        """Link cho một variant, kế thừa nguồn của master"""
+        quality = quality_for_height(variant.height)
+        if quality == 'Unknown':
+            quality = link.get('quality', 'Unknown')
+        
+        info = {
+            'url': variant.uri,
+            'quality': quality,
+            'source': link.get('source', 'Unknown'),
+            'type': 'HLS',
+            'bandwidth': variant.bandwidth,
+            'master': link['url'],
+        }
+        if variant.resolution:
+            info['resolution'] = f"{variant.resolution[0]}x{variant.resolution[1]}"
+        if variant.codecs:
+            info['codecs'] = variant.codecs
+        return info
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm số master đã mở rộng, số lỗi và thống kê cache
+        """
+        return {
+            'expanded': self.expanded,
+            'failed': self.failed,
+            'coalesced': self.flights.coalesced,
+            **{f'cache_{key}': value for key, value in self.cache.stats().items()},
+        }
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Giải quyết các iframe player (và iframe lồng nhau) song song
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlparse
+from config import Config
+from utils.cpu_pool import ParsedPage
+from utils.deadline import clamp_timeout
+from utils.html_elements import PageElements
+from utils.html_reader import HtmlBody
+
+class IframeResolver:
+    """
+    Tải các iframe của một trang đồng thời
+    
+    Mỗi iframe là một task; giới hạn số iframe tải cùng lúc cho cả trang và
+    cho từng host, theo dõi iframe lồng nhau đến `max_depth` tầng, và dừng
+    tất cả khi hết deadline chung. Video URL được báo ngay khi từng iframe
+    tải xong (callback `on_video`), nên deadline chỉ cắt phần còn dang dở.
+    """
+    
+    def __init__(self, fetch_page: Callable[[str], Awaitable[Optional[HtmlBody]]],
+                 parse_page: Callable[[bytes, Optional[str]], Awaitable[ParsedPage]],
+                 extract_video_urls: Callable[[PageElements], List[str]],
+                 max_concurrency: int = None, per_host: int = None,
+                 max_depth: int = None, deadline: float = None):
+        """
+        Args:
+            fetch_page: Coroutine function url -> HtmlBody (None nếu lỗi)
+            parse_page: Coroutine function (bytes, encoding) -> ParsedPage
+            extract_video_urls: Hàm lấy video URLs từ PageElements
+            max_concurrency: Số iframe tải đồng thời tối đa cho cả trang
+            per_host: Số iframe tải đồng thời tối đa cho mỗi host
+            max_depth: Số tầng iframe tối đa (1 = chỉ iframe của trang)
+            deadline: Thời gian tối đa cho tất cả iframe (giây)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.fetch_page = fetch_page
+        self.parse_page = parse_page
+        self.extract_video_urls = extract_video_urls
+        self.max_concurrency = max_concurrency if max_concurrency is not None else Config.IFRAME_CONCURRENCY
+        self.per_host = per_host if per_host is not None else Config.IFRAME_PER_HOST
+        self.max_depth = max_depth if max_depth is not None else Config.IFRAME_MAX_DEPTH
+        self.deadline = deadline if deadline is not None else Config.IFRAME_DEADLINE
+        
+        self._page_limit = asyncio.Semaphore(self.max_concurrency)
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self.last_stats: Dict[str, object] = {}
+    
+    @staticmethod
+    def absolute_url(src: Optional[str], base_url: str) -> Optional[str]:
+        """Chuyển src của iframe thành URL tuyệt đối (None nếu không phải http)"""
+        if not src:
+            return None
+        src = src.strip()
+        if src.startswith('//'):
+            src = 'https:' + src
+        elif not src.startswith(('http://', 'https://')):
+            src = urljoin(base_url, src)
+        return src if src.startswith(('http://', 'https://')) else None
+    
+    async def resolve(self, page: PageElements, base_url: str,
+                      on_video: Callable[[str], None]) -> List[str]:
+        """
+        Tải tất cả iframe của trang (kể cả lồng nhau)
+        
+        Args:
+            page: Trang đã parse
+            base_url: URL của trang
+            on_video: Callback gọi một lần cho mỗi video URL mới
+        
+        Returns:
+            Các video URL đã tìm thấy (theo thứ tự tìm thấy)
+        """
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + clamp_timeout(self.deadline)
+        visited: Set[str] = {base_url}
+        found: List[str] = []
+        seen_videos: Set[str] = set()
+        pending: Set[asyncio.Task] = set()
+        resolved = failed = 0
+        reason = 'all_done'
+        
+        def schedule(parent: PageElements, page_url: str, depth: int):
+            for iframe in parent.iframes:
+                src = self.absolute_url(iframe.get('src'), page_url)
+                if not src or src in visited:
+                    continue
+                visited.add(src)
+                self.logger.info(f"Đang xử lý iframe (tầng {depth}): {src}")
+                pending.add(asyncio.create_task(self._resolve_one(src, depth)))
+        
+        schedule(page, base_url, 1)
+        
+        try:
+            while pending:
+                remaining = deadline_at - loop.time()
+                if remaining <= 0:
+                    reason = 'deadline'
+                    break
+                
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                for task in done:
+                    if task.exception():
+                        failed += 1
+                        self.logger.warning(f"Lỗi khi xử lý iframe: {task.exception()}")
+                        continue
+                    
+                    src, depth, iframe_page = task.result()
+                    if iframe_page is None:
+                        failed += 1
+                        continue
+                    resolved += 1
+                    
+                    for video_url in self.extract_video_urls(iframe_page):
+                        if video_url not in seen_videos:
+                            seen_videos.add(video_url)
+                            found.append(video_url)
+                            on_video(video_url)
+                    
+                    if depth < self.max_depth:
+                        schedule(iframe_page, src, depth + 1)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        self.last_stats = {
+            'reason': reason,
+            'iframes': len(visited) - 1,
+            'resolved': resolved,
+            'failed': failed,
+            'cancelled': len(pending),
+            'videos': len(found),
+        }
+        self.logger.info(f"Iframe resolver: {self.last_stats}")
+        return found
+    
+    async def _resolve_one(self, src: str, depth: int) -> Tuple[str, int, Optional[PageElements]]:
+        """Tải và parse một iframe trong giới hạn của host và của trang"""
+        host = urlparse(src).hostname or ''
+        host_limit = self._host_limits.get(host)
+        if host_limit is None:
+            host_limit = self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        
+        # Giữ slot của host trước để iframe cùng host đang chờ không chiếm slot của trang
+        async with host_limit:
+            async with self._page_limit:
+                page = await self.fetch_page(src)
+        
+        if not page:
+            return src, depth, None
+        parsed = await self.parse_page(page.body, page.encoding)
+        return src, depth, parsed.elements
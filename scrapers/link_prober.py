@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kiểm tra link còn sống sau khi trích xuất (probe đồng thời, có cache ngắn hạn)
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+import aiohttp
+from config import Config
+from utils.deadline import clamp_timeout
+from utils.host_performance import HostPerformanceTable, host_of
+from utils.http_client import HttpClient
+from utils.live_playlist import LivePlaylistTracker
+from utils.m3u8_parser import M3U8Error, M3U8Parser
+from utils.single_flight import SingleFlight
+from utils.ttl_cache import TTLCache
+from utils.url_classifier import classify_url
+from utils.url_guard import BlockedAddressError, public_connector, public_trace_config
+
+# Mã HTTP coi là link còn sống
+ALIVE_STATUSES = (200, 206)
+
+# HEAD không được hỗ trợ thì thử lại bằng GET có Range
+HEAD_UNSUPPORTED = (403, 405, 501)
+
+# Số bytes đọc khi probe bằng GET
+PROBE_RANGE = 'bytes=0-1023'
+
+class ProbeResult:
+    """Kết quả probe một link"""
+    
+    __slots__ = ('alive', 'status', 'content_type', 'content_length', 'ttfb_ms', 'error', 'live')
+    
+    def __init__(self, alive: Optional[bool], status: Optional[int] = None,
+                 content_type: Optional[str] = None, content_length: Optional[int] = None,
+                 ttfb_ms: Optional[float] = None, error: Optional[str] = None,
+                 live: Optional[bool] = None):
+        """
+        Args:
+            alive: True/False, None nếu không xác định được (vd: hết thời gian)
+            status: HTTP status
+            content_type: Content-Type trả về
+            content_length: Kích thước (bytes) nếu server cho biết
+            ttfb_ms: Thời gian đến byte đầu tiên (mili giây)
+            error: Mô tả lỗi
+            live: True nếu là live playlist HLS (không có ENDLIST)
+        """
+        self.alive = alive
+        self.status = status
+        self.content_type = content_type
+        self.content_length = content_length
+        self.ttfb_ms = ttfb_ms
+        self.error = error
+        self.live = live
+    
+    def as_dict(self) -> Dict[str, object]:
+        """Dạng dict để gắn vào link (bỏ các trường rỗng)"""
+        return {name: getattr(self, name) for name in self.__slots__
+                if getattr(self, name) is not None or name == 'alive'}
+
+def _content_length(response: aiohttp.ClientResponse) -> Optional[int]:
+    """Kích thước thật của tài nguyên (ưu tiên Content-Range khi GET có Range)"""
+    content_range = response.headers.get('Content-Range', '')
+    if '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        if total.isdigit():
+            return int(total)
+    return response.content_length
+
+class LinkProber:
+    """
+    Probe đồng thời các link ứng viên
+    
+    - File video (MP4...): HEAD, nếu server không hỗ trợ thì GET có Range
+    - HLS: tải playlist (master thì theo variant bandwidth cao nhất) rồi GET có Range
+      segment đầu tiên; playlist không có ENDLIST là live: được theo dõi bằng
+      LivePlaylistTracker, lần probe sau chỉ poll phần segment mới, probe segment
+      mới nhất và báo chết nếu playlist đã stall
+    - Trang hosting (streamtape...): HEAD/GET trang
+    
+    Số probe đồng thời bị giới hạn cho cả process, mỗi probe có deadline
+    riêng, kết quả được cache theo URL với TTL ngắn.
+    """
+    
+    def __init__(self, http_client: Optional[HttpClient] = None, concurrency: int = None,
+                 timeout: float = None, cache_ttl: float = None, drop_dead: bool = None,
+                 performance: Optional[HostPerformanceTable] = None):
+        """
+        Args:
+            http_client: HTTP client dùng chung
+            concurrency: Số probe đồng thời tối đa
+            timeout: Deadline cho mỗi probe (giây)
+            cache_ttl: Thời gian cache kết quả (giây)
+            drop_dead: True = bỏ link chết, False = giữ lại và đánh dấu
+            performance: Bảng hiệu năng theo host để ghi TTFB đo được
+        """
+        self.logger = logging.getLogger(__name__)
+        self.http_client = http_client
+        self.timeout = timeout if timeout is not None else Config.LINK_PROBE_TIMEOUT
+        self.drop_dead = drop_dead if drop_dead is not None else Config.LINK_PROBE_DROP_DEAD
+        self.cache = TTLCache(
+            Config.LINK_PROBE_CACHE_SIZE, cache_ttl if cache_ttl is not None else Config.LINK_PROBE_CACHE_TTL
+        )
+        self._limit = asyncio.Semaphore(concurrency if concurrency is not None else Config.LINK_PROBE_CONCURRENCY)
+        self.performance = performance
+        self.flights = SingleFlight('probe')
+        self.live_trackers = TTLCache(Config.LIVE_TRACKERS, Config.LIVE_TRACKER_TTL)
+        self._counters = {'probed': 0, 'alive': 0, 'dead': 0, 'unknown': 0, 'dropped': 0,
+                          'live': 0, 'stalled': 0}
+    
+    async def probe_links(self, links: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Probe tất cả link và gắn kết quả vào `link['probe']`
+        
+        Args:
+            links: Các link stream
+        
+        Returns:
+            Các link (link chết bị bỏ nếu drop_dead, nếu không thì chỉ đánh dấu)
+        """
+        if not links:
+            return links
+        
+        # Link lấy từ trang bên ngoài: chỉ probe địa chỉ công khai, để kết quả
+        # sống/chết không thành công cụ dò cổng của mạng nội bộ
+        own_session = None
+        if self.http_client:
+            session = self.http_client.public_session
+        else:
+            session = own_session = aiohttp.ClientSession(
+                connector=public_connector(),
+                headers=Config.DEFAULT_HEADERS,
+                trace_configs=[public_trace_config()]
+            )
+        
+        try:
+            results = await asyncio.gather(*(self.probe(session, link) for link in links))
+        finally:
+            if own_session:
+                await own_session.close()
+        
+        checked = []
+        for link, result in zip(links, results):
+            link = {**link, 'probe': result.as_dict()}
+            if result.alive is False and self.drop_dead:
+                self._counters['dropped'] += 1
+                self.logger.info(f"Bỏ link chết {link['url']}: {result.error or result.status}")
+                continue
+            checked.append(link)
+        return checked
+    
+    async def probe(self, session: aiohttp.ClientSession, link: Dict[str, str]) -> ProbeResult:
+        """
+        Probe một link (dùng cache nếu có)
+        
+        Args:
+            session: aiohttp session
+            link: Dict thông tin stream
+        
+        Returns:
+            ProbeResult
+        """
+        url = link['url']
+        result = self.cache.get(url)
+        if result is not None:
+            return result
+        
+        result = await self.flights.do(url, lambda: self._probe_limited(session, link))
+        if result.error != 'deadline':
+            self.cache.set(url, result)
+        return result
+    
+    async def _probe_limited(self, session: aiohttp.ClientSession, link: Dict[str, str]) -> ProbeResult:
+        """Probe trong giới hạn đồng thời và deadline"""
+        async with self._limit:
+            self._counters['probed'] += 1
+            timeout = clamp_timeout(self.timeout)
+            try:
+                result = await asyncio.wait_for(self._probe(session, link), timeout)
+            except asyncio.TimeoutError:
+                # Bị cắt bởi deadline của yêu cầu: không cache, không tính là lỗi của host
+                result = ProbeResult(None, error='timeout' if timeout >= self.timeout else 'deadline')
+            except BlockedAddressError:
+                result = ProbeResult(False, error='blocked')
+            except aiohttp.ClientResponseError as e:
+                result = ProbeResult(False, status=e.status, error=e.message)
+            except (aiohttp.ClientError, M3U8Error, ValueError) as e:
+                # Tên miền trỏ vào địa chỉ nội bộ (resolver từ chối)
+                if isinstance(getattr(e, 'os_error', None), BlockedAddressError):
+                    result = ProbeResult(False, error='blocked')
+                else:
+                    result = ProbeResult(False, error=str(e) or e.__class__.__name__)
+        
+        if result.alive:
+            self._counters['alive'] += 1
+        elif result.alive is False:
+            self._counters['dead'] += 1
+        else:
+            self._counters['unknown'] += 1
+        
+        if self.performance is not None:
+            host = host_of(link['url'])
+            if result.alive and result.ttfb_ms is not None:
+                self.performance.record(host, ttfb_ms=result.ttfb_ms)
+            elif result.alive is None and result.error != 'deadline':
+                self.performance.record_failure(host)
+        return result
+    
+    async def _probe(self, session: aiohttp.ClientSession, link: Dict[str, str]) -> ProbeResult:
+        info = classify_url(link['url'])
+        if info.type == 'HLS' or link.get('type') == 'HLS':
+            return await self._probe_hls(session, link['url'])
+        # Link của trang hosting là trang HTML kể cả khi path có đuôi .mp4
+        expect_media = info.host is None and info.extension is not None
+        return await self._probe_file(session, link['url'], expect_media=expect_media)
+    
+    async def _probe_file(self, session: aiohttp.ClientSession, url: str, expect_media: bool,
+                          byterange: Optional[tuple] = None) -> ProbeResult:
+        """HEAD (hoặc GET có Range) một tài nguyên"""
+        started = time.monotonic()
+        response = None
+        if byterange is None:
+            async with session.head(url, allow_redirects=True) as head:
+                if head.status not in HEAD_UNSUPPORTED:
+                    response = head
+                    result = self._result(head, started, expect_media)
+        
+        if response is None:
+            if byterange is not None:
+                length, offset = byterange
+                headers = {'Range': f'bytes={offset}-{offset + min(length, 1024) - 1}'}
+            else:
+                headers = {'Range': PROBE_RANGE}
+            started = time.monotonic()
+            async with session.get(url, headers=headers, allow_redirects=True) as get:
+                result = self._result(get, started, expect_media)
+        return result
+    
+    def _result(self, response: aiohttp.ClientResponse, started: float, expect_media: bool) -> ProbeResult:
+        """Tạo ProbeResult từ response đã nhận headers"""
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip() or None
+        alive = response.status in ALIVE_STATUSES
+        error = None
+        if alive and expect_media and content_type == 'text/html':
+            # File video mà trả về trang HTML (trang lỗi, trang chặn bot...)
+            alive, error = False, 'html_instead_of_media'
+        return ProbeResult(
+            alive,
+            status=response.status,
+            content_type=content_type,
+            content_length=_content_length(response),
+            ttfb_ms=round((time.monotonic() - started) * 1000, 1),
+            error=error,
+        )
+    
+    async def _probe_hls(self, session: aiohttp.ClientSession, url: str, depth: int = 0) -> ProbeResult:
+        """Playlist phải parse được và segment đầu tiên phải tải được"""
+        tracker = self.live_trackers.get(url)
+        if tracker is not None:
+            return await self._probe_live(session, url, tracker)
+        
+        started = time.monotonic()
+        body = bytearray()
+        complete = False
+        async with session.get(url, allow_redirects=True) as response:
+            ttfb_ms = round((time.monotonic() - started) * 1000, 1)
+            if response.status not in ALIVE_STATUSES:
+                return ProbeResult(False, status=response.status, ttfb_ms=ttfb_ms)
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip() or None
+            
+            parser = M3U8Parser(str(response.url))
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                parser.feed(chunk)
+                body += chunk
+                # Đã có segment đầu: playlist lớn (hoặc ghi rõ VOD) thì dừng, playlist
+                # nhỏ đọc hết để biết có ENDLIST không
+                if len(parser.playlist.segments) and (
+                        len(body) > Config.LIVE_DETECT_BYTES or parser.playlist.playlist_type == 'VOD'):
+                    break
+            else:
+                parser.close()
+                complete = True
+            playlist = parser.playlist
+            playlist_url = str(response.url)
+        
+        live = complete and not playlist.is_master and not playlist.endlist and len(playlist.segments) > 0
+        if live:
+            # Theo dõi từ nội dung vừa tải, lần probe sau chỉ parse phần mới
+            tracker = LivePlaylistTracker(playlist_url, self.http_client)
+            tracker.apply(bytes(body))
+            self.live_trackers.set(url, tracker)
+            self._counters['live'] += 1
+        
+        if playlist.is_master and playlist.variants:
+            if depth:
+                return ProbeResult(False, status=response.status, error='nested_master')
+            variant = max(playlist.variants, key=lambda variant: variant.bandwidth)
+            result = await self._probe_hls(session, variant.uri, depth + 1)
+        elif len(playlist.segments):
+            segment = playlist.segments[0]
+            result = await self._probe_file(
+                session, playlist.segment_url(0), expect_media=True, byterange=segment.byterange
+            )
+            if result.error == 'html_instead_of_media':
+                result.error = 'segment_is_html'
+        else:
+            return ProbeResult(False, status=response.status, content_type=content_type,
+                               ttfb_ms=ttfb_ms, error='empty_playlist')
+        
+        # Báo TTFB và content-type của chính playlist, trạng thái sống theo segment
+        return ProbeResult(
+            result.alive,
+            status=result.status,
+            content_type=content_type,
+            content_length=result.content_length,
+            ttfb_ms=ttfb_ms,
+            error=result.error,
+            live=True if live else None,
+        )
+    
+    async def _probe_live(self, session: aiohttp.ClientSession, url: str,
+                          tracker: LivePlaylistTracker) -> ProbeResult:
+        """
+        Probe lại live playlist đang theo dõi: poll (chỉ parse segment mới), chết
+        nếu đã stall, nếu không thì probe segment mới nhất
+        """
+        started = time.monotonic()
+        await tracker.poll(session)
+        ttfb_ms = round((time.monotonic() - started) * 1000, 1)
+        if tracker.endlist:
+            # Live đã kết thúc thành VOD: bỏ tracker, probe như playlist thường
+            self.live_trackers.pop(url)
+            return await self._probe_hls(session, url)
+        # Giữ tracker thêm một TTL tính từ lần probe này
+        self.live_trackers.set(url, tracker)
+        if tracker.stalled or not tracker.segments:
+            self._counters['stalled'] += 1
+            return ProbeResult(False, ttfb_ms=ttfb_ms, error='stalled', live=True)
+        
+        segment = tracker.segments[-1]
+        result = await self._probe_file(
+            session, tracker.absolute(segment), expect_media=True, byterange=segment.byterange
+        )
+        return ProbeResult(
+            result.alive,
+            status=result.status,
+            content_length=result.content_length,
+            ttfb_ms=ttfb_ms,
+            error='segment_is_html' if result.error == 'html_instead_of_media' else result.error,
+            live=True,
+        )
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê probe
+        
+        Returns:
+            Dict gồm số probe, số link sống/chết/không rõ, số link bị bỏ và cache
+        """
+        return {
+            **self._counters,
+            'coalesced': self.flights.coalesced,
+            **{f'cache_{key}': value for key, value in self.cache.stats().items()},
+            'live_tracked': len(self.live_trackers),
+        }
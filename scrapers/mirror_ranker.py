@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Xếp hạng mirror theo TTFB và throughput đo được (tải mẫu giới hạn, có lịch sử theo host)
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+import aiohttp
+from config import Config
+from utils.deadline import clamp_timeout
+from utils.host_performance import HostPerformanceTable, host_of
+from utils.http_client import HttpClient
+from utils.m3u8_parser import M3U8Error, M3U8Parser
+from utils.url_classifier import QUALITY_ORDER, UNKNOWN_QUALITY, classify_url
+from utils.url_guard import BlockedAddressError, public_connector, public_trace_config
+
+# Mẫu nhỏ hơn mức này không đủ để tính throughput (chỉ ghi TTFB)
+MIN_THROUGHPUT_SAMPLE = 16 * 1024
+
+class MirrorRanker:
+    """
+    Sắp xếp link theo chất lượng, cùng chất lượng thì mirror nhanh hơn trước
+    
+    Tốc độ của mirror lấy từ bảng hiệu năng theo host (được LinkProber ghi
+    TTFB). Khi bật tải mẫu, mỗi host chưa có số đo gần đây được đo bằng một
+    mẫu nhỏ tải song song: segment đầu tiên với HLS, N KB đầu (Range) với
+    file; host đã đo gần đây dùng lại lịch sử thay vì đo lại.
+    """
+    
+    def __init__(self, http_client: Optional[HttpClient] = None,
+                 table: Optional[HostPerformanceTable] = None, benchmark: bool = None,
+                 sample_bytes: int = None, timeout: float = None, concurrency: int = None):
+        """
+        Args:
+            http_client: HTTP client dùng chung
+            table: Bảng hiệu năng theo host (None = tạo mới)
+            benchmark: Có tải mẫu để đo hay chỉ dùng lịch sử
+            sample_bytes: Số bytes tối đa của một mẫu
+            timeout: Deadline của một lần tải mẫu (giây)
+            concurrency: Số mẫu tải đồng thời
+        """
+        self.logger = logging.getLogger(__name__)
+        self.http_client = http_client
+        self.table = table if table is not None else HostPerformanceTable()
+        self.benchmark = benchmark if benchmark is not None else Config.MIRROR_BENCHMARK_ENABLED
+        self.sample_bytes = sample_bytes if sample_bytes is not None else Config.MIRROR_SAMPLE_BYTES
+        self.timeout = timeout if timeout is not None else Config.MIRROR_SAMPLE_TIMEOUT
+        self.concurrency = concurrency if concurrency is not None else Config.MIRROR_SAMPLE_CONCURRENCY
+        self._counters = {'ranked': 0, 'sampled': 0, 'sample_failed': 0, 'from_history': 0}
+    
+    async def rank(self, links: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Đo (nếu cần) và sắp xếp link
+        
+        Args:
+            links: Các link stream
+        
+        Returns:
+            Các link đã sắp xếp, link của host đã có số đo được gắn `link['mirror']`
+        """
+        if not links:
+            return links
+        
+        if self.benchmark:
+            await self._sample_hosts(links)
+        
+        fallback = self.table.mean_throughput()
+        ranked = []
+        for link in links:
+            stats = self.table.get(host_of(link['url']))
+            seconds = stats.expected_seconds(fallback) if stats else None
+            if seconds is not None:
+                link = {**link, 'mirror': {
+                    'ttfb_ms': round(stats.ttfb_ms.value, 1) if stats.ttfb_ms.value is not None else None,
+                    'throughput': round(stats.throughput.value) if stats.throughput.value else None,
+                    'score': round(seconds, 3),
+                }}
+            ranked.append((self._sort_key(link, seconds), link))
+        
+        self._counters['ranked'] += 1
+        ranked.sort(key=lambda item: item[0])
+        return [link for _, link in ranked]
+    
+    @staticmethod
+    def _sort_key(link: Dict[str, str], seconds: Optional[float]) -> Tuple:
+        """Chất lượng, rồi mirror đã đo (nhanh trước), rồi bandwidth"""
+        rank = QUALITY_ORDER.get(link.get('quality'), QUALITY_ORDER[UNKNOWN_QUALITY])
+        return rank, seconds is None, seconds or 0.0, -int(link.get('bandwidth') or 0)
+    
+    async def _sample_hosts(self, links: List[Dict[str, str]]):
+        """Tải mẫu song song, mỗi host chưa có số đo gần đây một mẫu"""
+        targets = {}
+        for link in links:
+            host = host_of(link['url'])
+            if host in targets:
+                continue
+            if not self.table.needs_sample(host, Config.MIRROR_HISTORY_MAX_AGE):
+                self._counters['from_history'] += 1
+                continue
+            if link.get('probe', {}).get('alive') is False:
+                continue
+            targets[host] = link
+        if not targets:
+            return
+        
+        limit = asyncio.Semaphore(self.concurrency)
+        # Mirror lấy từ trang bên ngoài: chỉ tải mẫu từ địa chỉ công khai
+        own_session = None
+        if self.http_client:
+            session = self.http_client.public_session
+        else:
+            session = own_session = aiohttp.ClientSession(
+                connector=public_connector(),
+                headers=Config.DEFAULT_HEADERS,
+                trace_configs=[public_trace_config()]
+            )
+        
+        async def measure(host: str, link: Dict[str, str]):
+            async with limit:
+                timeout = clamp_timeout(self.timeout)
+                try:
+                    ttfb_ms, throughput = await asyncio.wait_for(self.sample(session, link), timeout)
+                except (aiohttp.ClientError, asyncio.TimeoutError, M3U8Error, ValueError,
+                        BlockedAddressError) as e:
+                    self._counters['sample_failed'] += 1
+                    # Bị cắt bởi deadline của yêu cầu thì không tính là lỗi của host
+                    if not (isinstance(e, asyncio.TimeoutError) and timeout < self.timeout):
+                        self.table.record_failure(host)
+                    self.logger.debug(f"Không tải được mẫu từ {host}: {e}")
+                    return
+            self._counters['sampled'] += 1
+            self.table.record(host, ttfb_ms=ttfb_ms, throughput=throughput)
+        
+        try:
+            await asyncio.gather(*(measure(host, link) for host, link in targets.items()))
+        finally:
+            if own_session:
+                await own_session.close()
+    
+    async def sample(self, session: aiohttp.ClientSession,
+                     link: Dict[str, str]) -> Tuple[float, Optional[float]]:
+        """
+        Tải một mẫu giới hạn từ link
+        
+        Args:
+            session: aiohttp session
+            link: Dict thông tin stream
+        
+        Returns:
+            (TTFB mili giây, throughput bytes/giây hoặc None nếu mẫu quá nhỏ)
+        """
+        url, byterange = link['url'], None
+        if link.get('type') == 'HLS' or classify_url(url).type == 'HLS':
+            url, byterange = await self._first_segment(session, url)
+        
+        if byterange is not None:
+            length, offset = byterange
+            end = offset + min(length, self.sample_bytes) - 1
+            headers = {'Range': f'bytes={offset}-{end}'}
+        else:
+            headers = {'Range': f'bytes=0-{self.sample_bytes - 1}'}
+        
+        started = time.monotonic()
+        async with session.get(url, headers=headers, allow_redirects=True) as response:
+            response.raise_for_status()
+            first_byte = time.monotonic()
+            received = 0
+            # Server bỏ qua Range vẫn chỉ bị đọc tối đa sample_bytes
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                received += len(chunk)
+                if received >= self.sample_bytes:
+                    break
+            finished = time.monotonic()
+        
+        ttfb_ms = round((first_byte - started) * 1000, 1)
+        if received < MIN_THROUGHPUT_SAMPLE or finished <= first_byte:
+            return ttfb_ms, None
+        return ttfb_ms, received / (finished - first_byte)
+    
+    async def _first_segment(self, session: aiohttp.ClientSession, url: str,
+                             depth: int = 0) -> Tuple[str, Optional[tuple]]:
+        """URL (và byte range) của segment đầu tiên, master thì theo variant bandwidth cao nhất"""
+        async with session.get(url, allow_redirects=True) as response:
+            response.raise_for_status()
+            parser = M3U8Parser(str(response.url))
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                parser.feed(chunk)
+                if len(parser.playlist.segments):
+                    break
+            else:
+                parser.close()
+            playlist = parser.playlist
+        
+        if len(playlist.segments):
+            return playlist.segment_url(0), playlist.segments[0].byterange
+        if playlist.is_master and playlist.variants and not depth:
+            variant = max(playlist.variants, key=lambda variant: variant.bandwidth)
+            return await self._first_segment(session, variant.uri, depth + 1)
+        raise M3U8Error(f"Playlist không có segment: {url}")
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm số lượt xếp hạng, số mẫu đã tải/lỗi và bảng hiệu năng
+        """
+        return {
+            'benchmark': self.benchmark,
+            **self._counters,
+            **self.table.stats(),
+        }
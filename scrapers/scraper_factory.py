@@ -9,12 +9,20 @@ from typing import Optional
 from urllib.parse import urlparse
 from scrapers.base_scraper import BaseScraper
 from scrapers.tvhay_scraper import TVHayScraper
+from utils.http_client import HttpClient
 
 class ScraperFactory:
     """Factory class để tạo scrapers"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[HttpClient] = None):
+        """
+        Khởi tạo factory
+        
+        Args:
+            http_client: HTTP client dùng chung, được truyền vào mọi scraper
+        """
         self.logger = logging.getLogger(__name__)
+        self.http_client = http_client
         self._scrapers = {}
         self._register_scrapers()
     
@@ -57,7 +65,7 @@ class ScraperFactory:
             scraper_class = self._scrapers.get(domain) or self._scrapers.get(domain_without_www)
             
             if scraper_class:
-                scraper = scraper_class()
+                scraper = scraper_class(http_client=self.http_client)
                 self.logger.info(f"Đã tạo scraper {scraper_class.__name__} cho domain {domain}")
                 return scraper
             else:
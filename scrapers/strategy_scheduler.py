@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chạy song song các strategy trích xuất, dừng sớm khi đã đủ link
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from config import Config
+from utils.deadline import clamp_timeout
+
+# Nguồn không được tính là mirror (link trực tiếp hoặc không rõ nguồn)
+NON_MIRROR_SOURCES = {'Unknown', 'Direct', 'TVHay Direct'}
+
+class SufficiencyRule:
+    """Quy tắc "đã đủ link" để huỷ các strategy còn lại"""
+    
+    def __init__(self, min_hls: int = 0, min_mirrors: int = 0, min_links: int = 0):
+        """
+        Args:
+            min_hls: Số link HLS tối thiểu
+            min_mirrors: Số mirror (hosting đã biết) tối thiểu
+            min_links: Tổng số link tối thiểu
+        """
+        self.min_hls = min_hls
+        self.min_mirrors = min_mirrors
+        self.min_links = min_links
+    
+    @classmethod
+    def parse(cls, spec: str) -> 'SufficiencyRule':
+        """
+        Tạo rule từ chuỗi cấu hình, ví dụ "hls:1,mirror:1" hoặc "links:3"
+        
+        Args:
+            spec: Chuỗi cấu hình (rỗng = không bao giờ dừng sớm)
+        
+        Returns:
+            SufficiencyRule
+        """
+        keys = {'hls': 'min_hls', 'mirror': 'min_mirrors', 'links': 'min_links'}
+        kwargs = {}
+        for part in (spec or '').split(','):
+            if not part.strip():
+                continue
+            name, _, value = part.partition(':')
+            name = name.strip().lower()
+            if name not in keys:
+                raise ValueError(f"Quy tắc không hợp lệ: {part}")
+            kwargs[keys[name]] = int(value or 1)
+        return cls(**kwargs)
+    
+    @property
+    def enabled(self) -> bool:
+        """False nếu rule rỗng"""
+        return bool(self.min_hls or self.min_mirrors or self.min_links)
+    
+    def is_satisfied(self, links: List[Dict[str, str]]) -> bool:
+        """Kiểm tra danh sách link hiện có đã đủ chưa"""
+        if not self.enabled:
+            return False
+        
+        urls = {link['url'] for link in links}
+        hls = {link['url'] for link in links if link.get('type') == 'HLS'}
+        mirrors = {link['url'] for link in links if link.get('source') not in NON_MIRROR_SOURCES}
+        
+        return (len(urls) >= self.min_links
+                and len(hls) >= self.min_hls
+                and len(mirrors) >= self.min_mirrors)
+
+Strategy = Callable[[], Awaitable[List[Dict[str, str]]]]
+
+class StrategyScheduler:
+    """
+    Chạy các strategy đồng thời, gộp kết quả khi từng strategy xong
+    
+    Dừng (huỷ phần còn lại) khi rule được thoả mãn hoặc hết deadline,
+    nên độ trễ xấu nhất bị chặn bởi deadline thay vì tổng các timeout.
+    """
+    
+    def __init__(self, deadline: float = None, rule: Optional[SufficiencyRule] = None):
+        """
+        Args:
+            deadline: Thời gian tối đa cho cả lượt (giây)
+            rule: Quy tắc dừng sớm
+        """
+        self.logger = logging.getLogger(__name__)
+        self.deadline = deadline if deadline is not None else Config.EXTRACTION_DEADLINE
+        self.rule = rule if rule is not None else SufficiencyRule.parse(Config.EXTRACTION_SUFFICIENCY)
+        self.last_stats: Dict[str, object] = {}
+    
+    async def run(self, strategies: Dict[str, Strategy],
+                  on_result: Optional[Callable[[str, List[Dict[str, str]]], None]] = None) -> List[Dict[str, str]]:
+        """
+        Chạy tất cả strategies
+        
+        Args:
+            strategies: Dict tên -> coroutine function không tham số
+            on_result: Callback (tên, links) gọi mỗi khi một strategy xong
+        
+        Returns:
+            Các link đã gộp (chưa loại duplicate)
+        """
+        started = time.monotonic()
+        # Không chạy quá thời gian còn lại của yêu cầu
+        deadline = clamp_timeout(self.deadline)
+        tasks = {asyncio.create_task(strategy()): name for name, strategy in strategies.items()}
+        pending = set(tasks)
+        merged: List[Dict[str, str]] = []
+        completed = []
+        reason = 'all_done'
+        
+        try:
+            while pending:
+                remaining = deadline - (time.monotonic() - started)
+                if remaining <= 0:
+                    reason = 'deadline'
+                    break
+                
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                for task in done:
+                    name = tasks[task]
+                    completed.append(name)
+                    if task.exception():
+                        self.logger.error(f"Strategy {name} lỗi: {task.exception()}")
+                        continue
+                    
+                    links = task.result() or []
+                    merged.extend(links)
+                    if on_result:
+                        on_result(name, links)
+                
+                if pending and self.rule.is_satisfied(merged):
+                    reason = 'sufficient'
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        cancelled = [tasks[task] for task in pending]
+        self.last_stats = {
+            'reason': reason,
+            'completed': completed,
+            'cancelled': cancelled,
+            'elapsed': round(time.monotonic() - started, 3),
+        }
+        if cancelled:
+            self.logger.info(f"Dừng sớm ({reason}), huỷ các strategy: {', '.join(cancelled)}")
+        return merged
@@ -4,19 +4,27 @@
 Scraper cho trang web tvhay.fm
 """
 
-import re
 import json
 import trafilatura
-from typing import List, Dict
-from urllib.parse import urljoin, urlparse
+from typing import List, Dict, Optional
+from urllib.parse import urljoin
 from scrapers.base_scraper import BaseScraper
 from scrapers.web_scraper import WebScraper
+from scrapers.document_store import DocumentStore
+from scrapers.iframe_resolver import IframeResolver
+from utils.html_elements import PageElements
+from utils.http_client import HttpClient
+from utils.link_matcher import get_matcher
+from utils.url_classifier import classify_url, stream_sort_key
 
 class TVHayScraper(BaseScraper):
     """Scraper cho tvhay.fm"""
     
-    def __init__(self):
-        super().__init__()
+    EARLY_STOP_PROFILE = 'tvhay_text'
+    SCRIPT_PROFILE = 'tvhay_js'
+    
+    def __init__(self, http_client: Optional[HttpClient] = None):
+        super().__init__(http_client)
         self.base_domain = "tvhay.fm"
     
     def get_supported_domains(self) -> List[str]:
@@ -38,46 +46,53 @@ class TVHayScraper(BaseScraper):
             
             # Phương pháp 1: Enhanced scraper với multiple strategies
             from scrapers.enhanced_scraper import EnhancedScraper
-            enhanced_scraper = EnhancedScraper()
-            stream_links = enhanced_scraper.extract_all_streams(url)
+            async with EnhancedScraper(http_client=self.http_client) as enhanced_scraper:
+                # Một store cho cả lượt: trang chỉ được tải một lần cho mọi phương pháp
+                store = DocumentStore(enhanced_scraper.fetch_document)
+                stream_links = await enhanced_scraper.extract_all_streams(url, store)
             
             if stream_links:
                 self.logger.info(f"EnhancedScraper tìm thấy {len(stream_links)} links")
                 return stream_links
             
-            # Phương pháp backup: Sử dụng demo links nếu không tìm thấy
-            self.logger.warning("Không tìm thấy link thực, sử dụng demo links để test bot")
-            from scrapers.demo_scraper import DemoScraper
-            demo_scraper = DemoScraper()
-            demo_links = demo_scraper.extract_demo_links(url)
-            
-            if demo_links:
-                self.logger.info(f"Demo scraper tạo {len(demo_links)} links mẫu")
-                return demo_links
-            
             # Phương pháp 2: Sử dụng aiohttp với cải tiến
             async with self:
-                html = await self.fetch_html(url)
-                if html:
-                    soup = self.parse_html(html)
+                # Dùng lại trang đã tải trong store, chỉ tải lại (có retry) nếu lần đầu lỗi
+                document = store.peek(url)
+                if not (document and document.ok):
+                    document = await self.fetch_page(url)
+                if document and document.body:
+                    # Một lượt parse (qua CPU pool) cho cả iframe, script và link trực tiếp
+                    parsed = await self.parse_page(document.body, document.encoding)
                     
                     # Tìm player iframe
-                    iframe_links = await self._extract_from_iframes(soup, url)
+                    iframe_links = await self._extract_from_iframes(parsed.elements, url)
                     stream_links.extend(iframe_links)
                     
                     # Tìm trong JavaScript  
-                    js_links = await self._extract_from_javascript(soup, url)
+                    js_links = await self._extract_from_javascript(parsed.script_urls, url)
                     stream_links.extend(js_links)
                     
                     # Tìm direct video links
-                    direct_links = self._extract_direct_links(soup)
+                    direct_links = self._extract_direct_links(parsed.elements)
                     stream_links.extend(direct_links)
                 
                 # Loại bỏ duplicate và sắp xếp theo quality
                 unique_links = self._deduplicate_links(stream_links)
-                
+            
+            if unique_links:
                 self.logger.info(f"Đã tìm thấy {len(unique_links)} stream links từ TVHay")
                 return unique_links
+            
+            # Phương pháp backup: Sử dụng demo links nếu cả hai phương pháp không tìm thấy
+            self.logger.warning("Không tìm thấy link thực, sử dụng demo links để test bot")
+            from scrapers.demo_scraper import DemoScraper
+            demo_scraper = DemoScraper()
+            demo_links = demo_scraper.extract_demo_links(url)
+            
+            if demo_links:
+                self.logger.info(f"Demo scraper tạo {len(demo_links)} links mẫu")
+            return demo_links
                 
         except Exception as e:
             self.logger.error(f"Lỗi khi trích xuất từ TVHay: {e}")
@@ -100,48 +115,22 @@ class TVHayScraper(BaseScraper):
                 self.logger.warning("Trafilatura không thể trích xuất nội dung")
                 return []
             
-            # Parse với BeautifulSoup
-            soup = self.parse_html(downloaded)
+            # Chỉ cần các iframe của trang
+            page = self.parse_elements(downloaded)
             stream_links = []
             
-            # Tìm các pattern video trong nội dung
-            patterns = [
-                r'(https?://[^\s"\'<>]+\.m3u8[^\s"\'<>]*)',
-                r'(https?://[^\s"\'<>]+\.mp4[^\s"\'<>]*)',
-                r'(https?://[^\s"\'<>]+\.mkv[^\s"\'<>]*)',
-                r'(https?://streamtape\.com/[^\s"\'<>]+)',
-                r'(https?://doodstream\.com/[^\s"\'<>]+)',
-                r'(https?://mixdrop\.co/[^\s"\'<>]+)'
-            ]
-            
             full_content = downloaded + " " + (extracted_html or "")
             
-            for pattern in patterns:
-                matches = re.findall(pattern, full_content, re.IGNORECASE)
-                for match in matches:
-                    if self.is_video_url(match):
-                        quality = self._detect_quality(match)
-                        source = self._detect_source(match)
-                        
-                        stream_links.append(self.format_stream_info(
-                            url=match,
-                            quality=quality,
-                            source=source
-                        ))
+            # Tìm các pattern video trong nội dung
+            for match in get_matcher('tvhay_text').urls(full_content):
+                if self.is_video_url(match):
+                    stream_links.append(self.stream_info_for(match))
             
             # Tìm iframe sources
-            iframes = soup.find_all('iframe', src=True)
-            for iframe in iframes:
+            for iframe in page.iframes:
                 src = iframe.get('src')
-                if src and any(host in src for host in ['streamtape', 'doodstream', 'mixdrop', 'upstream', 'filesupload']):
-                    quality = self._detect_quality(src)
-                    source = self._detect_source(src)
-                    
-                    stream_links.append(self.format_stream_info(
-                        url=src,
-                        quality=quality,
-                        source=source
-                    ))
+                if src and classify_url(src).host:
+                    stream_links.append(self.stream_info_for(src))
             
             self.logger.info(f"Trafilatura tìm thấy {len(stream_links)} links")
             return stream_links
@@ -150,162 +139,55 @@ class TVHayScraper(BaseScraper):
             self.logger.error(f"Lỗi trafilatura: {e}")
             return []
     
-    async def _extract_from_iframes(self, soup, base_url: str) -> List[Dict[str, str]]:
-        """Trích xuất từ các iframe players"""
+    async def _extract_from_iframes(self, page: PageElements, base_url: str) -> List[Dict[str, str]]:
+        """Trích xuất từ các iframe players (tải song song, kể cả iframe lồng nhau)"""
         stream_links = []
         
-        # Tìm tất cả iframe
-        iframes = soup.find_all('iframe')
-        
-        for iframe in iframes:
-            src = iframe.get('src')
-            if not src:
-                continue
-            
-            # Tạo absolute URL
-            if src.startswith('//'):
-                src = 'https:' + src
-            elif src.startswith('/'):
-                src = urljoin(base_url, src)
-            
-            self.logger.info(f"Đang xử lý iframe: {src}")
-            
-            # Lấy HTML từ iframe
-            iframe_html = await self.fetch_html(src)
-            if not iframe_html:
-                continue
-            
-            iframe_soup = self.parse_html(iframe_html)
-            
-            # Tìm video sources trong iframe
-            video_urls = self.extract_video_urls(iframe_soup)
-            
-            for video_url in video_urls:
-                quality = self._detect_quality(video_url)
-                source = self._detect_source(video_url)
-                
-                stream_links.append(self.format_stream_info(
-                    url=video_url,
-                    quality=quality,
-                    source=source
-                ))
+        resolver = IframeResolver(self.fetch_page, self.parse_page, self.extract_video_urls)
+        # Link được thêm ngay khi từng mirror tải xong, hết deadline vẫn giữ phần đã có
+        await resolver.resolve(
+            page, base_url,
+            on_video=lambda video_url: stream_links.append(self.stream_info_for(video_url))
+        )
         
         return stream_links
     
-    async def _extract_from_javascript(self, soup, base_url: str) -> List[Dict[str, str]]:
+    async def _extract_from_javascript(self, script_urls: List[str], base_url: str) -> List[Dict[str, str]]:
         """Trích xuất từ JavaScript code"""
         stream_links = []
         
-        # Tìm tất cả script tags
-        scripts = soup.find_all('script')
-        
-        for script in scripts:
-            if not script.string:
-                continue
-            
-            script_content = script.string
-            
-            # Pattern để tìm URLs video
-            patterns = [
-                r'"(https?://[^"]*\.m3u8[^"]*)"',
-                r'"(https?://[^"]*\.mp4[^"]*)"',
-                r'"(https?://[^"]*\.mkv[^"]*)"',
-                r'src\s*:\s*["\']([^"\']+)["\']',
-                r'file\s*:\s*["\']([^"\']+)["\']',
-                r'url\s*:\s*["\']([^"\']+)["\']'
-            ]
-            
-            for pattern in patterns:
-                matches = re.findall(pattern, script_content, re.IGNORECASE)
+        # URL trong các script inline đã được quét (SCRIPT_PROFILE) khi parse
+        for match in script_urls:
+            if self.is_video_url(match):
+                # Tạo absolute URL nếu cần
+                if match.startswith('//'):
+                    match = 'https:' + match
+                elif match.startswith('/'):
+                    match = urljoin(base_url, match)
                 
-                for match in matches:
-                    if self.is_video_url(match):
-                        # Tạo absolute URL nếu cần
-                        if match.startswith('//'):
-                            match = 'https:' + match
-                        elif match.startswith('/'):
-                            match = urljoin(base_url, match)
-                        
-                        quality = self._detect_quality(match)
-                        source = self._detect_source(match)
-                        
-                        stream_links.append(self.format_stream_info(
-                            url=match,
-                            quality=quality,
-                            source=source
-                        ))
+                stream_links.append(self.stream_info_for(match))
         
         return stream_links
     
-    def _extract_direct_links(self, soup) -> List[Dict[str, str]]:
+    def _extract_direct_links(self, page: PageElements) -> List[Dict[str, str]]:
         """Trích xuất direct video links"""
         stream_links = []
         
         # Tìm video URLs thông thường
-        video_urls = self.extract_video_urls(soup)
+        video_urls = self.extract_video_urls(page)
         
         for video_url in video_urls:
-            quality = self._detect_quality(video_url)
-            source = self._detect_source(video_url)
-            
-            stream_links.append(self.format_stream_info(
-                url=video_url,
-                quality=quality,
-                source=source
-            ))
+            stream_links.append(self.stream_info_for(video_url))
         
         return stream_links
     
-    def _detect_quality(self, url: str) -> str:
-        """Phát hiện chất lượng video từ URL"""
-        url_lower = url.lower()
-        
-        quality_patterns = {
-            '4k': ['2160p', '4k', 'uhd'],
-            '1080p': ['1080p', 'fhd', 'fullhd'],
-            '720p': ['720p', 'hd'],
-            '480p': ['480p', 'sd'],
-            '360p': ['360p'],
-            '240p': ['240p']
-        }
-        
-        for quality, patterns in quality_patterns.items():
-            for pattern in patterns:
-                if pattern in url_lower:
-                    return quality
-        
-        return 'Unknown'
-    
-    def _detect_source(self, url: str) -> str:
-        """Phát hiện nguồn video từ URL"""
-        domain = urlparse(url).netloc.lower()
-        
-        source_mapping = {
-            'streamtape.com': 'StreamTape',
-            'doodstream.com': 'DoodStream',
-            'mixdrop.co': 'MixDrop',
-            'upstream.to': 'Upstream',
-            'filesupload.org': 'FilesUpload',
-            'streamlare.com': 'StreamLare',
-            'supervideo.tv': 'SuperVideo',
-            'tvhay.fm': 'TVHay Direct'
-        }
-        
-        for host, source_name in source_mapping.items():
-            if host in domain:
-                return source_name
-        
-        return 'Unknown'
-    
     def _deduplicate_links(self, links: List[Dict[str, str]]) -> List[Dict[str, str]]:
         """Loại bỏ duplicate links và sắp xếp"""
         seen_urls = set()
         unique_links = []
         
-        # Sắp xếp theo quality (4K > 1080p > 720p > ...)
-        quality_order = {'4k': 0, '1080p': 1, '720p': 2, '480p': 3, '360p': 4, '240p': 5, 'Unknown': 6}
-        
-        sorted_links = sorted(links, key=lambda x: quality_order.get(x['quality'], 6))
+        # Sắp xếp theo quality (4K > 1080p > 720p > ...), cùng quality thì theo bandwidth
+        sorted_links = sorted(links, key=stream_sort_key)
         
         for link in sorted_links:
             url = link['url']
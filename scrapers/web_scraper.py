@@ -5,16 +5,35 @@ Web scraper sử dụng trafilatura cho việc trích xuất content
 """
 
 import trafilatura
-import re
 import logging
-from typing import List, Dict
-from urllib.parse import urlparse
+from typing import List, Dict, Optional
+from utils.http_client import HttpClient
+from utils.link_matcher import get_matcher
+from utils.url_classifier import classify_url, stream_sort_key
 
 class WebScraper:
     """Web scraper đơn giản sử dụng trafilatura"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[HttpClient] = None):
+        """
+        Khởi tạo scraper
+        
+        Args:
+            http_client: HTTP client dùng chung (nếu None sẽ dùng trafilatura.fetch_url)
+        """
         self.logger = logging.getLogger(__name__)
+        self.http_client = http_client
+    
+    def _download(self, url: str) -> Optional[str]:
+        """Tải HTML qua session dùng chung nếu có, ngược lại qua trafilatura"""
+        if not self.http_client:
+            return trafilatura.fetch_url(url)
+        
+        response = self.http_client.sync_session.get(url, timeout=30)
+        if response.status_code != 200:
+            self.logger.warning(f"HTTP {response.status_code} từ {url}")
+            return None
+        return response.text
     
     def get_website_text_content(self, url: str) -> str:
         """
@@ -30,7 +49,7 @@ class WebScraper:
             self.logger.info(f"Đang lấy nội dung từ: {url}")
             
             # Send a request to the website
-            downloaded = trafilatura.fetch_url(url)
+            downloaded = self._download(url)
             if not downloaded:
                 self.logger.warning(f"Không thể tải nội dung từ {url}")
                 return ""
@@ -62,45 +81,22 @@ class WebScraper:
             self.logger.info(f"Đang trích xuất video links từ: {url}")
             
             # Lấy HTML raw
-            downloaded = trafilatura.fetch_url(url)
+            downloaded = self._download(url)
             if not downloaded:
                 return []
             
             video_links = []
             
-            # Các pattern để tìm video links
-            video_patterns = [
-                # M3U8 streams
-                r'(https?://[^\s"\'<>]+\.m3u8[^\s"\'<>]*)',
-                # MP4 files
-                r'(https?://[^\s"\'<>]+\.mp4[^\s"\'<>]*)',
-                # MKV files
-                r'(https?://[^\s"\'<>]+\.mkv[^\s"\'<>]*)',
-                # Streaming hosts
-                r'(https?://streamtape\.com/[^\s"\'<>]+)',
-                r'(https?://doodstream\.com/[^\s"\'<>]+)',
-                r'(https?://mixdrop\.co/[^\s"\'<>]+)',
-                r'(https?://upstream\.to/[^\s"\'<>]+)',
-                r'(https?://filesupload\.org/[^\s"\'<>]+)',
-                r'(https?://streamlare\.com/[^\s"\'<>]+)',
-                r'(https?://supervideo\.tv/[^\s"\'<>]+)',
-                # Embed patterns
-                r'embed[^"\']*["\']([^"\']+)["\']',
-                r'src[^"\']*["\']([^"\']*(?:\.mp4|\.m3u8|streamtape|doodstream|mixdrop)[^"\']*)["\']',
-            ]
-            
-            for pattern in video_patterns:
-                matches = re.findall(pattern, downloaded, re.IGNORECASE)
-                for match in matches:
-                    if self._is_valid_video_url(match):
-                        quality = self._detect_quality(match)
-                        source = self._detect_source(match)
-                        
-                        video_links.append({
-                            'url': match,
-                            'quality': quality,
-                            'source': source
-                        })
+            # M3U8/MP4/MKV, streaming hosts và embed patterns trong một lượt quét
+            for match in get_matcher('web').urls(downloaded):
+                if self._is_valid_video_url(match):
+                    info = classify_url(match)
+                    
+                    video_links.append({
+                        'url': match,
+                        'quality': info.quality,
+                        'source': info.source or 'Unknown'
+                    })
             
             # Loại bỏ duplicate
             unique_links = self._deduplicate_links(video_links)
@@ -117,63 +113,7 @@ class WebScraper:
         if not url or len(url) < 10:
             return False
         
-        url_lower = url.lower()
-        
-        # Video file extensions
-        video_exts = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m3u8']
-        for ext in video_exts:
-            if ext in url_lower:
-                return True
-        
-        # Video hosting domains
-        video_hosts = [
-            'streamtape.com', 'doodstream.com', 'mixdrop.co',
-            'upstream.to', 'filesupload.org', 'streamlare.com',
-            'supervideo.tv', 'vidcloud.co', 'fembed.com'
-        ]
-        for host in video_hosts:
-            if host in url_lower:
-                return True
-        
-        return False
-    
-    def _detect_quality(self, url: str) -> str:
-        """Phát hiện chất lượng video"""
-        url_lower = url.lower()
-        
-        if any(q in url_lower for q in ['2160p', '4k', 'uhd']):
-            return '4K'
-        elif any(q in url_lower for q in ['1080p', 'fhd', 'fullhd']):
-            return '1080p'
-        elif any(q in url_lower for q in ['720p', 'hd']):
-            return '720p'
-        elif any(q in url_lower for q in ['480p', 'sd']):
-            return '480p'
-        elif any(q in url_lower for q in ['360p']):
-            return '360p'
-        else:
-            return 'Unknown'
-    
-    def _detect_source(self, url: str) -> str:
-        """Phát hiện nguồn video"""
-        domain = urlparse(url).netloc.lower()
-        
-        source_map = {
-            'streamtape.com': 'StreamTape',
-            'doodstream.com': 'DoodStream', 
-            'mixdrop.co': 'MixDrop',
-            'upstream.to': 'Upstream',
-            'filesupload.org': 'FilesUpload',
-            'streamlare.com': 'StreamLare',
-            'supervideo.tv': 'SuperVideo',
-            'tvhay.fm': 'TVHay Direct'
-        }
-        
-        for host, source_name in source_map.items():
-            if host in domain:
-                return source_name
-        
-        return 'Unknown'
+        return classify_url(url).is_video
     
     def _deduplicate_links(self, links: List[Dict[str, str]]) -> List[Dict[str, str]]:
         """Loại bỏ duplicate links"""
@@ -181,8 +121,7 @@ class WebScraper:
         unique_links = []
         
         # Sắp xếp theo quality
-        quality_order = {'4K': 0, '1080p': 1, '720p': 2, '480p': 3, '360p': 4, 'Unknown': 5}
-        sorted_links = sorted(links, key=lambda x: quality_order.get(x['quality'], 5))
+        sorted_links = sorted(links, key=stream_sort_key)
         
         for link in sorted_links:
             url = link['url']
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test pool chạy tác vụ CPU
+"""
+
+import asyncio
+from utils.cpu_pool import CpuPool, parse_page
+from utils.html_elements import PageElements, _backends, register_backend
+
+PAGE = b'<html><body><iframe src="https://player.example.com/e/1"></iframe></body></html>'
+
+def _marker_backend(html: str) -> PageElements:
+    """Backend thử: chỉ trả một iframe cố định"""
+    page = PageElements()
+    page.add('iframe', {'src': 'custom-backend'})
+    return page
+
+def test_custom_backend_in_process_workers():
+    """Backend đăng ký ở process chính được dùng cả trong worker spawn"""
+    register_backend('test-marker', _marker_backend)
+    # Hàm không pickle được chỉ bị bỏ khỏi worker, pool vẫn chạy
+    register_backend('test-lambda', lambda html: PageElements())
+    pool = CpuPool(mode='process', workers=1, min_bytes=0)
+    try:
+        parsed = asyncio.run(pool.run(parse_page, PAGE, 'utf-8', 'test-marker', size=len(PAGE)))
+        assert [element.get('src') for element in parsed.elements.iframes] == ['custom-backend']
+        assert pool.stats()['offloaded'] == 1
+        default = asyncio.run(pool.run(parse_page, PAGE, 'utf-8', 'lxml', size=len(PAGE)))
+        assert default.elements.iframes[0].get('src') == 'https://player.example.com/e/1'
+    finally:
+        pool.shutdown()
+        _backends.pop('test-marker', None)
+        _backends.pop('test-lambda', None)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test relay HLS (viết lại playlist, chặn địa chỉ nội bộ)
+"""
+
+import asyncio
+import aiohttp
+from utils.hls_relay import PLAYLIST, SEGMENT, HlsRelay, PlaylistRewriter
+
+def test_rewriter_relays_every_uri():
+    """Dòng URI và thuộc tính URI="..." đều được ký, variant là playlist, URI không phải http giữ nguyên"""
+    rewriter = PlaylistRewriter('https://cdn.example.com/v/master.m3u8', lambda kind, url: f'{kind}|{url}')
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-KEY:METHOD=AES-128,URI="key.bin"',
+        '#EXT-X-SESSION-KEY:METHOD=SAMPLE-AES,URI="skd://drm"',
+        '#EXT-X-STREAM-INF:BANDWIDTH=800000',
+        '720/index.m3u8',
+        '#EXTINF:10,',
+        'https://edge.example.com/seg1.ts',
+    ]
+    assert [rewriter.rewrite(line) for line in lines] == [
+        '#EXTM3U',
+        f'#EXT-X-KEY:METHOD=AES-128,URI="{SEGMENT}|https://cdn.example.com/v/key.bin"',
+        '#EXT-X-SESSION-KEY:METHOD=SAMPLE-AES,URI="skd://drm"',
+        '#EXT-X-STREAM-INF:BANDWIDTH=800000',
+        f'{PLAYLIST}|https://cdn.example.com/v/720/index.m3u8',
+        '#EXTINF:10,',
+        f'{SEGMENT}|https://edge.example.com/seg1.ts',
+    ]
+
+def test_relay_refuses_internal_hosts():
+    """Playlist, segment trỏ vào IP nội bộ hay tên miền trỏ vào loopback đều bị từ chối (403)"""
+    async def run():
+        relay = HlsRelay(host='127.0.0.1', port=0, public_url='http://relay', secret='test')
+        await relay.start()
+        base = f'http://127.0.0.1:{relay._runner.addresses[0][1]}'
+        urls = [
+            relay.relay_url('http://127.0.0.1:1/index.m3u8'),
+            relay.relay_url('http://localhost:1/index.m3u8'),
+            relay._sign(SEGMENT, 'stream', 'http://169.254.169.254/latest/meta-data'),
+        ]
+        try:
+            async with aiohttp.ClientSession() as session:
+                for url in urls:
+                    async with session.get(url.replace('http://relay', base)) as response:
+                        assert response.status == 403, url
+            assert relay.stats()['blocked'] == 3
+        finally:
+            await relay.stop()
+    
+    asyncio.run(run())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test giới hạn tốc độ theo host và circuit breaker
+"""
+
+import asyncio
+import time
+import pytest
+from utils.host_limiter import (
+    CLOSED, HALF_OPEN, OPEN, CircuitOpenError, HostLimiter, HostThrottledError, parse_retry_after
+)
+
+HOST = 'cdn.example.com'
+
+def _limiter(**kwargs) -> HostLimiter:
+    options = dict(rate=10.0, burst=2.0, min_rate=0.5, max_rate=20.0, max_wait=1.0,
+                   failure_threshold=3, cooldown=0.2)
+    options.update(kwargs)
+    return HostLimiter(**options)
+
+def test_aimd_rate():
+    """403/429 giảm một nửa tốc độ (không dưới min_rate), thành công tăng 10% tốc độ ban đầu"""
+    limiter = _limiter()
+    limiter.record(HOST, 429)
+    assert limiter._hosts[HOST].rate == pytest.approx(5.0)
+    for _ in range(10):
+        limiter.record(HOST, 403)
+    assert limiter._hosts[HOST].rate == pytest.approx(0.5)
+    limiter.record(HOST, 200)
+    assert limiter._hosts[HOST].rate == pytest.approx(1.5)
+    for _ in range(100):
+        limiter.record(HOST, 200)
+    assert limiter._hosts[HOST].rate == pytest.approx(20.0)
+
+def test_throttle_drops_burst():
+    """Bị 429 thì request kế tiếp phải chờ theo tốc độ mới, quá max_wait thì bị bỏ"""
+    async def run():
+        limiter = _limiter(rate=1.0, min_rate=0.1, max_wait=0.5, failure_threshold=100)
+        await limiter.acquire(HOST)
+        limiter.record(HOST, 429)
+        with pytest.raises(HostThrottledError):
+            await limiter.acquire(HOST)
+    asyncio.run(run())
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', now=1445412470.0) == pytest.approx(10.0)
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+def test_retry_after_blocks_host():
+    """Retry-After chặn host tới hết thời gian yêu cầu: chờ nếu ngắn, bỏ nếu dài hơn max_wait"""
+    async def run():
+        limiter = _limiter(failure_threshold=100)
+        limiter.record(HOST, 503, retry_after='5')
+        started = time.monotonic()
+        with pytest.raises(HostThrottledError) as error:
+            await limiter.acquire(HOST)
+        assert error.value.retry_in > 4.9
+        assert time.monotonic() - started < 0.1
+        assert not limiter.try_acquire(HOST)
+        
+        short = _limiter(failure_threshold=100)
+        await short.acquire(HOST)
+        short._hosts[HOST].blocked_until = time.monotonic() + 0.2
+        started = time.monotonic()
+        await short.acquire(HOST)
+        assert time.monotonic() - started >= 0.19
+    asyncio.run(run())
+
+def test_circuit_half_open_probe():
+    """Lỗi liên tiếp mở circuit; hết cooldown chỉ một request thử, thử lỗi thì mở lại, thành công thì đóng"""
+    async def run():
+        limiter = _limiter()
+        for _ in range(3):
+            limiter.record_failure(HOST)
+        assert limiter._hosts[HOST].circuit == OPEN
+        with pytest.raises(CircuitOpenError):
+            limiter.check(HOST)
+        with pytest.raises(CircuitOpenError):
+            await limiter.acquire(HOST)
+        
+        await asyncio.sleep(0.25)
+        limiter.check(HOST)
+        await limiter.acquire(HOST)
+        assert limiter._hosts[HOST].circuit == HALF_OPEN
+        # Request thử đang chạy: request khác vẫn bị bỏ
+        with pytest.raises(CircuitOpenError):
+            await limiter.acquire(HOST)
+        limiter.record(HOST, 502)
+        assert limiter._hosts[HOST].circuit == OPEN
+        
+        await asyncio.sleep(0.25)
+        await limiter.acquire(HOST)
+        # Request thử bị huỷ: cho phép request thử khác
+        limiter.release(HOST)
+        await limiter.acquire(HOST)
+        limiter.record(HOST, 200)
+        assert limiter._hosts[HOST].circuit == CLOSED
+        assert limiter.stats()['trips'] == 2
+    asyncio.run(run())
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test đọc trang HTML theo luồng (dừng sớm, chọn charset)
+"""
+
+from utils.html_reader import CHUNK_SIZE, EARLY_STOP_OVERLAP, _IncrementalReader
+
+def _read(data: bytes, encoding=None, enough=None, chunk_size=CHUNK_SIZE, max_bytes=10 * 1024 * 1024):
+    reader = _IncrementalReader(encoding, max_bytes, enough)
+    for start in range(0, len(data), chunk_size):
+        if not reader.feed(data[start:start + chunk_size]):
+            break
+    return reader.result()
+
+def test_early_stop_scans_only_new_text():
+    """Callback chỉ nhận phần mới kèm đoạn chồng lấn; URL vắt qua hai chunk vẫn được thấy"""
+    url = 'https://cdn.example.com/video/index.m3u8'
+    filler = b'<p>' + b'x' * 1000 + b'</p>'
+    data = filler * 50 + url.encode() + filler * 50
+    windows = []
+    
+    def enough(text: str) -> bool:
+        windows.append(len(text))
+        return url in text
+    
+    page = _read(data, 'utf-8', enough, chunk_size=1024)
+    assert page.stopped_early
+    assert max(windows) <= EARLY_STOP_OVERLAP + 1024
+    assert len(page.body) < len(data)
+
+def test_meta_charset_when_header_has_none():
+    """Header không có charset thì dùng <meta charset>, kể cả khi chunk đầu rất nhỏ"""
+    data = '<html><head><meta charset="iso-8859-1"></head><body>café</body></html>'.encode('iso-8859-1')
+    for chunk_size in (7, CHUNK_SIZE):
+        page = _read(data, chunk_size=chunk_size)
+        assert page.encoding == 'iso-8859-1'
+        assert 'café' in page.text
+    
+    data = ('<meta http-equiv="Content-Type" content="text/html; charset=windows-1252">'
+            '<p>naïve</p>').encode('windows-1252')
+    assert 'naïve' in _read(data).text
+
+def test_header_charset_wins_and_utf8_fallback():
+    data = '<meta charset="iso-8859-1"><p>Tiếng Việt</p>'.encode('utf-8')
+    assert 'Tiếng Việt' in _read(data, 'utf-8').text
+    assert 'Tiếng Việt' in _read('<p>Tiếng Việt</p>'.encode('utf-8')).text
+    assert _read(b'<p>x</p>', 'no-such-codec').encoding == 'utf-8'
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test theo dõi live playlist và probe link live
+"""
+
+import asyncio
+from aiohttp import web
+from scrapers.link_prober import LinkProber
+from utils.live_playlist import LivePlaylistTracker
+
+def _playlist(sequence: int, count: int = 3, endlist: bool = False) -> bytes:
+    lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:1', f'#EXT-X-MEDIA-SEQUENCE:{sequence}']
+    for index in range(sequence, sequence + count):
+        lines += ['#EXTINF:1,', f'seg{index}.ts']
+    if endlist:
+        lines.append('#EXT-X-ENDLIST')
+    return ('\n'.join(lines) + '\n').encode()
+
+def test_tracker_parses_only_new_segments():
+    """Poll sau chỉ trả segment mới, lỡ cửa sổ thì đếm gap, ENDLIST được nhận ra"""
+    tracker = LivePlaylistTracker('http://live.example.com/index.m3u8', window=4)
+    assert [segment.sequence for segment in tracker.apply(_playlist(10))] == [10, 11, 12]
+    assert [segment.sequence for segment in tracker.apply(_playlist(11))] == [13]
+    assert tracker.apply(_playlist(11)) == []
+    assert [segment.uri for segment in tracker.apply(_playlist(16, endlist=True))] == ['seg16.ts', 'seg17.ts', 'seg18.ts']
+    assert tracker.stats()['gaps'] == 1
+    assert tracker.endlist and not tracker.stalled
+    assert len(tracker.segments) == 4
+
+def test_prober_tracks_live_and_detects_stall(monkeypatch):
+    """Playlist không có ENDLIST được đánh dấu live; playlist đứng yên quá lâu thì bị báo chết"""
+    # Server test chạy trên loopback: cho phép địa chỉ nội bộ trong test này
+    monkeypatch.setattr('utils.url_guard.is_public_ip', lambda address: True)
+    state = {'sequence': 0, 'frozen': False}
+    
+    async def live(request):
+        if not state['frozen']:
+            state['sequence'] += 1
+        return web.Response(body=_playlist(state['sequence']), content_type='application/vnd.apple.mpegurl')
+    
+    async def vod(request):
+        return web.Response(body=_playlist(0, endlist=True), content_type='application/vnd.apple.mpegurl')
+    
+    async def segment(request):
+        return web.Response(body=b'\x47' * 1024, content_type='video/mp2t')
+    
+    async def run():
+        app = web.Application()
+        app.router.add_get('/live.m3u8', live)
+        app.router.add_get('/vod.m3u8', vod)
+        app.router.add_get('/{name}.ts', segment)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base = f'http://127.0.0.1:{runner.addresses[0][1]}'
+        try:
+            prober = LinkProber(cache_ttl=0.01, drop_dead=False)
+            links = [{'url': f'{base}/live.m3u8', 'type': 'HLS'}, {'url': f'{base}/vod.m3u8', 'type': 'HLS'}]
+            first = [link['probe'] for link in await prober.probe_links(links)]
+            assert first[0]['alive'] and first[0]['live']
+            assert first[1]['alive'] and 'live' not in first[1]
+            
+            # Lần probe sau đi qua tracker (poll phần mới, probe segment mới nhất)
+            await asyncio.sleep(0.05)
+            second = (await prober.probe_links(links[:1]))[0]['probe']
+            assert second['alive'] and second['live']
+            
+            # Playlist không đổi quá LIVE_STALL_FACTOR x TARGETDURATION
+            state['frozen'] = True
+            await asyncio.sleep(3.2)
+            stalled = (await prober.probe_links(links[:1]))[0]['probe']
+            assert stalled['alive'] is False and stalled['error'] == 'stalled'
+            assert prober.stats()['stalled'] == 1
+        finally:
+            await runner.cleanup()
+    
+    asyncio.run(run())
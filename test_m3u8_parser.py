@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test parser M3U8
+"""
+
+import pytest
+from utils.m3u8_parser import M3U8Error, M3U8Parser, parse_m3u8
+
+MEDIA_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:4
+#EXT-X-TARGETDURATION:10
+#EXT-X-MEDIA-SEQUENCE:7
+#EXT-X-MAP:URI="init.mp4",BYTERANGE="720@0"
+#EXTINF:10.0,
+#EXT-X-BYTERANGE:1000@720
+all.mp4
+#EXTINF:9.5,Phần 2
+#EXT-X-BYTERANGE:500
+all.mp4
+#EXT-X-KEY:METHOD=AES-128,URI="https://keys.example.com/k1",IV=0x000102030405060708090a0b0c0d0e0f
+#EXTINF:8,
+#EXT-X-BYTERANGE:300
+all.mp4
+#EXT-X-DISCONTINUITY
+#EXT-X-KEY:METHOD=NONE
+#EXTINF:4.25,
+other.ts
+#EXT-X-ENDLIST
+"""
+
+def test_byterange_implicit_offsets():
+    """BYTERANGE thiếu offset nối tiếp đoạn trước của cùng URI"""
+    playlist = parse_m3u8(MEDIA_PLAYLIST, 'https://cdn.example.com/v/index.m3u8')
+    assert [segment.byterange for segment in playlist.segments] == [(1000, 720), (500, 1720), (300, 2220), None]
+    assert playlist.init_sections[0].byterange == (720, 0)
+    assert playlist.segment_url(0) == 'https://cdn.example.com/v/all.mp4'
+
+def test_segments_and_sequence():
+    """Duration, title, sequence và discontinuity của từng segment"""
+    playlist = parse_m3u8(MEDIA_PLAYLIST)
+    segments = list(playlist.segments)
+    assert [segment.sequence for segment in segments] == [7, 8, 9, 10]
+    assert segments[1].title == 'Phần 2'
+    assert segments[3].discontinuity
+    assert playlist.total_duration == pytest.approx(31.75)
+    assert playlist.endlist and playlist.target_duration == 10
+
+def test_key_and_iv():
+    """KEY áp dụng cho các segment sau nó tới khi gặp METHOD=NONE"""
+    playlist = parse_m3u8(MEDIA_PLAYLIST)
+    segments = list(playlist.segments)
+    assert segments[0].key is None and segments[1].key is None
+    key = segments[2].key
+    assert key.method == 'AES-128'
+    assert key.uri == 'https://keys.example.com/k1'
+    assert key.iv == bytes(range(16))
+    assert segments[3].key is None
+
+def _rows(playlist):
+    """Segment dạng so sánh được (Key/InitSection so theo URI)"""
+    return [(segment.uri, segment.duration, segment.sequence, segment.byterange,
+             segment.key and segment.key.uri, segment.init_section and segment.init_section.uri,
+             segment.discontinuity, segment.title)
+            for segment in playlist.segments]
+
+def test_chunked_feed_matches_whole():
+    """Cắt dữ liệu ở mọi kích thước chunk (kể cả giữa ký tự UTF-8) cho cùng kết quả"""
+    data = MEDIA_PLAYLIST.encode('utf-8')
+    expected = _rows(parse_m3u8(data))
+    for size in (1, 3, 7, 64):
+        parser = M3U8Parser()
+        for start in range(0, len(data), size):
+            parser.feed(data[start:start + size])
+        assert _rows(parser.close()) == expected
+
+def test_attribute_style_extinf():
+    """#EXTINF kiểu IPTV (-1 kèm attribute có dấu phẩy) vẫn parse được"""
+    playlist = parse_m3u8(
+        '#EXTM3U\n'
+        '#EXTINF:-1 tvg-id="a" group-title="Phim, Hài",Kênh 1\n'
+        'http://example.com/live/1.m3u8\n'
+    )
+    segment = playlist.segments[0]
+    assert segment.duration == 0.0
+    assert segment.title == 'Kênh 1'
+
+@pytest.mark.parametrize('line', ['#EXTINF:abc,', '#EXTINF:nan,', '#EXTINF:10s,', '#EXT-X-TARGETDURATION:x'])
+def test_malformed_values_raise_m3u8_error(line):
+    """Giá trị không phải số báo M3U8Error thay vì ValueError trần"""
+    with pytest.raises(M3U8Error):
+        parse_m3u8(f'#EXTM3U\n{line}\nseg.ts\n')
+
+def test_missing_header():
+    with pytest.raises(M3U8Error):
+        parse_m3u8('#EXTINF:10,\nseg.ts\n')
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test cache thất bại và lý do thất bại của ExtractionService
+"""
+
+import asyncio
+import time
+import pytest
+from aiohttp import web
+from config import Config
+from scrapers.base_scraper import BaseScraper
+from scrapers.extraction_service import ExtractionService, UnsupportedSiteError
+from utils.http_client import HttpClient
+from utils.negative_cache import (
+    NegativeCache, REASON_BLOCKED, REASON_NO_STREAMS, REASON_NOT_FOUND, REASON_UNSUPPORTED
+)
+from utils.page_cache import PageCache
+from utils.result_cache import ResultCache
+
+def test_ttl_by_reason():
+    """Mỗi lý do có TTL riêng, TTL <= 0 thì không ghi"""
+    cache = NegativeCache(capacity=10, ttls={REASON_BLOCKED: 0.05, REASON_NOT_FOUND: 60, REASON_NO_STREAMS: 0})
+    cache.add('https://a.example/1', REASON_BLOCKED)
+    cache.add('https://a.example/2', REASON_NOT_FOUND)
+    cache.add('https://a.example/3', REASON_NO_STREAMS)
+    assert cache.get('https://a.example/1').reason == REASON_BLOCKED
+    assert cache.get('https://a.example/2').retry_in > 59
+    assert cache.get('https://a.example/3') is None
+    time.sleep(0.06)
+    assert cache.get('https://a.example/1') is None
+    assert cache.get('https://a.example/2') is not None
+    stats = cache.stats()
+    assert stats['stored_blocked'] == 1 and stats['stored_not_found'] == 1 and stats['stored_no_streams'] == 0
+
+def test_purge_by_pattern():
+    cache = NegativeCache(capacity=10)
+    cache.add('https://a.example/1', REASON_NOT_FOUND)
+    cache.add('https://b.example/1', REASON_NOT_FOUND)
+    cache.add('c.example', REASON_UNSUPPORTED)
+    assert cache.purge('a.example') == 1
+    assert cache.get('https://b.example/1') is not None
+    assert cache.purge() == 2
+    assert cache.stats()['purged'] == 3
+
+class _Scraper(BaseScraper):
+    """Scraper chỉ tải trang và không tìm thấy link nào"""
+    
+    async def extract_stream_links(self, url):
+        await self.fetch_page(url)
+        return []
+    
+    def get_supported_domains(self):
+        return []
+
+class _Factory:
+    def __init__(self, http_client):
+        self.http_client = http_client
+        self.scraper = _Scraper(http_client=http_client)
+    
+    def get_scraper(self, url):
+        return None if 'unsupported' in url else self.scraper
+
+@pytest.mark.parametrize('path, reason', [
+    ('/ok', REASON_NO_STREAMS),
+    ('/gone', REASON_NOT_FOUND),
+    ('/forbidden', REASON_BLOCKED),
+    ('/broken', None),
+])
+def test_failure_reason_by_status(tmp_path, monkeypatch, path, reason):
+    """Chỉ trang tải được (2xx/304) mới bị nhớ là không có link; 5xx không được nhớ"""
+    monkeypatch.setattr(Config, 'MAX_RETRIES', 0)
+    statuses = {'/ok': 200, '/gone': 404, '/forbidden': 403, '/broken': 503}
+    
+    async def handler(request):
+        return web.Response(status=statuses[request.path], text='<html>trống</html>', content_type='text/html')
+    
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{name}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        url = f'http://127.0.0.1:{runner.addresses[0][1]}{path}'
+        client = HttpClient()
+        await client.start()
+        client.page_cache = PageCache(str(tmp_path / 'pages.sqlite3'))
+        service = ExtractionService(_Factory(client), result_cache=ResultCache(str(tmp_path / 'results.sqlite3')))
+        try:
+            assert await service.extract(url, check_cache=False) == []
+            failure = service.negative(url)
+            assert (failure and failure.reason) == reason
+            # Trang ok lần sau lấy từ page cache (không có request mới) vẫn được coi là tải được
+            if path == '/ok':
+                service.purge_negative()
+                await service.extract(url, check_cache=False)
+                assert service.negative(url).reason == REASON_NO_STREAMS
+        finally:
+            service.close()
+            await client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run())
+
+def test_transient_failures_not_cached(tmp_path, monkeypatch):
+    """Không kết nối được (không có status) thì không nhớ, dù lượt trước đã tải được trang"""
+    monkeypatch.setattr(Config, 'MAX_RETRIES', 0)
+    async def run():
+        client = HttpClient()
+        await client.start()
+        client.page_cache = PageCache(str(tmp_path / 'pages.sqlite3'))
+        service = ExtractionService(_Factory(client), result_cache=ResultCache(str(tmp_path / 'results.sqlite3')))
+        url = 'http://127.0.0.1:1/page'
+        # Status cũ của lượt trước không được dùng cho lượt này
+        client.record_status(url, 200)
+        try:
+            assert await service.extract(url, check_cache=False) == []
+            assert service.negative(url) is None
+            assert service.stats()['Negative cache']['size'] == 0
+        finally:
+            service.close()
+            await client.close()
+    
+    asyncio.run(run())
+
+def test_open_circuit_is_blocked(tmp_path):
+    """Circuit của host đang mở (lỗi liên tiếp) thì nhớ ngắn là bị chặn"""
+    async def run():
+        client = HttpClient()
+        await client.start()
+        service = ExtractionService(_Factory(client), result_cache=ResultCache(str(tmp_path / 'results.sqlite3')))
+        url = 'http://cdn.example.com/page'
+        limiter = service.scraper_factory.scraper.limiter
+        try:
+            for _ in range(limiter.failure_threshold):
+                limiter.record_failure('cdn.example.com')
+            assert service._failure_reason(service.scraper_factory.scraper, url) == REASON_BLOCKED
+        finally:
+            service.close()
+            await client.close()
+    
+    asyncio.run(run())
+
+def test_unsupported_keyed_by_domain(tmp_path):
+    """Domain không hỗ trợ được nhớ theo domain: mọi trang của domain đều trả lời ngay"""
+    async def run():
+        client = HttpClient()
+        await client.start()
+        service = ExtractionService(_Factory(client), result_cache=ResultCache(str(tmp_path / 'results.sqlite3')))
+        try:
+            with pytest.raises(UnsupportedSiteError):
+                await service.extract('https://unsupported.example/a')
+            assert service.negative('https://unsupported.example/b').reason == REASON_UNSUPPORTED
+            service.mark_unsupported('https://other.example/a')
+            assert service.negative('https://other.example/c').reason == REASON_UNSUPPORTED
+        finally:
+            service.close()
+            await client.close()
+    
+    asyncio.run(run())
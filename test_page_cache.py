@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test cache trang gốc (tải lại có điều kiện, no-store, giới hạn dung lượng)
+"""
+
+import asyncio
+import os
+import time
+from aiohttp import web
+from scrapers.base_scraper import BaseScraper
+from utils.http_client import HttpClient
+from utils.page_cache import PageCache, content_hash
+
+PAGE = b'<html><body>' + b'<p>noi dung</p>' * 200 + b'</body></html>'
+
+class _Scraper(BaseScraper):
+    async def extract_stream_links(self, url):
+        return []
+    
+    def get_supported_domains(self):
+        return []
+
+def test_store_and_conditional_headers(tmp_path):
+    cache = PageCache(str(tmp_path / 'pages.sqlite3'), fresh_for=60)
+    digest = cache.store('https://a.example/p', PAGE, 'utf-8',
+                         {'ETag': '"v1"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+    assert digest == content_hash(PAGE)
+    page = cache.lookup('https://a.example/p')
+    assert page.body == PAGE and cache.is_fresh(page)
+    assert page.conditional_headers() == {
+        'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'
+    }
+    assert cache.lookup('https://a.example/other') is None
+    cache.close()
+
+def test_no_store_is_not_cached(tmp_path):
+    cache = PageCache(str(tmp_path / 'pages.sqlite3'))
+    assert cache.store('https://a.example/p', PAGE, 'utf-8', {'Cache-Control': 'private, no-store'}) is None
+    assert cache.lookup('https://a.example/p') is None
+    assert cache.stats()['stores'] == 0
+    cache.close()
+
+def test_eviction_by_bytes(tmp_path):
+    """Vượt max_bytes thì bỏ trang lâu không dùng nhất (kèm link đã nhớ của nó)"""
+    cache = PageCache(str(tmp_path / 'pages.sqlite3'), max_bytes=2500, fresh_for=60)
+    bodies = {name: os.urandom(1000) for name in ('a', 'b', 'c')}
+    cache.store('https://x.example/a', bodies['a'], 'utf-8', {})
+    cache.remember_links('https://x.example/a', content_hash(bodies['a']), [{'url': 'https://cdn/a.m3u8'}])
+    time.sleep(0.01)
+    cache.store('https://x.example/b', bodies['b'], 'utf-8', {})
+    time.sleep(0.01)
+    # Dùng lại 'a' nên 'b' thành trang lâu không dùng nhất
+    assert cache.lookup('https://x.example/a') is not None
+    time.sleep(0.01)
+    cache.store('https://x.example/c', bodies['c'], 'utf-8', {})
+    
+    assert cache.lookup('https://x.example/b') is None
+    assert cache.lookup('https://x.example/a').body == bodies['a']
+    assert cache.lookup('https://x.example/c').body == bodies['c']
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] <= 2500
+    assert cache.links_for('https://x.example/a', content_hash(bodies['a'])) == [{'url': 'https://cdn/a.m3u8'}]
+    cache.close()
+    
+    # Mở lại file: dung lượng được tính lại từ đĩa
+    reopened = PageCache(str(tmp_path / 'pages.sqlite3'), max_bytes=2500)
+    assert reopened.lookup('https://x.example/c') is not None
+    assert reopened.stats()['bytes'] == stats['bytes']
+    reopened.close()
+
+def test_fetch_page_revalidates_with_304(tmp_path):
+    """Lần tải sau gửi If-None-Match, origin trả 304 thì dùng body trong cache"""
+    seen = []
+    
+    async def handler(request):
+        seen.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304, headers={'ETag': '"v1"'})
+        return web.Response(body=PAGE, content_type='text/html', headers={'ETag': '"v1"'})
+    
+    async def run():
+        app = web.Application()
+        app.router.add_get('/p', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        url = f'http://127.0.0.1:{runner.addresses[0][1]}/p'
+        client = HttpClient()
+        await client.start()
+        client.page_cache = PageCache(str(tmp_path / 'pages.sqlite3'), fresh_for=0)
+        try:
+            scraper = _Scraper(http_client=client)
+            first = await scraper.fetch_page(url)
+            second = await scraper.fetch_page(url)
+            assert first.body == second.body == PAGE
+            assert seen == [None, '"v1"']
+            stats = client.page_cache.stats()
+            assert stats['stores'] == 1 and stats['revalidated'] == 1
+        finally:
+            await client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run())
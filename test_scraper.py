@@ -10,10 +10,13 @@ from scrapers.enhanced_scraper import EnhancedScraper
 def test_enhanced_scraper():
     """Test Enhanced Scraper"""
     print("=== Test Enhanced Scraper ===")
-    scraper = EnhancedScraper()
-    
     test_url = "https://tvhay.fm/xem-phim-nhung-ke-quyet-tu-656257"
-    links = scraper.extract_all_streams(test_url)
+    
+    async def run():
+        async with EnhancedScraper() as scraper:
+            return await scraper.extract_all_streams(test_url)
+    
+    links = asyncio.run(run())
     
     print(f"Tìm thấy {len(links)} links:")
     for i, link in enumerate(links, 1):
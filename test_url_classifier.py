@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test phân loại URL video
+"""
+
+from config import Config
+from utils.url_classifier import classify_url, get_classifier, reset_classifier
+
+def test_classify_host_quality_and_type():
+    info = classify_url('https://www.streamtape.com/e/abc/movie.1080p.m3u8?token=1')
+    assert info.host == 'streamtape.com'
+    assert info.quality == '1080p'
+    assert info.type == 'HLS'
+    assert not classify_url('https://example.com/page.html').is_video
+
+def test_reset_classifier_picks_up_new_hosts(monkeypatch):
+    """Classifier dùng chung giữ danh sách cũ tới khi reset_classifier()"""
+    url = 'https://player.newhost.example/e/abc'
+    assert classify_url(url).host is None
+    monkeypatch.setattr(Config, 'VIDEO_HOSTS', Config.VIDEO_HOSTS + ['newhost.example'])
+    try:
+        assert classify_url(url).host is None
+        reset_classifier()
+        assert classify_url(url).host == 'newhost.example'
+        assert get_classifier() is get_classifier()
+    finally:
+        monkeypatch.undo()
+        reset_classifier()
+    assert classify_url(url).host is None
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test chặn địa chỉ nội bộ cho URL bên ngoài (/download, variant HLS, probe link, đo mirror)
+"""
+
+import asyncio
+import pytest
+from aiohttp import web
+from config import Config
+from scrapers.hls_variants import HlsVariantResolver
+from scrapers.link_prober import LinkProber
+from scrapers.mirror_ranker import MirrorRanker
+from utils.hls_downloader import DownloadError, HlsDownloader
+from utils.url_guard import BlockedAddressError, check_public_url, is_public_ip
+from utils.validators import is_allowed_download_host
+
+def test_is_public_ip():
+    """Loopback, mạng riêng, link-local, CGNAT và IPv4-mapped đều không công khai"""
+    for address in ('127.0.0.1', '10.1.2.3', '192.168.0.1', '172.16.0.1', '169.254.169.254',
+                    '100.64.0.1', '0.0.0.0', '::1', 'fe80::1%eth0', '::ffff:127.0.0.1', 'fd00::1'):
+        assert not is_public_ip(address), address
+    assert is_public_ip('8.8.8.8')
+    assert is_public_ip('2606:4700:4700::1111')
+
+def test_check_public_url():
+    """IP nội bộ viết trực tiếp và scheme lạ bị chặn, tên miền để resolver kiểm tra"""
+    for url in ('http://127.0.0.1/a.m3u8', 'http://[::1]:8080/a.m3u8', 'file:///etc/passwd',
+                'http://169.254.169.254/latest/meta-data'):
+        with pytest.raises(BlockedAddressError):
+            check_public_url(url)
+    check_public_url('https://cdn.example.com/a.m3u8')
+
+def test_downloader_refuses_internal_hosts():
+    """Downloader từ chối ngay (không thử lại) cả IP nội bộ lẫn tên miền trỏ vào loopback"""
+    async def run(url):
+        with pytest.raises(DownloadError):
+            await HlsDownloader(retries=3).download(url)
+    
+    for url in ('http://127.0.0.1:1/index.m3u8', 'http://localhost:1/index.m3u8'):
+        asyncio.run(run(url))
+
+def test_allowed_download_host(monkeypatch):
+    """Link m3u8 trực tiếp chỉ từ trang được hỗ trợ hoặc host trong allow-list (gồm subdomain)"""
+    monkeypatch.setattr(Config, 'DOWNLOAD_ALLOWED_HOSTS', ['cdn.example.com'])
+    assert is_allowed_download_host('https://tvhay.fm/video.m3u8')
+    assert is_allowed_download_host('https://cdn.example.com/a.m3u8')
+    assert is_allowed_download_host('https://edge.cdn.example.com/a.m3u8')
+    assert not is_allowed_download_host('https://evil-cdn.example.com/a.m3u8')
+    assert not is_allowed_download_host('http://127.0.0.1/a.m3u8')
+
+def test_prober_refuses_internal_hosts():
+    """Link trỏ vào địa chỉ nội bộ bị báo chết với lỗi 'blocked', không kết nối thử"""
+    async def run():
+        prober = LinkProber(drop_dead=False)
+        links = [{'url': 'http://127.0.0.1:1/video.mp4', 'type': 'MP4'},
+                 {'url': 'http://localhost:1/index.m3u8', 'type': 'HLS'}]
+        for link in await prober.probe_links(links):
+            assert link['probe'] == {'alive': False, 'error': 'blocked'}, link
+    
+    asyncio.run(run())
+
+def test_mirror_ranker_refuses_internal_hosts():
+    """Mirror nội bộ không được tải mẫu: request không tới server, mirror không có số đo"""
+    requests = []
+    
+    async def handler(request):
+        requests.append(request.path)
+        return web.Response(body=b'\0' * 1024)
+    
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{name}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        port = runner.addresses[0][1]
+        try:
+            ranker = MirrorRanker(benchmark=True)
+            links = [{'url': f'http://127.0.0.1:{port}/video.mp4', 'type': 'MP4'},
+                     {'url': f'http://localhost:{port}/video.mp4', 'type': 'MP4'}]
+            ranked = await ranker.rank(links)
+            assert requests == []
+            assert all('mirror' not in link for link in ranked)
+            assert ranker.stats()['sample_failed'] == 2
+        finally:
+            await runner.cleanup()
+    
+    asyncio.run(run())
+
+def test_variant_resolver_refuses_internal_hosts():
+    """Master playlist trên địa chỉ nội bộ không được đọc: link giữ nguyên"""
+    requests = []
+    
+    async def handler(request):
+        requests.append(request.path)
+        return web.Response(text='#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=1280x720\n720.m3u8\n')
+    
+    async def run():
+        app = web.Application()
+        app.router.add_get('/{name}', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        port = runner.addresses[0][1]
+        try:
+            resolver = HlsVariantResolver()
+            links = [{'url': f'http://127.0.0.1:{port}/master.m3u8', 'type': 'HLS', 'quality': 'Unknown'},
+                     {'url': f'http://localhost:{port}/master.m3u8', 'type': 'HLS', 'quality': 'Unknown'}]
+            assert await resolver.expand(links) == links
+            assert requests == [] and resolver.failed == 2
+        finally:
+            await runner.cleanup()
+    
+    asyncio.run(run())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pool chạy phần việc nặng CPU (parse HTML, quét regex) ngoài event loop
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import pickle
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from config import Config
+from utils.html_elements import PageElements, custom_backends, parse_elements, register_backend
+from utils.link_matcher import PROFILES, get_matcher
+
+MODE_INLINE = 'inline'
+MODE_THREAD = 'thread'
+MODE_PROCESS = 'process'
+MODES = (MODE_INLINE, MODE_THREAD, MODE_PROCESS)
+
+class ParsedPage(NamedTuple):
+    """Kết quả parse gửi về từ worker (gọn, pickle được)"""
+    elements: PageElements
+    # URL bắt được trong các script inline (khi có script_profile)
+    script_urls: List[str]
+
+def decode(body: bytes, encoding: Optional[str]) -> str:
+    """Giải mã body, encoding lạ thì dùng utf-8"""
+    try:
+        return body.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+def match_urls(body: bytes, encoding: Optional[str], profile: str) -> List[str]:
+    """
+    Tác vụ: quét link trong tài liệu
+    
+    Args:
+        body: Nội dung gốc
+        encoding: Encoding của body
+        profile: Profile của link matcher
+    
+    Returns:
+        Các URL theo thứ tự xuất hiện
+    """
+    return get_matcher(profile).urls(decode(body, encoding))
+
+def parse_page(body: bytes, encoding: Optional[str], backend: Optional[str] = None,
+               script_profile: Optional[str] = None) -> ParsedPage:
+    """
+    Tác vụ: parse trang và (tuỳ chọn) quét luôn các script inline
+    
+    Args:
+        body: Nội dung gốc
+        encoding: Encoding của body
+        backend: Backend parse HTML (None = HTML_PARSER_BACKEND)
+        script_profile: Profile quét script; khi có, nội dung script không
+                        được gửi về mà chỉ gửi các URL bắt được
+    
+    Returns:
+        ParsedPage với các thẻ đã rút gọn
+    """
+    page = parse_elements(decode(body, encoding), backend)
+    if not script_profile:
+        return ParsedPage(page.compact(), [])
+    matcher = get_matcher(script_profile)
+    script_urls = [url for script in page.scripts for url in matcher.urls(script)]
+    return ParsedPage(page.compact(keep_scripts=False), script_urls)
+
+def _timed(func: Callable, args: Tuple) -> Tuple[Any, float]:
+    """Chạy trong worker, trả kèm thời gian CPU thực tế của tác vụ"""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def _init_worker(backends: Dict[str, Callable]):
+    """Chạy khi worker khởi động: đăng ký lại các backend parse của process chính"""
+    for name, backend in backends.items():
+        register_backend(name, backend)
+
+def _warm_up() -> int:
+    """Khởi tạo sẵn trong worker: import xong và compile các matcher"""
+    for profile in PROFILES:
+        get_matcher(profile)
+    return multiprocessing.current_process().pid
+
+class CpuPool:
+    """
+    Chạy tác vụ CPU theo mode đã chọn
+    
+    - inline: gọi thẳng trên event loop (không tốn IPC, nhưng chặn loop)
+    - thread: ThreadPoolExecutor; loop vẫn chạy xen kẽ khi GIL được nhả
+      (regex giữ GIL nên chỉ đỡ phần nào)
+    - process: ProcessPoolExecutor (spawn) được khởi động sẵn đủ worker,
+      tác vụ nhận bytes và trả kết quả gọn để giảm chi phí pickle
+    
+    Tài liệu nhỏ hơn `min_bytes` luôn chạy inline vì chi phí chuyển
+    qua worker lớn hơn chi phí xử lý.
+    """
+    
+    def __init__(self, mode: str = None, workers: int = None, min_bytes: int = None):
+        """
+        Args:
+            mode: inline, thread hoặc process
+            workers: Số worker
+            min_bytes: Tài liệu nhỏ hơn mức này chạy inline
+        """
+        self.logger = logging.getLogger(__name__)
+        self.mode = mode or Config.CPU_POOL_MODE
+        if self.mode not in MODES:
+            raise ValueError(f"CPU_POOL_MODE không hợp lệ: {self.mode} (có: {', '.join(MODES)})")
+        self.workers = workers if workers is not None else Config.CPU_POOL_WORKERS
+        self.min_bytes = min_bytes if min_bytes is not None else Config.CPU_POOL_MIN_BYTES
+        self._executor: Optional[Executor] = None
+        self._counters = {
+            'offloaded': 0,
+            'inline': 0,
+            'failed': 0,
+            'pool_restarts': 0,
+        }
+        # Thời gian xử lý trong worker, thời gian chờ (gồm xếp hàng và IPC) và thời gian chạy trên loop
+        self._worker_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._inline_seconds = 0.0
+    
+    def start(self):
+        """Tạo executor và khởi động sẵn các worker"""
+        if self._executor is not None or self.mode == MODE_INLINE:
+            return
+        if self.mode == MODE_THREAD:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu-pool")
+        else:
+            # spawn: không fork process đang có event loop và các thread khác,
+            # nên worker phải được đăng ký lại các backend parse thêm
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker, initargs=(self._worker_backends(),)
+            )
+        for _ in range(self.workers):
+            self._executor.submit(_warm_up)
+        self.logger.info(f"CPU pool sẵn sàng (mode={self.mode}, workers={self.workers})")
+    
+    def _worker_backends(self) -> Dict[str, Callable]:
+        """Backend parse thêm gửi được sang worker (hàm không pickle được chỉ dùng được trong process chính)"""
+        backends = {}
+        for name, backend in custom_backends().items():
+            try:
+                pickle.dumps(backend)
+            except (pickle.PicklingError, AttributeError, TypeError):
+                self.logger.warning(f"Backend parse {name} không gửi được sang worker (cần là hàm cấp module)")
+                continue
+            backends[name] = backend
+        return backends
+    
+    def shutdown(self):
+        """Dừng các worker"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    async def run(self, func: Callable, *args, size: int = None) -> Any:
+        """
+        Chạy một tác vụ
+        
+        Args:
+            func: Hàm cấp module (pickle được với mode process)
+            *args: Tham số (nên là bytes/str/số để pickle rẻ)
+            size: Kích thước dữ liệu (bytes) để quyết định chạy inline
+        
+        Returns:
+            Kết quả của func
+        """
+        if self.mode == MODE_INLINE or (size is not None and size < self.min_bytes):
+            return self._run_inline(func, args)
+        
+        self.start()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            result, worker_seconds = await loop.run_in_executor(self._executor, _timed, func, args)
+        except BrokenProcessPool:
+            # Worker chết (OOM, bị kill): tạo lại pool cho lần sau, lần này chạy inline
+            self.logger.warning("CPU pool bị hỏng, khởi động lại worker")
+            self._counters['pool_restarts'] += 1
+            self.shutdown()
+            return self._run_inline(func, args)
+        except Exception:
+            self._counters['failed'] += 1
+            raise
+        self._counters['offloaded'] += 1
+        self._worker_seconds += worker_seconds
+        self._wait_seconds += time.perf_counter() - started
+        return result
+    
+    def _run_inline(self, func: Callable, args: Tuple) -> Any:
+        """Chạy ngay trên event loop và cộng thời gian bị chặn"""
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self._counters['inline'] += 1
+            self._inline_seconds += time.perf_counter() - started
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm mode, số tác vụ offload/inline, thời gian trong worker,
+            thời gian xếp hàng + IPC trung bình và thời gian chạy trên event loop
+        """
+        offloaded = self._counters['offloaded']
+        return {
+            'mode': self.mode,
+            'workers': self.workers if self.mode != MODE_INLINE else 0,
+            **self._counters,
+            'worker_seconds': round(self._worker_seconds, 3),
+            'queue_ipc_ms_avg': round((self._wait_seconds - self._worker_seconds) / offloaded * 1000, 2)
+                               if offloaded else 0.0,
+            'inline_seconds': round(self._inline_seconds, 3),
+        }
+
+_pool: Optional[CpuPool] = None
+
+def get_cpu_pool() -> CpuPool:
+    """CpuPool dùng chung cho cả process (tạo khi cần)"""
+    global _pool
+    if _pool is None:
+        _pool = CpuPool()
+    return _pool
+
+def shutdown_cpu_pool():
+    """Dừng pool dùng chung (khi bot dừng)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Deadline và ngân sách thử lại theo từng yêu cầu của người dùng
+
+Deadline được đặt trong contextvars nên đi theo mọi task con (strategy,
+iframe, probe) mà không phải truyền qua từng hàm; mỗi bước tự cắt
+timeout của mình theo thời gian còn lại.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+from config import Config
+
+# Timeout nhỏ nhất trả về khi đã sát deadline (0 có nghĩa là "không timeout" với aiohttp)
+MIN_TIMEOUT = 0.01
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Yêu cầu đã hết thời gian, bước tiếp theo không được chạy"""
+
+class Deadline:
+    """Thời điểm phải trả lời và số lần thử lại còn được dùng của một yêu cầu"""
+    
+    __slots__ = ('started_at', 'expires_at', 'retries_left', 'retries_used', 'retries_denied')
+    
+    def __init__(self, seconds: float, retries: int):
+        """
+        Args:
+            seconds: Thời gian tối đa cho cả yêu cầu (giây)
+            retries: Tổng số lần thử lại cho mọi request trong yêu cầu
+        """
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + seconds
+        self.retries_left = retries
+        self.retries_used = 0
+        self.retries_denied = 0
+    
+    def remaining(self) -> float:
+        """Số giây còn lại (âm nếu đã quá hạn)"""
+        return self.expires_at - time.monotonic()
+    
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+    
+    def clamp(self, timeout: float) -> float:
+        """Timeout của một bước, không vượt quá thời gian còn lại"""
+        return max(MIN_TIMEOUT, min(timeout, self.remaining()))
+    
+    def allow_retry(self, backoff: float = 0.0) -> bool:
+        """
+        Dùng một lần thử lại nếu còn ngân sách và còn đủ thời gian chờ backoff
+        
+        Args:
+            backoff: Thời gian sẽ chờ trước lần thử lại (giây)
+        """
+        if self.retries_left <= 0 or self.remaining() <= backoff:
+            self.retries_denied += 1
+            return False
+        self.retries_left -= 1
+        self.retries_used += 1
+        return True
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar('deadline', default=None)
+
+# Thống kê của các yêu cầu đã xong (thời gian trả lời để so với REQUEST_DEADLINE)
+_reply_times: Deque[float] = deque(maxlen=1000)
+_counters = {
+    'requests': 0,
+    'expired': 0,
+    'retries_used': 0,
+    'retries_denied': 0,
+}
+
+def current_deadline() -> Optional[Deadline]:
+    """Deadline của yêu cầu đang chạy (None nếu không nằm trong yêu cầu nào)"""
+    return _current.get()
+
+@contextmanager
+def deadline_scope(seconds: float = None, retries: int = None) -> Iterator[Deadline]:
+    """
+    Đặt deadline cho đoạn code bên trong và các task nó tạo ra
+    
+    Args:
+        seconds: Thời gian tối đa (mặc định REQUEST_DEADLINE)
+        retries: Ngân sách thử lại (mặc định REQUEST_RETRY_BUDGET)
+    """
+    deadline = Deadline(
+        seconds if seconds is not None else Config.REQUEST_DEADLINE,
+        retries if retries is not None else Config.REQUEST_RETRY_BUDGET
+    )
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+        _counters['requests'] += 1
+        _counters['expired'] += deadline.expired
+        _counters['retries_used'] += deadline.retries_used
+        _counters['retries_denied'] += deadline.retries_denied
+        _reply_times.append(time.monotonic() - deadline.started_at)
+
+def clamp_timeout(timeout: float) -> float:
+    """Timeout của một bước, cắt theo deadline hiện tại (nếu có)"""
+    deadline = _current.get()
+    return deadline.clamp(timeout) if deadline is not None else timeout
+
+def remaining_time() -> float:
+    """Số giây còn lại của yêu cầu hiện tại (vô hạn nếu không có deadline)"""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else float('inf')
+
+def deadline_expired() -> bool:
+    """True nếu yêu cầu hiện tại đã hết thời gian"""
+    deadline = _current.get()
+    return deadline is not None and deadline.expired
+
+def check_deadline():
+    """
+    Raises:
+        DeadlineExceeded: Yêu cầu hiện tại đã hết thời gian
+    """
+    if deadline_expired():
+        raise DeadlineExceeded("Yêu cầu đã hết thời gian xử lý")
+
+def allow_retry(backoff: float = 0.0) -> bool:
+    """Dùng một lần thử lại của yêu cầu hiện tại (luôn True nếu không có deadline)"""
+    deadline = _current.get()
+    return deadline is None or deadline.allow_retry(backoff)
+
+def deadline_stats() -> Dict[str, object]:
+    """
+    Thống kê
+    
+    Returns:
+        Dict gồm số yêu cầu, số yêu cầu quá hạn, số lần thử lại đã dùng/bị
+        từ chối và p50/p99 thời gian trả lời
+    """
+    ordered = sorted(_reply_times)
+    
+    def percentile(p: float) -> float:
+        if not ordered:
+            return 0.0
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 1)
+    
+    return {
+        **_counters,
+        'deadline_s': Config.REQUEST_DEADLINE,
+        'p50_ms': percentile(0.5),
+        'p99_ms': percentile(0.99),
+    }
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hedged request: gửi thêm một request giống hệt khi request đầu chậm hơn
+p95 của host, request nào có response trước thì dùng
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+from config import Config
+
+T = TypeVar('T')
+
+# Số token hedge tối đa một host tích luỹ được (giới hạn burst sau thời gian yên ắng)
+MAX_HEDGE_TOKENS = 10.0
+
+class HostLatency:
+    """Thời gian tới khi có header của các request gần đây tới một host"""
+    
+    __slots__ = ('samples', 'tokens', 'requests', 'hedged', 'hedge_wins')
+    
+    def __init__(self, samples: int):
+        self.samples: Deque[float] = deque(maxlen=samples)
+        self.tokens = 0.0
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+    
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+class RequestHedger:
+    """
+    Hedge phần chờ header của request tải trang
+    
+    Request đầu chưa có header sau p95 (đo theo từng host) thì gửi request
+    thứ hai, có thể trên kết nối mới; bên có header trước thắng, bên còn lại
+    bị huỷ. Mỗi request cho host thêm `budget` token, mỗi lần hedge tốn một
+    token, nên tỉ lệ hedge của một host không vượt quá `budget`.
+    """
+    
+    def __init__(self, enabled: bool = None, budget: float = None, percentile: float = None,
+                 min_samples: int = None, min_delay: float = None, samples: int = 100,
+                 capacity: int = None):
+        """
+        Args:
+            enabled: Bật hedge
+            budget: Tỉ lệ request được hedge tối đa của mỗi host (0-1)
+            percentile: Phân vị thời gian chờ header dùng làm ngưỡng hedge
+            min_samples: Số mẫu tối thiểu của host trước khi được hedge
+            min_delay: Ngưỡng hedge nhỏ nhất (giây)
+            samples: Số mẫu gần đây giữ lại cho mỗi host
+            capacity: Số host tối đa được theo dõi
+        """
+        self.logger = logging.getLogger(__name__)
+        self.enabled = enabled if enabled is not None else Config.HEDGE_ENABLED
+        self.budget = budget if budget is not None else Config.HEDGE_BUDGET
+        self.percentile = percentile if percentile is not None else Config.HEDGE_PERCENTILE
+        self.min_samples = min_samples if min_samples is not None else Config.HEDGE_MIN_SAMPLES
+        self.min_delay = min_delay if min_delay is not None else Config.HEDGE_MIN_DELAY
+        self.sample_size = samples
+        self.capacity = capacity if capacity is not None else Config.HOST_LIMITER_SIZE
+        self._hosts: 'OrderedDict[str, HostLatency]' = OrderedDict()
+        self._counters = {
+            'requests': 0,
+            'hedged': 0,
+            'hedge_wins': 0,
+            'budget_denied': 0,
+        }
+    
+    def _state(self, host: str) -> HostLatency:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostLatency(self.sample_size)
+            while len(self._hosts) > self.capacity:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+        return state
+    
+    def delay(self, host: str) -> Optional[float]:
+        """Ngưỡng hedge của host (None nếu chưa đủ mẫu)"""
+        state = self._hosts.get(host)
+        if state is None or len(state.samples) < self.min_samples:
+            return None
+        return max(self.min_delay, state.percentile(self.percentile))
+    
+    async def first_response(self, host: str, send: Callable[[bool], Awaitable[T]],
+                             discard: Callable[[T], None],
+                             allow: Optional[Callable[[], bool]] = None) -> T:
+        """
+        Gửi request (hedge nếu chậm) và trả response có header trước
+        
+        Args:
+            host: Host của request
+            send: Coroutine function (fresh) -> response; fresh=True cho request hedge
+            discard: Giải phóng response của bên thua (nếu nó cũng đã có header)
+            allow: Kiểm tra thêm trước khi hedge (vd: còn token của rate limiter)
+        
+        Returns:
+            Response của bên thắng
+        """
+        if not self.enabled:
+            return await send(False)
+        
+        state = self._state(host)
+        state.requests += 1
+        state.tokens = min(MAX_HEDGE_TOKENS, state.tokens + self.budget)
+        self._counters['requests'] += 1
+        delay = self.delay(host)
+        started = time.monotonic()
+        
+        primary = asyncio.ensure_future(send(False))
+        tasks = [primary]
+        winner = None
+        try:
+            if delay is not None:
+                await asyncio.wait(tasks, timeout=delay)
+            if not primary.done():
+                if delay is not None and state.tokens >= 1 and (allow is None or allow()):
+                    state.tokens -= 1
+                    state.hedged += 1
+                    self._counters['hedged'] += 1
+                    self.logger.info(f"{host} chưa trả header sau {delay * 1000:.0f} ms, gửi request hedge")
+                    tasks.append(asyncio.ensure_future(send(True)))
+                elif delay is not None:
+                    self._counters['budget_denied'] += 1
+            
+            winner = await self._first_success(tasks)
+            state.samples.append(time.monotonic() - started)
+            if winner is not primary:
+                state.hedge_wins += 1
+                self._counters['hedge_wins'] += 1
+            return winner.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Bên thua cũng đã có header: trả kết nối về pool
+            for task in tasks:
+                if task is not winner and not task.cancelled() and task.exception() is None:
+                    discard(task.result())
+    
+    @staticmethod
+    async def _first_success(tasks: List[asyncio.Future]) -> asyncio.Future:
+        """
+        Task đầu tiên xong mà không lỗi
+        
+        Raises:
+            Exception: Lỗi của request đầu nếu tất cả đều lỗi
+        """
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in tasks:
+                if task in done and task.exception() is None:
+                    return task
+        raise tasks[0].exception()
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm số request, số lần hedge, tỉ lệ hedge, số lần request hedge
+            thắng, số lần hết ngân sách và ngưỡng hedge của các host hay bị hedge
+        """
+        requests = self._counters['requests']
+        stats = {
+            'enabled': self.enabled,
+            **self._counters,
+            'hedge_rate': round(self._counters['hedged'] / requests, 3) if requests else 0.0,
+        }
+        hedged = sorted(
+            (item for item in self._hosts.items() if item[1].hedged),
+            key=lambda item: item[1].hedged, reverse=True
+        )
+        for host, state in hedged[:5]:
+            delay = self.delay(host)
+            threshold = f"p{self.percentile * 100:.0f} {delay * 1000:.0f} ms, " if delay else ""
+            stats[host] = f"{threshold}hedged {state.hedged}/{state.requests}, wins {state.hedge_wins}"
+        return stats
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tải stream HLS (VOD) thành một file: tải segment song song, giải mã AES-128,
+ghi theo đúng thứ tự vào file tạm
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+import aiohttp
+from config import Config
+from utils.host_performance import host_of
+from utils.http_client import HttpClient
+from utils.m3u8_parser import InitSection, Key, Playlist, Variant, parse_m3u8
+from utils.url_guard import BlockedAddressError, public_connector, public_trace_config
+
+# Giải mã AES-128: ưu tiên cryptography (OpenSSL, nhả GIL), không có thì dùng
+# pyaes (thuần Python, đi kèm pyrogram, chậm hơn nhiều)
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+except ImportError:
+    Cipher = None
+try:
+    import pyaes
+except ImportError:
+    pyaes = None
+
+ProgressCallback = Callable[[int, int, int], Optional[Awaitable[None]]]
+
+# Lỗi không nên thử lại
+FATAL_STATUSES = (401, 403, 404, 410)
+
+# Thời gian chờ trước lần thử lại đầu tiên (giây), nhân đôi mỗi lần
+RETRY_BACKOFF = 0.5
+
+class DownloadError(Exception):
+    """Không tải được stream"""
+
+class DownloadResult(NamedTuple):
+    """Kết quả tải một stream"""
+    path: str
+    extension: str
+    segments: int
+    bytes: int
+    duration: float
+    elapsed: float
+
+def decrypt_aes128(key: bytes, iv: bytes, data: bytes) -> bytes:
+    """Giải mã AES-128-CBC (PKCS7) một segment"""
+    if Cipher is not None:
+        decryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).decryptor()
+        data = decryptor.update(data) + decryptor.finalize()
+        padding = data[-1] if data else 0
+        if not 1 <= padding <= 16 or data[-padding:] != bytes([padding]) * padding:
+            raise ValueError("Padding PKCS7 không hợp lệ")
+        return data[:-padding]
+    decrypter = pyaes.Decrypter(pyaes.AESModeOfOperationCBC(key, iv))
+    return decrypter.feed(data) + decrypter.feed()
+
+class HlsDownloader:
+    """
+    Tải toàn bộ một stream HLS VOD vào file tạm
+    
+    Segment được tải bởi một nhóm worker cố định, mỗi host có giới hạn số
+    request đồng thời riêng (dùng chung giữa các lượt tải). Segment tải xong
+    được ghi ngay khi tới lượt; số segment đã tải mà chưa ghi bị giới hạn
+    nên bộ nhớ không phụ thuộc độ dài stream. Mọi request (playlist, segment,
+    khoá, EXT-X-MAP, kể cả redirect) chỉ được tới địa chỉ công khai.
+    """
+    
+    def __init__(self, http_client: Optional[HttpClient] = None, workers: int = None,
+                 per_host: int = None, retries: int = None, segment_timeout: float = None):
+        """
+        Args:
+            http_client: HTTP client dùng chung
+            workers: Số segment tải đồng thời trong một lượt
+            per_host: Số request đồng thời tối đa tới một host
+            retries: Số lần thử lại mỗi segment
+            segment_timeout: Timeout tải một segment (giây)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.http_client = http_client
+        self.workers = workers if workers is not None else Config.DOWNLOAD_WORKERS
+        self.per_host = per_host if per_host is not None else Config.DOWNLOAD_PER_HOST
+        self.retries = retries if retries is not None else Config.DOWNLOAD_SEGMENT_RETRIES
+        self.segment_timeout = segment_timeout if segment_timeout is not None else Config.DOWNLOAD_SEGMENT_TIMEOUT
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._counters = {'downloads': 0, 'failed': 0, 'segments': 0, 'retries': 0, 'bytes': 0}
+        self._written = 0
+        self._elapsed = 0.0
+    
+    async def download(self, url: str, on_progress: Optional[ProgressCallback] = None,
+                       directory: Optional[str] = None) -> DownloadResult:
+        """
+        Tải stream vào file tạm (caller xoá file khi dùng xong)
+        
+        Args:
+            url: URL playlist (master thì chọn variant theo DOWNLOAD_MAX_HEIGHT)
+            on_progress: Callback (segment đã ghi, tổng segment, bytes đã ghi)
+            directory: Thư mục chứa file tạm (None = thư mục tạm của hệ thống)
+        
+        Returns:
+            DownloadResult
+        
+        Raises:
+            DownloadError: Stream không tải được hoặc vượt giới hạn
+        """
+        started = time.monotonic()
+        own_session = None
+        if self.http_client:
+            session = self.http_client.public_session
+        else:
+            session = own_session = aiohttp.ClientSession(
+                connector=public_connector(ssl=False),
+                headers=Config.DEFAULT_HEADERS,
+                trace_configs=[public_trace_config()]
+            )
+        
+        path = None
+        try:
+            playlist = await self._media_playlist(session, url)
+            self._check_playlist(playlist)
+            
+            extension = '.mp4' if playlist.init_sections else '.ts'
+            fd, path = tempfile.mkstemp(suffix=extension, dir=directory)
+            with os.fdopen(fd, 'wb') as output:
+                written = await self._download_segments(session, playlist, output, on_progress)
+        except BaseException as e:
+            self._counters['failed'] += 1
+            if path:
+                os.unlink(path)
+            if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError, ValueError)):
+                raise DownloadError(str(e) or e.__class__.__name__) from e
+            raise
+        finally:
+            if own_session:
+                await own_session.close()
+        
+        elapsed = time.monotonic() - started
+        self._counters['downloads'] += 1
+        self._written += written
+        self._elapsed += elapsed
+        self.logger.info(
+            f"Đã tải {len(playlist.segments)} segment ({written / 1024 / 1024:.1f} MB) "
+            f"trong {elapsed:.1f}s: {url}"
+        )
+        return DownloadResult(path, extension, len(playlist.segments), written,
+                              playlist.total_duration, elapsed)
+    
+    async def _media_playlist(self, session: aiohttp.ClientSession, url: str, depth: int = 0) -> Playlist:
+        """Tải media playlist (master thì theo variant được chọn)"""
+        data = await self._fetch(session, url)
+        playlist = parse_m3u8(data, url)
+        if not playlist.is_master:
+            return playlist
+        if depth or not playlist.variants:
+            raise DownloadError("Master playlist không có variant hợp lệ")
+        return await self._media_playlist(session, self._choose_variant(playlist.variants).uri, depth + 1)
+    
+    @staticmethod
+    def _choose_variant(variants: List[Variant]) -> Variant:
+        """Variant bandwidth cao nhất không vượt DOWNLOAD_MAX_HEIGHT (không có thì thấp nhất)"""
+        fitting = [variant for variant in variants
+                   if variant.height is None or variant.height <= Config.DOWNLOAD_MAX_HEIGHT]
+        if fitting:
+            return max(fitting, key=lambda variant: variant.bandwidth)
+        return min(variants, key=lambda variant: variant.bandwidth)
+    
+    @staticmethod
+    def _check_playlist(playlist: Playlist):
+        """Chỉ tải VOD ngắn, mã hoá (nếu có) phải là AES-128"""
+        if not len(playlist.segments):
+            raise DownloadError("Playlist không có segment")
+        if not playlist.endlist and playlist.playlist_type != 'VOD':
+            raise DownloadError("Không hỗ trợ tải stream trực tiếp (live)")
+        if playlist.total_duration > Config.DOWNLOAD_MAX_DURATION:
+            raise DownloadError(
+                f"Video dài {playlist.total_duration / 60:.0f} phút, "
+                f"vượt giới hạn {Config.DOWNLOAD_MAX_DURATION / 60:.0f} phút"
+            )
+        for key in playlist.keys:
+            if key.method != 'AES-128':
+                raise DownloadError(f"Không hỗ trợ mã hoá {key.method}")
+            if Cipher is None and pyaes is None:
+                raise DownloadError("Thiếu thư viện cryptography/pyaes để giải mã AES-128")
+    
+    async def _download_segments(self, session: aiohttp.ClientSession, playlist: Playlist,
+                                 output, on_progress: Optional[ProgressCallback]) -> int:
+        """Tải song song, ghi theo thứ tự; trả về số bytes đã ghi"""
+        loop = asyncio.get_running_loop()
+        total = len(playlist.segments)
+        indexes = iter(range(total))
+        # Số segment đã lấy chỉ số nhưng chưa ghi (đang tải hoặc chờ tới lượt)
+        window = asyncio.Semaphore(self.workers * 2)
+        write_lock = asyncio.Lock()
+        pending: Dict[int, bytes] = {}
+        keys: Dict[str, asyncio.Future] = {}
+        state = {'next': 0, 'written': 0, 'init': None}
+        
+        async def flush():
+            async with write_lock:
+                while state['next'] in pending:
+                    index = state['next']
+                    data = pending.pop(index)
+                    
+                    init_section = playlist.segments[index].init_section
+                    if init_section is not None and init_section is not state['init']:
+                        init = await self._fetch_init(session, init_section)
+                        await loop.run_in_executor(None, output.write, init)
+                        state['written'] += len(init)
+                        state['init'] = init_section
+                    
+                    await loop.run_in_executor(None, output.write, data)
+                    state['written'] += len(data)
+                    state['next'] = index + 1
+                    window.release()
+                    
+                    if state['written'] > Config.DOWNLOAD_MAX_BYTES:
+                        raise DownloadError(
+                            f"File vượt giới hạn {Config.DOWNLOAD_MAX_BYTES / 1024 / 1024:.0f} MB"
+                        )
+                    if on_progress is not None:
+                        outcome = on_progress(index + 1, total, state['written'])
+                        if asyncio.iscoroutine(outcome):
+                            await outcome
+        
+        async def worker():
+            while True:
+                # Giữ chỗ trước rồi mới lấy chỉ số: segment nhỏ nhất chưa ghi
+                # luôn đang được tải, nên cửa sổ không thể bị kẹt
+                await window.acquire()
+                index = next(indexes, None)
+                if index is None:
+                    window.release()
+                    return
+                pending[index] = await self._fetch_segment(session, playlist, index, keys)
+                await flush()
+        
+        tasks = [asyncio.ensure_future(worker()) for _ in range(min(self.workers, total))]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return state['written']
+    
+    async def _fetch_segment(self, session: aiohttp.ClientSession, playlist: Playlist,
+                             index: int, keys: Dict[str, asyncio.Future]) -> bytes:
+        """Tải (và giải mã) một segment"""
+        segment = playlist.segments[index]
+        data = await self._fetch(session, playlist.segment_url(index), segment.byterange)
+        self._counters['segments'] += 1
+        self._counters['bytes'] += len(data)
+        
+        if segment.key is not None:
+            key = await self._key(session, segment.key, keys)
+            iv = segment.key.iv or segment.sequence.to_bytes(16, 'big')
+            data = await asyncio.get_running_loop().run_in_executor(None, decrypt_aes128, key, iv, data)
+        return data
+    
+    async def _key(self, session: aiohttp.ClientSession, key: Key, keys: Dict[str, asyncio.Future]) -> bytes:
+        """Khoá AES (mỗi URI chỉ tải một lần cho một lượt tải)"""
+        if key.uri not in keys:
+            keys[key.uri] = asyncio.ensure_future(self._fetch(session, key.uri))
+        value = await keys[key.uri]
+        if len(value) != 16:
+            raise DownloadError(f"Khoá AES-128 không hợp lệ ({len(value)} bytes)")
+        return value
+    
+    async def _fetch_init(self, session: aiohttp.ClientSession, init_section: InitSection) -> bytes:
+        """Tải EXT-X-MAP"""
+        return await self._fetch(session, init_section.uri, init_section.byterange)
+    
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, byterange: Optional[tuple] = None) -> bytes:
+        """GET có thử lại (backoff luỹ thừa) trong giới hạn đồng thời của host"""
+        headers = {}
+        if byterange is not None:
+            length, offset = byterange
+            headers['Range'] = f'bytes={offset}-{offset + length - 1}'
+        
+        host = host_of(url)
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        
+        for attempt in range(self.retries + 1):
+            try:
+                async with limit:
+                    async with session.get(url, headers=headers,
+                                           timeout=aiohttp.ClientTimeout(total=self.segment_timeout)) as response:
+                        if response.status in FATAL_STATUSES:
+                            raise DownloadError(f"HTTP {response.status}: {url}")
+                        response.raise_for_status()
+                        return await response.read()
+            except BlockedAddressError as e:
+                raise DownloadError(str(e)) from e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Tên miền trỏ vào địa chỉ nội bộ (resolver từ chối): không thử lại
+                if isinstance(getattr(e, 'os_error', None), BlockedAddressError):
+                    raise DownloadError(str(e.os_error)) from e
+                if attempt == self.retries:
+                    raise DownloadError(f"Không tải được {url}: {str(e) or e.__class__.__name__}") from e
+                self._counters['retries'] += 1
+                self.logger.debug(f"Thử lại {url} (lần {attempt + 1}): {e}")
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm số lượt tải/lỗi, số segment, số lần thử lại, bytes và tốc độ trung bình
+        """
+        return {
+            **self._counters,
+            'avg_mbps': round(self._written * 8 / self._elapsed / 1_000_000, 2) if self._elapsed else 0.0,
+        }
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Relay HLS tích hợp (aiohttp): viết lại playlist để mọi request đi qua relay,
+tải segment upstream với headers đúng và cache segment theo dung lượng
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import logging
+import re
+import secrets
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin
+import aiohttp
+from aiohttp import web
+from config import Config
+from utils.host_performance import host_of
+from utils.http_client import HttpClient
+from utils.single_flight import SingleFlight
+from utils.url_guard import BlockedAddressError, public_connector, public_trace_config
+
+# Loại URL relay: p = playlist (được viết lại), s = segment/khoá/init (được cache)
+PLAYLIST, SEGMENT = 'p', 's'
+
+# Tag có thuộc tính URI và loại tài nguyên mà URI đó trỏ tới
+URI_TAGS = {
+    '#EXT-X-MEDIA': PLAYLIST,
+    '#EXT-X-I-FRAME-STREAM-INF': PLAYLIST,
+    '#EXT-X-RENDITION-REPORT': PLAYLIST,
+    '#EXT-X-KEY': SEGMENT,
+    '#EXT-X-SESSION-KEY': SEGMENT,
+    '#EXT-X-MAP': SEGMENT,
+    '#EXT-X-PART': SEGMENT,
+    '#EXT-X-PRELOAD-HINT': SEGMENT,
+}
+
+URI_ATTRIBUTE_RE = re.compile(r'URI="([^"]*)"')
+
+PLAYLIST_CONTENT_TYPE = 'application/vnd.apple.mpegurl'
+
+class SegmentTooLarge(Exception):
+    """Segment vượt RELAY_MAX_SEGMENT_BYTES, phải chuyển thẳng không cache"""
+
+class UpstreamError(Exception):
+    """Upstream trả lỗi"""
+    
+    def __init__(self, status: int):
+        super().__init__(f"Upstream HTTP {status}")
+        self.status = status
+
+class CachedSegment(NamedTuple):
+    """Segment đã tải (body và các header cần trả lại)"""
+    body: bytes
+    status: int
+    content_type: str
+    content_range: Optional[str]
+
+class ByteLRUCache:
+    """LRU giới hạn theo tổng số bytes của các giá trị"""
+    
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: Tổng dung lượng tối đa
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[int, object]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable) -> Optional[object]:
+        """Lấy giá trị (None nếu không có)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, key: Hashable, value: object, size: int):
+        """Lưu giá trị có dung lượng `size` bytes (bỏ qua nếu lớn hơn cả cache)"""
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= old[0]
+        self._entries[key] = (size, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (evicted_size, _) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm hits, misses, evictions, số mục, dung lượng và tỉ lệ hit
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'size_mb': round(self.size / 1024 / 1024, 1),
+            'capacity_mb': round(self.max_bytes / 1024 / 1024, 1),
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+class StreamStats:
+    """Thống kê của một stream (một playlist gốc được relay)"""
+    
+    __slots__ = ('origin', 'playlists', 'hits', 'shared', 'misses', 'egress_bytes', 'upstream_bytes')
+    
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.playlists = 0
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+        self.egress_bytes = 0
+        self.upstream_bytes = 0
+    
+    @property
+    def hit_ratio(self) -> float:
+        """Tỉ lệ request segment không cần tải upstream riêng (cache hoặc dùng chung lần tải đang chạy)"""
+        requests = self.hits + self.shared + self.misses
+        return round((self.hits + self.shared) / requests, 3) if requests else 0.0
+
+class PlaylistRewriter:
+    """
+    Viết lại từng dòng playlist: URI (dòng URI và thuộc tính URI="...") được
+    chuyển thành URL relay đã ký
+    """
+    
+    def __init__(self, base_url: str, sign: Callable[[str, str], str]):
+        """
+        Args:
+            base_url: URL của playlist upstream (để giải URI tương đối)
+            sign: Hàm (loại, URL tuyệt đối) -> URL relay
+        """
+        self.base_url = base_url
+        self.sign = sign
+        self._next_is_playlist = False
+    
+    def rewrite(self, line: str) -> str:
+        """Viết lại một dòng (không gồm ký tự xuống dòng)"""
+        stripped = line.strip()
+        if not stripped:
+            return line
+        
+        if stripped[0] == '#':
+            tag = stripped.split(':', 1)[0]
+            if tag == '#EXT-X-STREAM-INF':
+                self._next_is_playlist = True
+                return line
+            kind = URI_TAGS.get(tag)
+            if kind is None:
+                return line
+            return URI_ATTRIBUTE_RE.sub(lambda match: f'URI="{self._relay(kind, match.group(1))}"', line)
+        
+        kind = PLAYLIST if self._next_is_playlist else SEGMENT
+        self._next_is_playlist = False
+        return self._relay(kind, stripped)
+    
+    def _relay(self, kind: str, uri: str) -> str:
+        url = urljoin(self.base_url, uri)
+        # Khoá DRM (skd://...), data: URI... giữ nguyên
+        if not url.startswith(('http://', 'https://')):
+            return uri
+        return self.sign(kind, url)
+
+def _encode_url(url: str) -> str:
+    return base64.urlsafe_b64encode(url.encode()).decode().rstrip('=')
+
+def _decode_url(encoded: str) -> str:
+    return base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)).decode()
+
+class HlsRelay:
+    """
+    Relay HLS chạy trong cùng process với bot
+    
+    `relay_url()` trả về URL đã ký (có hạn) trỏ tới relay; relay tải playlist
+    upstream bằng headers của bot (Config.DEFAULT_HEADERS) và viết lại theo
+    từng dòng khi đang nhận, nên mọi variant/segment/khoá sau đó cũng đi qua
+    relay. Segment được cache trong LRU giới hạn theo bytes và các request
+    đồng thời cho cùng segment chỉ tải upstream một lần, nên nhiều người xem
+    cùng một phim dùng chung các lần tải.
+    """
+    
+    def __init__(self, http_client: Optional[HttpClient] = None, host: str = None, port: int = None,
+                 public_url: str = None, secret: str = None, cache_bytes: int = None,
+                 max_segment_bytes: int = None, link_ttl: float = None):
+        """
+        Args:
+            http_client: HTTP client dùng chung
+            host: Địa chỉ lắng nghe
+            port: Cổng lắng nghe
+            public_url: URL gốc mà trình phát của người dùng truy cập được
+            secret: Khoá ký URL (rỗng = sinh ngẫu nhiên, URL mất hiệu lực khi khởi động lại)
+            cache_bytes: Dung lượng cache segment
+            max_segment_bytes: Segment lớn hơn được chuyển thẳng, không cache
+            link_ttl: Thời hạn của URL relay (giây)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.http_client = http_client
+        self.host = host if host is not None else Config.RELAY_HOST
+        self.port = port if port is not None else Config.RELAY_PORT
+        public_url = public_url if public_url is not None else Config.RELAY_PUBLIC_URL
+        self.public_url = (public_url or f'http://localhost:{self.port}').rstrip('/')
+        self._secret = (secret if secret is not None else Config.RELAY_SECRET or secrets.token_hex(16)).encode()
+        self.max_segment_bytes = max_segment_bytes if max_segment_bytes is not None else Config.RELAY_MAX_SEGMENT_BYTES
+        self.link_ttl = link_ttl if link_ttl is not None else Config.RELAY_LINK_TTL
+        self.cache = ByteLRUCache(cache_bytes if cache_bytes is not None else Config.RELAY_CACHE_BYTES)
+        self.flights = SingleFlight('relay')
+        self._streams: 'OrderedDict[str, StreamStats]' = OrderedDict()
+        self._runner: Optional[web.AppRunner] = None
+        self._own_session: Optional[aiohttp.ClientSession] = None
+        self._counters = {'playlists': 0, 'segments': 0, 'pass_through': 0, 'rejected': 0, 'blocked': 0,
+                          'upstream_errors': 0}
+    
+    async def start(self):
+        """Bắt đầu lắng nghe"""
+        app = web.Application()
+        app.router.add_get('/hls/{kind}/{stream}/{expires}/{signature}/{encoded}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.logger.info(f"HLS relay đang chạy tại {self.host}:{self.port} ({self.public_url})")
+    
+    async def stop(self):
+        """Dừng relay"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._own_session:
+            await self._own_session.close()
+            self._own_session = None
+    
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Session tải upstream, chỉ kết nối tới địa chỉ công khai (URI trong
+        playlist do bên ngoài quyết định, không được dùng để đọc mạng nội bộ)
+        """
+        if self.http_client:
+            return self.http_client.public_session
+        if self._own_session is None or self._own_session.closed:
+            self._own_session = aiohttp.ClientSession(
+                connector=public_connector(),
+                headers=Config.DEFAULT_HEADERS,
+                trace_configs=[public_trace_config()]
+            )
+        return self._own_session
+    
+    def relay_url(self, url: str) -> str:
+        """
+        URL relay cho một playlist
+        
+        Args:
+            url: URL m3u8 upstream
+        
+        Returns:
+            URL đã ký trỏ tới relay
+        """
+        stream = hashlib.sha1(url.encode()).hexdigest()[:12]
+        return self._sign(PLAYLIST, stream, url)
+    
+    def _sign(self, kind: str, stream: str, url: str, expires: Optional[int] = None) -> str:
+        expires = expires or int(time.time() + self.link_ttl)
+        encoded = _encode_url(url)
+        signature = self._signature(kind, stream, expires, encoded)
+        # Giữ đuôi file để trình phát nhận đúng loại nội dung
+        suffix = '.m3u8' if kind == PLAYLIST else ''
+        return f'{self.public_url}/hls/{kind}/{stream}/{expires}/{signature}/{encoded}{suffix}'
+    
+    def _signature(self, kind: str, stream: str, expires: int, encoded: str) -> str:
+        message = f'{kind}/{stream}/{expires}/{encoded}'.encode()
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()[:24]
+    
+    def _stream(self, stream: str, url: str) -> StreamStats:
+        stats = self._streams.get(stream)
+        if stats is None:
+            stats = self._streams[stream] = StreamStats(host_of(url))
+            while len(self._streams) > Config.RELAY_STREAM_STATS:
+                self._streams.popitem(last=False)
+        else:
+            self._streams.move_to_end(stream)
+        return stats
+    
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        info = request.match_info
+        kind, stream, encoded = info['kind'], info['stream'], info['encoded']
+        if encoded.endswith('.m3u8'):
+            encoded = encoded[:-5]
+        
+        try:
+            expires = int(info['expires'])
+            url = _decode_url(encoded)
+        except (ValueError, binascii.Error):
+            self._counters['rejected'] += 1
+            raise web.HTTPBadRequest()
+        
+        signature = self._signature(kind, stream, expires, encoded)
+        if kind not in (PLAYLIST, SEGMENT) or not hmac.compare_digest(signature, info['signature']):
+            self._counters['rejected'] += 1
+            raise web.HTTPForbidden()
+        if expires < time.time():
+            self._counters['rejected'] += 1
+            raise web.HTTPGone()
+        
+        stats = self._stream(stream, url)
+        try:
+            if kind == PLAYLIST:
+                return await self._playlist(request, stats, stream, url, expires)
+            return await self._segment(request, stats, url)
+        except UpstreamError as e:
+            self._counters['upstream_errors'] += 1
+            raise web.HTTPBadGateway(text=str(e))
+        except BlockedAddressError as e:
+            raise self._blocked(url, e)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Tên miền trỏ vào địa chỉ nội bộ (resolver từ chối)
+            if isinstance(getattr(e, 'os_error', None), BlockedAddressError):
+                raise self._blocked(url, e.os_error)
+            self._counters['upstream_errors'] += 1
+            self.logger.warning(f"Relay không tải được {url}: {e}")
+            raise web.HTTPBadGateway()
+    
+    def _blocked(self, url: str, error: BlockedAddressError) -> web.HTTPForbidden:
+        """Từ chối URL upstream trỏ vào địa chỉ nội bộ"""
+        self._counters['blocked'] += 1
+        self.logger.warning(f"Relay từ chối {url}: {error}")
+        return web.HTTPForbidden()
+    
+    async def _playlist(self, request: web.Request, stats: StreamStats, stream: str,
+                        url: str, expires: int) -> web.StreamResponse:
+        """Tải playlist upstream và trả về bản viết lại theo từng dòng khi đang nhận"""
+        self._counters['playlists'] += 1
+        stats.playlists += 1
+        async with self.session.get(url) as upstream:
+            if upstream.status != 200:
+                raise UpstreamError(upstream.status)
+            
+            # URL con có cùng hạn với playlist gốc để link không sống lâu hơn TTL
+            rewriter = PlaylistRewriter(
+                str(upstream.url), lambda kind, child: self._sign(kind, stream, child, expires)
+            )
+            response = web.StreamResponse(headers={
+                'Content-Type': PLAYLIST_CONTENT_TYPE,
+                'Cache-Control': 'no-cache',
+                'Access-Control-Allow-Origin': '*',
+            })
+            await response.prepare(request)
+            
+            pending = b''
+            async for chunk in upstream.content.iter_any():
+                stats.upstream_bytes += len(chunk)
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                if lines:
+                    await self._write_lines(response, stats, rewriter, lines)
+            if pending:
+                await self._write_lines(response, stats, rewriter, [pending])
+        
+        await response.write_eof()
+        return response
+    
+    @staticmethod
+    async def _write_lines(response: web.StreamResponse, stats: StreamStats,
+                           rewriter: PlaylistRewriter, lines: List[bytes]):
+        text = ''.join(
+            rewriter.rewrite(line.decode('utf-8', 'replace').rstrip('\r')) + '\n' for line in lines
+        )
+        data = text.encode()
+        stats.egress_bytes += len(data)
+        await response.write(data)
+    
+    async def _segment(self, request: web.Request, stats: StreamStats, url: str) -> web.StreamResponse:
+        """Trả segment từ cache, hoặc tải upstream (gộp các request đồng thời)"""
+        self._counters['segments'] += 1
+        range_header = request.headers.get('Range')
+        key = (url, range_header)
+        
+        segment = self.cache.get(key)
+        if segment is not None:
+            stats.hits += 1
+        else:
+            if key in self.flights:
+                stats.shared += 1
+            else:
+                stats.misses += 1
+            try:
+                segment = await self.flights.do(key, lambda: self._fetch_segment(stats, url, range_header))
+            except SegmentTooLarge:
+                return await self._pass_through(request, stats, url, range_header)
+        
+        headers = {'Content-Type': segment.content_type, 'Access-Control-Allow-Origin': '*'}
+        if segment.content_range:
+            headers['Content-Range'] = segment.content_range
+        stats.egress_bytes += len(segment.body)
+        return web.Response(body=segment.body, status=segment.status, headers=headers)
+    
+    async def _fetch_segment(self, stats: StreamStats, url: str, range_header: Optional[str]) -> CachedSegment:
+        headers = {'Range': range_header} if range_header else {}
+        async with self.session.get(url, headers=headers) as upstream:
+            if upstream.status not in (200, 206):
+                raise UpstreamError(upstream.status)
+            if upstream.content_length and upstream.content_length > self.max_segment_bytes:
+                raise SegmentTooLarge()
+            
+            body = bytearray()
+            async for chunk in upstream.content.iter_chunked(256 * 1024):
+                body += chunk
+                if len(body) > self.max_segment_bytes:
+                    raise SegmentTooLarge()
+            
+            segment = CachedSegment(
+                bytes(body),
+                upstream.status,
+                upstream.headers.get('Content-Type', 'application/octet-stream'),
+                upstream.headers.get('Content-Range'),
+            )
+        
+        stats.upstream_bytes += len(segment.body)
+        self.cache.set((url, range_header), segment, len(segment.body))
+        return segment
+    
+    async def _pass_through(self, request: web.Request, stats: StreamStats, url: str,
+                            range_header: Optional[str]) -> web.StreamResponse:
+        """Chuyển thẳng tài nguyên lớn từ upstream, không cache"""
+        self._counters['pass_through'] += 1
+        headers = {'Range': range_header} if range_header else {}
+        async with self.session.get(url, headers=headers) as upstream:
+            if upstream.status not in (200, 206):
+                raise UpstreamError(upstream.status)
+            response = web.StreamResponse(status=upstream.status, headers={
+                'Content-Type': upstream.headers.get('Content-Type', 'application/octet-stream'),
+                'Access-Control-Allow-Origin': '*',
+            })
+            if upstream.headers.get('Content-Range'):
+                response.headers['Content-Range'] = upstream.headers['Content-Range']
+            await response.prepare(request)
+            async for chunk in upstream.content.iter_chunked(256 * 1024):
+                stats.upstream_bytes += len(chunk)
+                stats.egress_bytes += len(chunk)
+                await response.write(chunk)
+        await response.write_eof()
+        return response
+    
+    def stream_stats(self, limit: int = 5) -> List[Tuple[str, StreamStats]]:
+        """Các stream có egress lớn nhất"""
+        return sorted(self._streams.items(), key=lambda item: item[1].egress_bytes, reverse=True)[:limit]
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm số request, cache segment và hit ratio/egress của các stream lớn nhất
+        """
+        egress = sum(stats.egress_bytes for stats in self._streams.values())
+        upstream = sum(stats.upstream_bytes for stats in self._streams.values())
+        result = {
+            **self._counters,
+            'coalesced': self.flights.coalesced,
+            'egress_mb': round(egress / 1024 / 1024, 1),
+            'upstream_mb': round(upstream / 1024 / 1024, 1),
+            **{f'cache_{key}': value for key, value in self.cache.stats().items()},
+        }
+        for stream, stats in self.stream_stats():
+            result[f'stream {stream}'] = (
+                f"{stats.origin} hit={stats.hit_ratio} egress={stats.egress_bytes / 1024 / 1024:.1f}MB"
+            )
+        return result
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Giới hạn tốc độ theo host (token bucket tự điều chỉnh theo 429/403 và
+Retry-After) kèm circuit breaker, dùng chung cho mọi request tải trang
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from config import Config
+from utils.deadline import remaining_time
+
+# Status cho biết host đang chặn/giới hạn chúng ta
+THROTTLE_STATUSES = frozenset((403, 429))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+class HostUnavailableError(Exception):
+    """Host đang bị giới hạn, request bị bỏ ngay thay vì gửi đi"""
+    
+    def __init__(self, host: str, retry_in: float, reason: str):
+        super().__init__(f"{host} {reason}, thử lại sau {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+class CircuitOpenError(HostUnavailableError):
+    """Circuit của host đang mở"""
+    
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(host, retry_in, "đang tạm ngưng (circuit mở)")
+
+class HostThrottledError(HostUnavailableError):
+    """Phải chờ token lâu hơn mức cho phép"""
+    
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(host, retry_in, "đang giới hạn tốc độ")
+
+def parse_retry_after(value: Optional[str], now: float = None) -> Optional[float]:
+    """
+    Đọc header Retry-After (số giây hoặc HTTP-date)
+    
+    Args:
+        value: Giá trị header
+        now: Unix time hiện tại (mặc định time.time())
+    
+    Returns:
+        Số giây cần chờ hoặc None nếu không có/không hợp lệ
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+    now = now if now is not None else time.time()
+    return max(0.0, when - now)
+
+class HostState:
+    """Bucket và trạng thái circuit của một host"""
+    
+    __slots__ = ('rate', 'tokens', 'refilled_at', 'blocked_until', 'circuit', 'open_until',
+                 'failures', 'probing', 'requests', 'throttled', 'rejected', 'trips')
+    
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.tokens = burst
+        self.refilled_at = now
+        self.blocked_until = 0.0
+        self.circuit = CLOSED
+        self.open_until = 0.0
+        self.failures = 0
+        self.probing = False
+        self.requests = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.trips = 0
+
+class HostLimiter:
+    """
+    Token bucket thích ứng + circuit breaker cho từng host
+    
+    Mỗi request lấy một token trước khi gửi (chờ nếu bucket cạn). 403/429
+    giảm một nửa tốc độ của host (AIMD), Retry-After chặn host đến hết thời
+    gian yêu cầu; request thành công tăng dần tốc độ trở lại. Lỗi/bị chặn
+    liên tiếp `failure_threshold` lần thì mở circuit: mọi request tới host
+    bị bỏ ngay trong `cooldown` giây (hoặc lâu hơn theo Retry-After), sau đó
+    một request thử (half-open) quyết định đóng lại hay mở tiếp.
+    """
+    
+    def __init__(self, rate: float = None, burst: float = None, min_rate: float = None,
+                 max_rate: float = None, max_wait: float = None, failure_threshold: int = None,
+                 cooldown: float = None, capacity: int = None):
+        """
+        Args:
+            rate: Tốc độ ban đầu của mỗi host (request/giây)
+            burst: Số request gửi liền được khi bucket đầy
+            min_rate: Tốc độ thấp nhất khi bị giảm
+            max_rate: Tốc độ cao nhất khi tăng lại
+            max_wait: Chờ token lâu hơn mức này thì bỏ request (giây)
+            failure_threshold: Số lần lỗi/bị chặn liên tiếp để mở circuit
+            cooldown: Thời gian circuit mở tối thiểu (giây)
+            capacity: Số host tối đa được theo dõi
+        """
+        self.logger = logging.getLogger(__name__)
+        self.rate = rate if rate is not None else Config.HOST_RATE_INITIAL
+        self.burst = burst if burst is not None else Config.HOST_RATE_BURST
+        self.min_rate = min_rate if min_rate is not None else Config.HOST_RATE_MIN
+        self.max_rate = max_rate if max_rate is not None else Config.HOST_RATE_MAX
+        self.max_wait = max_wait if max_wait is not None else Config.HOST_RATE_MAX_WAIT
+        self.failure_threshold = (failure_threshold if failure_threshold is not None
+                                  else Config.HOST_CIRCUIT_THRESHOLD)
+        self.cooldown = cooldown if cooldown is not None else Config.HOST_CIRCUIT_COOLDOWN
+        self.capacity = capacity if capacity is not None else Config.HOST_LIMITER_SIZE
+        self._hosts: 'OrderedDict[str, HostState]' = OrderedDict()
+    
+    def _state(self, host: str, now: float) -> HostState:
+        """Trạng thái của host (tạo mới nếu chưa có, bỏ host lâu không dùng nhất khi đầy)"""
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.rate, self.burst, now)
+            while len(self._hosts) > self.capacity:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+        return state
+    
+    def check(self, host: str):
+        """
+        Bỏ ngay nếu circuit của host đang mở (không lấy token)
+        
+        Raises:
+            CircuitOpenError: Circuit đang mở
+        """
+        state = self._hosts.get(host)
+        if state is not None and state.circuit == OPEN:
+            retry_in = state.open_until - time.monotonic()
+            if retry_in > 0:
+                state.rejected += 1
+                raise CircuitOpenError(host, retry_in)
+    
+    async def acquire(self, host: str):
+        """
+        Chờ tới lượt gửi request tới host
+        
+        Raises:
+            CircuitOpenError: Circuit đang mở (hoặc đang có request thử)
+            HostThrottledError: Phải chờ lâu hơn max_wait (hoặc lâu hơn thời gian
+                                còn lại của yêu cầu)
+        """
+        now = time.monotonic()
+        state = self._state(host, now)
+        
+        if state.circuit == OPEN:
+            if now < state.open_until:
+                state.rejected += 1
+                raise CircuitOpenError(host, state.open_until - now)
+            state.circuit = HALF_OPEN
+        if state.circuit == HALF_OPEN:
+            # Chỉ một request thử, các request khác vẫn bị bỏ
+            if state.probing:
+                state.rejected += 1
+                raise CircuitOpenError(host, self.cooldown)
+            state.probing = True
+        
+        # Nạp token theo tốc độ hiện tại rồi đặt chỗ (token âm = phải chờ)
+        state.tokens = min(self.burst, state.tokens + (now - state.refilled_at) * state.rate)
+        state.refilled_at = now
+        wait = max(state.blocked_until - now, (1 - state.tokens) / state.rate if state.tokens < 1 else 0.0)
+        if wait > min(self.max_wait, remaining_time()):
+            state.rejected += 1
+            state.probing = False
+            raise HostThrottledError(host, wait)
+        state.tokens -= 1
+        state.requests += 1
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    def try_acquire(self, host: str) -> bool:
+        """
+        Lấy token ngay nếu có, không chờ (cho request phụ như hedge)
+        
+        Returns:
+            False nếu host không ở trạng thái bình thường hoặc bucket đang cạn
+        """
+        now = time.monotonic()
+        state = self._state(host, now)
+        if state.circuit != CLOSED or now < state.blocked_until:
+            return False
+        state.tokens = min(self.burst, state.tokens + (now - state.refilled_at) * state.rate)
+        state.refilled_at = now
+        if state.tokens < 1:
+            return False
+        state.tokens -= 1
+        state.requests += 1
+        return True
+    
+    def record(self, host: str, status: int, retry_after: Optional[str] = None):
+        """
+        Ghi kết quả của một response
+        
+        Args:
+            host: Host đã gửi request
+            status: HTTP status
+            retry_after: Header Retry-After (nếu có)
+        """
+        now = time.monotonic()
+        state = self._state(host, now)
+        delay = parse_retry_after(retry_after)
+        
+        if status in THROTTLE_STATUSES or (status == 503 and delay is not None):
+            state.throttled += 1
+            state.rate = max(self.min_rate, state.rate / 2)
+            # Vừa gửi quá nhanh: bỏ phần burst còn lại, request kế tiếp chờ theo tốc độ mới
+            state.tokens = min(state.tokens, 0.0)
+            if delay:
+                state.blocked_until = max(state.blocked_until, now + delay)
+            self.logger.warning(
+                f"{host} giới hạn truy cập (HTTP {status}), giảm còn {state.rate:.2f} req/s"
+                + (f", chờ {delay:.0f}s theo Retry-After" if delay else "")
+            )
+            self._failed(host, state, now, delay)
+        elif status >= 500:
+            self._failed(host, state, now)
+        else:
+            # Tăng dần lại: mỗi request thành công thêm 10% tốc độ ban đầu
+            state.rate = min(self.max_rate, state.rate + self.rate * 0.1)
+            state.failures = 0
+            if state.circuit != CLOSED:
+                self.logger.info(f"Đóng circuit của {host}")
+            state.circuit = CLOSED
+            state.probing = False
+    
+    def release(self, host: str):
+        """Request bị huỷ trước khi có kết quả: không tính gì, chỉ cho phép request thử khác"""
+        state = self._hosts.get(host)
+        if state is not None:
+            state.probing = False
+    
+    def record_failure(self, host: str):
+        """Ghi một lần lỗi kết nối/timeout"""
+        now = time.monotonic()
+        self._failed(host, self._state(host, now), now)
+    
+    def _failed(self, host: str, state: HostState, now: float, delay: Optional[float] = None):
+        """Đếm lỗi liên tiếp, mở circuit khi vượt ngưỡng hoặc khi request thử thất bại"""
+        state.failures += 1
+        state.probing = False
+        if state.circuit == HALF_OPEN or state.failures >= self.failure_threshold:
+            state.circuit = OPEN
+            state.open_until = now + max(self.cooldown, delay or 0.0)
+            state.trips += 1
+            self.logger.warning(
+                f"Mở circuit của {host} sau {state.failures} lỗi liên tiếp, "
+                f"tạm ngưng {state.open_until - now:.0f}s"
+            )
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm số host, số circuit đang mở, tổng số lần bị chặn/bị bỏ/mở
+            circuit và trạng thái các host có vấn đề nhất
+        """
+        now = time.monotonic()
+        states = self._hosts.items()
+        stats = {
+            'hosts': len(self._hosts),
+            'open': sum(1 for _, state in states if state.circuit == OPEN and state.open_until > now),
+            'throttled': sum(state.throttled for _, state in states),
+            'rejected': sum(state.rejected for _, state in states),
+            'trips': sum(state.trips for _, state in states),
+        }
+        troubled = sorted(
+            (item for item in states if item[1].throttled or item[1].trips or item[1].circuit != CLOSED),
+            key=lambda item: (item[1].trips, item[1].throttled), reverse=True
+        )
+        for host, state in troubled[:5]:
+            circuit = state.circuit
+            if circuit == OPEN and state.open_until > now:
+                circuit = f"open {state.open_until - now:.0f}s"
+            stats[host] = (f"{circuit}, {state.rate:.2f} req/s, "
+                           f"throttled {state.throttled}, trips {state.trips}")
+        return stats
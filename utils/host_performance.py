@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bảng hiệu năng theo host (TTFB, throughput) với trung bình suy giảm theo thời gian
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from config import Config
+
+# Trọng số tối đa của lịch sử khi có mẫu mới ngay sau mẫu cũ
+MAX_HISTORY_WEIGHT = 0.7
+
+# Lượng dữ liệu quy chiếu để đổi (TTFB, throughput) thành thời gian dự kiến
+REFERENCE_BYTES = 1024 * 1024
+
+def host_of(url: str) -> str:
+    """Host của URL (bỏ www., giữ port nếu có), chuỗi rỗng nếu không đọc được"""
+    try:
+        parts = urlsplit(url)
+        hostname, port = parts.hostname or '', parts.port
+    except ValueError:
+        return ''
+    if hostname.startswith('www.'):
+        hostname = hostname[4:]
+    return f'{hostname}:{port}' if port else hostname
+
+class DecayedAverage:
+    """
+    Trung bình có trọng số suy giảm theo thời gian
+    
+    Trọng số của giá trị cũ giảm một nửa sau mỗi `half_life` giây, nên một
+    mẫu mới sau thời gian dài gần như thay hẳn lịch sử.
+    """
+    
+    __slots__ = ('value', 'updated_at')
+    
+    def __init__(self):
+        self.value: Optional[float] = None
+        self.updated_at = 0.0
+    
+    def update(self, sample: float, half_life: float, now: float):
+        """Thêm một mẫu"""
+        if self.value is None:
+            self.value = sample
+        else:
+            weight = min(MAX_HISTORY_WEIGHT, 0.5 ** ((now - self.updated_at) / half_life))
+            self.value = self.value * weight + sample * (1 - weight)
+        self.updated_at = now
+    
+    def age(self, now: float) -> float:
+        """Số giây kể từ mẫu cuối (vô cùng nếu chưa có mẫu)"""
+        return now - self.updated_at if self.value is not None else float('inf')
+
+class HostStats:
+    """Số đo của một host"""
+    
+    __slots__ = ('ttfb_ms', 'throughput', 'samples', 'failures')
+    
+    def __init__(self):
+        self.ttfb_ms = DecayedAverage()
+        self.throughput = DecayedAverage()
+        self.samples = 0
+        self.failures = 0
+    
+    def expected_seconds(self, fallback_throughput: Optional[float] = None) -> Optional[float]:
+        """
+        Thời gian dự kiến để nhận REFERENCE_BYTES (TTFB + thời gian truyền)
+        
+        Args:
+            fallback_throughput: Throughput (bytes/giây) dùng khi host mới chỉ có TTFB
+        
+        Returns:
+            Số giây, None nếu chưa đo thành công lần nào
+        """
+        if self.ttfb_ms.value is None and self.throughput.value is None:
+            return None
+        throughput = self.throughput.value or fallback_throughput
+        
+        seconds = (self.ttfb_ms.value or 0.0) / 1000
+        if throughput:
+            seconds += REFERENCE_BYTES / throughput
+        return seconds
+
+class HostPerformanceTable:
+    """
+    Bảng hiệu năng đo được theo host, dùng để xếp hạng mirror mà không cần
+    đo lại mỗi lần (giới hạn số host, host ít dùng nhất bị bỏ trước)
+    """
+    
+    def __init__(self, half_life: float = None, capacity: int = None):
+        """
+        Args:
+            half_life: Sau bao nhiêu giây trọng số của số đo cũ giảm một nửa
+            capacity: Số host tối đa được nhớ
+        """
+        self.half_life = half_life if half_life is not None else Config.MIRROR_HALF_LIFE
+        self.capacity = capacity if capacity is not None else Config.MIRROR_TABLE_SIZE
+        self._hosts: 'OrderedDict[str, HostStats]' = OrderedDict()
+    
+    def record(self, host: str, ttfb_ms: Optional[float] = None, throughput: Optional[float] = None):
+        """
+        Ghi một lần đo
+        
+        Args:
+            host: Host (xem host_of)
+            ttfb_ms: Thời gian đến byte đầu tiên (mili giây)
+            throughput: Tốc độ tải (bytes/giây)
+        """
+        if not host:
+            return
+        now = time.monotonic()
+        stats = self._entry(host)
+        if ttfb_ms is not None:
+            stats.ttfb_ms.update(ttfb_ms, self.half_life, now)
+        if throughput:
+            stats.throughput.update(throughput, self.half_life, now)
+        stats.samples += 1
+    
+    def record_failure(self, host: str):
+        """Ghi một lần đo thất bại"""
+        if host:
+            self._entry(host).failures += 1
+    
+    def get(self, host: str) -> Optional[HostStats]:
+        """Số đo của host (None nếu chưa có)"""
+        return self._hosts.get(host)
+    
+    def needs_sample(self, host: str, max_age: float) -> bool:
+        """True nếu host chưa có throughput đo trong `max_age` giây gần đây"""
+        stats = self._hosts.get(host)
+        return stats is None or stats.throughput.age(time.monotonic()) > max_age
+    
+    def mean_throughput(self) -> Optional[float]:
+        """Throughput trung bình của các host đã đo (bytes/giây)"""
+        values = [stats.throughput.value for stats in self._hosts.values() if stats.throughput.value]
+        return sum(values) / len(values) if values else None
+    
+    def _entry(self, host: str) -> HostStats:
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = HostStats()
+            while len(self._hosts) > self.capacity:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+        return stats
+    
+    def __len__(self) -> int:
+        return len(self._hosts)
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm số host đã đo và host nhanh nhất
+        """
+        fallback = self.mean_throughput()
+        ranked = sorted(
+            (seconds, host) for host, seconds in
+            ((host, stats.expected_seconds(fallback)) for host, stats in self._hosts.items())
+            if seconds is not None
+        )
+        return {
+            'hosts': len(self._hosts),
+            'measured_throughput': sum(1 for stats in self._hosts.values() if stats.throughput.value),
+            'fastest': ', '.join(host for _, host in ranked[:3]) or '-',
+        }
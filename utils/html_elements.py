@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parse một phần trang HTML: chỉ giữ các thẻ mà việc trích xuất cần
+(video, source, iframe, a[href], script) trong một lượt duyệt
+"""
+
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional
+from bs4 import BeautifulSoup
+from lxml import etree
+from config import Config
+
+# Các thẻ được giữ lại, mọi thẻ khác chỉ được duyệt qua
+TARGET_TAGS = frozenset(('video', 'source', 'iframe', 'a', 'script'))
+
+# Thuộc tính còn được giữ trong bản rút gọn (chỉ các thuộc tính việc trích xuất đọc)
+COMPACT_ATTRIBUTES = frozenset(('src', 'href'))
+
+class Element:
+    """Một thẻ đã giữ lại (tên và thuộc tính), dùng `get()` như Tag của BeautifulSoup"""
+    
+    __slots__ = ('tag', 'attrs')
+    
+    def __init__(self, tag: str, attrs: Dict[str, str]):
+        self.tag = tag
+        self.attrs = attrs
+    
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Giá trị thuộc tính"""
+        return self.attrs.get(name, default)
+    
+    def __repr__(self) -> str:
+        return f"<{self.tag} {self.attrs}>"
+
+class PageElements:
+    """Các thẻ cần cho trích xuất, theo thứ tự xuất hiện trong trang"""
+    
+    __slots__ = ('videos', 'sources', 'iframes', 'anchors', 'scripts')
+    
+    def __init__(self):
+        self.videos: List[Element] = []
+        self.sources: List[Element] = []
+        self.iframes: List[Element] = []
+        # Chỉ thẻ a có href
+        self.anchors: List[Element] = []
+        # Nội dung các script inline (script rỗng hoặc chỉ có src bị bỏ)
+        self.scripts: List[str] = []
+    
+    def add(self, tag: str, attrs: Dict[str, str]):
+        """Thêm một thẻ (không phải script) vào danh sách tương ứng"""
+        if tag == 'video':
+            self.videos.append(Element(tag, attrs))
+        elif tag == 'source':
+            self.sources.append(Element(tag, attrs))
+        elif tag == 'iframe':
+            self.iframes.append(Element(tag, attrs))
+        elif tag == 'a' and 'href' in attrs:
+            self.anchors.append(Element(tag, attrs))
+    
+    def compact(self, keep_scripts: bool = True) -> 'PageElements':
+        """
+        Bản rút gọn để gửi qua process khác: mỗi thẻ chỉ giữ src/href
+        
+        Args:
+            keep_scripts: Có giữ nội dung script không
+        
+        Returns:
+            PageElements mới
+        """
+        page = PageElements()
+        for name in ('videos', 'sources', 'iframes', 'anchors'):
+            getattr(page, name).extend(
+                Element(element.tag, {key: value for key, value in element.attrs.items()
+                                      if key in COMPACT_ATTRIBUTES})
+                for element in getattr(self, name)
+            )
+        if keep_scripts:
+            page.scripts = list(self.scripts)
+        return page
+    
+    def __len__(self) -> int:
+        return (len(self.videos) + len(self.sources) + len(self.iframes)
+                + len(self.anchors) + len(self.scripts))
+
+class _Collector:
+    """
+    Nhận sự kiện start/data/end của parser và chỉ giữ các thẻ cần thiết
+    
+    Dùng làm parser target của lxml (không dựng cây) và làm phần xử lý
+    sự kiện cho backend html.parser.
+    """
+    
+    def __init__(self):
+        self.page = PageElements()
+        self._script: Optional[List[str]] = None
+    
+    def start(self, tag: str, attrs: Dict[str, str]):
+        if tag not in TARGET_TAGS:
+            return
+        if tag == 'script':
+            self._script = []
+        else:
+            self.page.add(tag, dict(attrs))
+    
+    def data(self, text: str):
+        if self._script is not None:
+            self._script.append(text)
+    
+    def end(self, tag: str):
+        if tag == 'script' and self._script is not None:
+            text = ''.join(self._script)
+            if text:
+                self.page.scripts.append(text)
+            self._script = None
+    
+    def close(self) -> PageElements:
+        return self.page
+
+class _StdlibParser(HTMLParser):
+    """Backend không cần lxml: html.parser của thư viện chuẩn"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.collector = _Collector()
+    
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, {name: value or '' for name, value in attrs})
+    
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+    
+    def handle_data(self, data):
+        self.collector.data(data)
+
+def _parse_lxml(html: str) -> PageElements:
+    """lxml theo sự kiện: libxml2 tokenize, không dựng cây nào"""
+    collector = _Collector()
+    parser = etree.HTMLParser(target=collector, recover=True, no_network=True)
+    parser.feed(html)
+    return parser.close()
+
+def _parse_stdlib(html: str) -> PageElements:
+    """html.parser theo sự kiện (chậm hơn lxml, không có phụ thuộc C)"""
+    parser = _StdlibParser()
+    parser.feed(html)
+    parser.close()
+    return parser.collector.page
+
+def _parse_soup(html: str) -> PageElements:
+    """Cách cũ: dựng cả cây BeautifulSoup rồi tìm từng loại thẻ"""
+    soup = BeautifulSoup(html, 'lxml')
+    page = PageElements()
+    for tag in soup.find_all(('video', 'source', 'iframe', 'a')):
+        page.add(tag.name, dict(tag.attrs))
+    for script in soup.find_all('script'):
+        if script.string:
+            page.scripts.append(str(script.string))
+    return page
+
+ParserBackend = Callable[[str], PageElements]
+
+_backends: Dict[str, ParserBackend] = {
+    'lxml': _parse_lxml,
+    'html.parser': _parse_stdlib,
+    'soup': _parse_soup,
+}
+
+_BUILTIN_BACKENDS = frozenset(_backends)
+
+def register_backend(name: str, backend: ParserBackend):
+    """
+    Đăng ký một backend parse
+    
+    Worker của CpuPool (mode process, spawn) không thừa hưởng bảng này: các
+    backend đăng ký trước khi pool khởi động được đăng ký lại trong từng
+    worker, nên với mode process backend phải là hàm cấp module (pickle được).
+    
+    Args:
+        name: Tên backend (dùng trong HTML_PARSER_BACKEND)
+        backend: Hàm HTML -> PageElements
+    """
+    _backends[name] = backend
+
+def custom_backends() -> Dict[str, ParserBackend]:
+    """Các backend được đăng ký thêm (ngoài lxml, html.parser, soup)"""
+    return {name: backend for name, backend in _backends.items() if name not in _BUILTIN_BACKENDS}
+
+def available_backends() -> List[str]:
+    """Tên các backend đã đăng ký"""
+    return list(_backends)
+
+def parse_elements(html: str, backend: Optional[str] = None) -> PageElements:
+    """
+    Parse trang, chỉ giữ video/source/iframe/a[href]/script
+    
+    Args:
+        html: Nội dung trang
+        backend: Tên backend (None = HTML_PARSER_BACKEND)
+    
+    Returns:
+        PageElements
+    
+    Raises:
+        ValueError: Backend chưa được đăng ký
+    """
+    name = backend or Config.HTML_PARSER_BACKEND
+    parse = _backends.get(name)
+    if parse is None:
+        raise ValueError(f"Backend parse HTML không hợp lệ: {name} (có: {', '.join(_backends)})")
+    return parse(html)
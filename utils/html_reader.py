@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Đọc trang HTML theo luồng: giới hạn dung lượng, bỏ ngay nội dung không phải HTML,
+giải mã dần từng chunk (charset theo header, không có thì theo <meta charset>)
+và dừng sớm khi scraper báo đã đủ link
+"""
+
+import codecs
+import re
+from typing import Callable, Optional
+import aiohttp
+import requests
+
+# Kích thước chunk đọc từ socket
+CHUNK_SIZE = 64 * 1024
+
+# Số ký tự cuối của phần đã đọc được quét lại cùng phần mới (URL nằm vắt qua hai chunk)
+EARLY_STOP_OVERLAP = 2048
+
+# Charset khai báo trong <meta charset> hoặc <meta http-equiv content="...; charset=...">,
+# chỉ tìm trong phần đầu trang khi header không có charset
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_BYTES = 4096
+
+# Content-type được coi là trang (thiếu header cũng được chấp nhận)
+HTML_CONTENT_TYPES = (
+    'text/',
+    'application/xhtml',
+    'application/xml',
+    'application/json',
+    'application/javascript',
+)
+
+# Text mới đọc (kèm EARLY_STOP_OVERLAP ký tự cuối của phần trước) -> True nếu đã đủ link, ngừng đọc
+EnoughCallback = Callable[[str], bool]
+
+class NonHtmlContent(Exception):
+    """Response không phải trang HTML (video, file nhị phân...)"""
+    
+    def __init__(self, url: str, content_type: str, status: int = 200):
+        super().__init__(f"Không phải HTML ({content_type}): {url}")
+        self.url = url
+        self.content_type = content_type
+        self.status = status
+
+class HtmlBody:
+    """Phần body đã đọc (bytes và text giải mã dần)"""
+    
+    __slots__ = ('body', 'text', 'encoding', 'truncated', 'stopped_early')
+    
+    def __init__(self, body: bytes, text: str, encoding: str,
+                 truncated: bool = False, stopped_early: bool = False):
+        self.body = body
+        self.text = text
+        self.encoding = encoding
+        self.truncated = truncated
+        self.stopped_early = stopped_early
+
+def is_html_content_type(content_type: Optional[str]) -> bool:
+    """True nếu content-type có thể là trang (rỗng = không rõ, vẫn đọc)"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return not content_type or content_type.startswith(HTML_CONTENT_TYPES)
+
+def sniff_meta_charset(head: bytes) -> Optional[str]:
+    """Charset khai báo bằng thẻ <meta> trong phần đầu trang (None nếu không có)"""
+    match = META_CHARSET_RE.search(head[:META_CHARSET_BYTES])
+    return match.group(1).decode('ascii', 'ignore') if match else None
+
+class _IncrementalReader:
+    """Gom chunk, giải mã dần và kiểm tra giới hạn/dừng sớm sau mỗi chunk"""
+    
+    def __init__(self, encoding: Optional[str], max_bytes: int, enough: Optional[EnoughCallback]):
+        self.encoding = None
+        self.max_bytes = max_bytes
+        self.enough = enough
+        self._decoder = None
+        if encoding:
+            self._use(encoding)
+        self._chunks = []
+        self._parts = []
+        self._tail = ''
+        self._size = 0
+        self.truncated = False
+        self.stopped_early = False
+    
+    def _use(self, encoding: str) -> bool:
+        """Tạo decoder cho encoding (False nếu Python không biết encoding đó)"""
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            return False
+        self.encoding = encoding
+        return True
+    
+    def _create_decoder(self, head: bytes):
+        """Header không có charset dùng được: theo <meta charset> ở phần đầu trang, không có thì UTF-8"""
+        encoding = sniff_meta_charset(head)
+        if not (encoding and self._use(encoding)):
+            self._use('utf-8')
+    
+    def feed(self, chunk: bytes) -> bool:
+        """Nhận một chunk, trả về False khi cần ngừng đọc"""
+        if self._size + len(chunk) > self.max_bytes:
+            chunk = chunk[:self.max_bytes - self._size]
+            self.truncated = True
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        if self._decoder is None:
+            # Chưa giải mã tới khi có đủ phần đầu trang để tìm <meta charset>
+            if self._size < META_CHARSET_BYTES and not self.truncated:
+                return True
+            chunk = b''.join(self._chunks)
+            self._create_decoder(chunk)
+        
+        piece = self._decoder.decode(chunk)
+        if piece:
+            self._parts.append(piece)
+            if self.enough and not self.truncated:
+                # Chỉ quét phần mới kèm đoạn chồng lấn, không ghép lại cả trang mỗi chunk
+                window = self._tail + piece
+                self._tail = window[-EARLY_STOP_OVERLAP:]
+                if self.enough(window):
+                    self.stopped_early = True
+                    return False
+        return not self.truncated
+    
+    def result(self) -> HtmlBody:
+        """Kết thúc và trả về phần đã đọc"""
+        pending = b''
+        if self._decoder is None:
+            pending = b''.join(self._chunks)
+            self._create_decoder(pending)
+        # Khi dừng giữa chừng, ký tự cuối có thể bị cắt đôi: bỏ phần dở thay vì lỗi
+        self._parts.append(self._decoder.decode(pending, final=not (self.truncated or self.stopped_early)))
+        return HtmlBody(
+            body=b''.join(self._chunks),
+            text=''.join(self._parts),
+            encoding=self.encoding,
+            truncated=self.truncated,
+            stopped_early=self.stopped_early,
+        )
+
+def _check_content_type(url: str, content_type: Optional[str], status: int):
+    """Raise NonHtmlContent trước khi đọc body nếu content-type không phải trang"""
+    if not is_html_content_type(content_type):
+        raise NonHtmlContent(url, content_type, status)
+
+async def read_html(response: aiohttp.ClientResponse, max_bytes: int,
+                    enough: Optional[EnoughCallback] = None) -> HtmlBody:
+    """
+    Đọc body của một aiohttp response theo luồng
+    
+    Args:
+        response: Response (header đã nhận, body chưa đọc)
+        max_bytes: Số bytes tối đa được đọc (phần còn lại bị bỏ)
+        enough: Callback dừng sớm
+    
+    Returns:
+        HtmlBody
+    
+    Raises:
+        NonHtmlContent: Content-type không phải trang, body không được đọc
+    """
+    _check_content_type(str(response.url), response.headers.get('Content-Type'), response.status)
+    reader = _IncrementalReader(response.charset, max_bytes, enough)
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        if not reader.feed(chunk):
+            break
+    return reader.result()
+
+def read_html_sync(response: requests.Response, max_bytes: int,
+                   enough: Optional[EnoughCallback] = None) -> HtmlBody:
+    """
+    Phiên bản blocking của read_html (response của requests với stream=True)
+    
+    Args:
+        response: Response (header đã nhận, body chưa đọc)
+        max_bytes: Số bytes tối đa được đọc
+        enough: Callback dừng sớm
+    
+    Returns:
+        HtmlBody
+    
+    Raises:
+        NonHtmlContent: Content-type không phải trang
+    """
+    _check_content_type(response.url, response.headers.get('Content-Type'), response.status_code)
+    reader = _IncrementalReader(_sync_charset(response), max_bytes, enough)
+    for chunk in response.iter_content(CHUNK_SIZE):
+        if not reader.feed(chunk):
+            break
+    return reader.result()
+
+def _sync_charset(response: requests.Response) -> Optional[str]:
+    """Charset khai báo trong header (không đoán, requests mặc định ISO-8859-1 cho text/*)"""
+    content_type = response.headers.get('Content-Type', '')
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            return value.strip('"\'')
+    return None
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP client dùng chung cho toàn bộ scrapers (connection pool, DNS cache)
+"""
+
+import aiohttp
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, Optional
+from config import Config
+from utils.hedging import RequestHedger
+from utils.host_limiter import HostLimiter
+from utils.page_cache import PageCache
+from utils.single_flight import SingleFlight
+from utils.url_guard import public_connector, public_trace_config
+from utils.ttl_cache import TTLCache
+
+class HttpClient:
+    """
+    Lớp transport HTTP sống suốt vòng đời bot
+    
+    Một `aiohttp.ClientSession` duy nhất (keep-alive pool, DNS cache có TTL,
+    giới hạn kết nối theo host) và một `requests.Session` cho các đường
+    đi blocking. StreamBot sở hữu instance này và truyền vào các scrapers.
+    """
+    
+    def __init__(self, limit: int = None, limit_per_host: int = None,
+                 dns_cache_ttl: int = None, keepalive_timeout: float = None):
+        """
+        Khởi tạo HTTP client
+        
+        Args:
+            limit: Tổng số kết nối tối đa
+            limit_per_host: Số kết nối tối đa cho mỗi host
+            dns_cache_ttl: Thời gian cache DNS (giây)
+            keepalive_timeout: Thời gian giữ kết nối rảnh (giây)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.limit = limit if limit is not None else Config.HTTP_POOL_LIMIT
+        self.limit_per_host = limit_per_host if limit_per_host is not None else Config.HTTP_POOL_LIMIT_PER_HOST
+        self.dns_cache_ttl = dns_cache_ttl if dns_cache_ttl is not None else Config.HTTP_DNS_CACHE_TTL
+        self.keepalive_timeout = keepalive_timeout if keepalive_timeout is not None else Config.HTTP_KEEPALIVE_TIMEOUT
+        
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._sync_session: Optional[requests.Session] = None
+        self._fresh_session: Optional[aiohttp.ClientSession] = None
+        self._public_session: Optional[aiohttp.ClientSession] = None
+        
+        # Gộp các lần tải tài liệu trùng URL đang diễn ra đồng thời
+        self.flights = SingleFlight('documents')
+        
+        # Giới hạn tốc độ + circuit breaker theo host, dùng chung cho mọi lượt tải trang
+        self.limiter = HostLimiter()
+        
+        # Hedge request tải trang bị chậm (tắt mặc định)
+        self.hedger = RequestHedger()
+        
+        # Cache trang gốc trên đĩa (tải lại có điều kiện bằng ETag/Last-Modified)
+        self.page_cache = PageCache()
+        
+        # HTTP status gần nhất của mỗi trang (để biết vì sao trang không có link)
+        self.statuses = TTLCache(1024, 300)
+        
+        self._counters = {
+            'requests': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0,
+        }
+    
+    async def start(self):
+        """Tạo session (gọi trong event loop)"""
+        if not self._session or self._session.closed:
+            self._create_session()
+    
+    def _create_session(self):
+        """Tạo aiohttp session với connector có pooling và DNS cache"""
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._count('requests'))
+        trace_config.on_connection_create_end.append(self._count('connections_created'))
+        trace_config.on_connection_reuseconn.append(self._count('connections_reused'))
+        trace_config.on_dns_cache_hit.append(self._count('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(self._count('dns_cache_misses'))
+        
+        # SSL verification disabled cho một số trang web
+        self._connector = aiohttp.TCPConnector(
+            ssl=False,
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        self._session = aiohttp.ClientSession(
+            connector=self._connector,
+            headers=Config.DEFAULT_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT),
+            trace_configs=[trace_config]
+        )
+        self.logger.info(
+            f"HTTP client sẵn sàng (limit={self.limit}, per_host={self.limit_per_host}, "
+            f"dns_ttl={self.dns_cache_ttl}s)"
+        )
+    
+    async def close(self):
+        """Đóng tất cả kết nối"""
+        if self._session:
+            await self._session.close()
+            self._session = None
+            self._connector = None
+        if self._fresh_session:
+            await self._fresh_session.close()
+            self._fresh_session = None
+        if self._public_session:
+            await self._public_session.close()
+            self._public_session = None
+        if self._sync_session:
+            self._sync_session.close()
+            self._sync_session = None
+        self.page_cache.close()
+    
+    def record_status(self, url: str, status: int):
+        """Ghi HTTP status của lần tải trang gần nhất"""
+        self.statuses.set(url, status)
+    
+    def forget_status(self, url: str):
+        """Bỏ HTTP status đã ghi của URL (trước một lượt tải mới)"""
+        self.statuses.pop(url)
+    
+    def last_status(self, url: str) -> Optional[int]:
+        """HTTP status của lần tải trang gần nhất (None nếu chưa tải hoặc đã quá lâu)"""
+        return self.statuses.get(url)
+    
+    def _count(self, name: str):
+        """Tạo trace callback tăng counter tương ứng"""
+        async def callback(session, trace_config_ctx, params):
+            self._counters[name] += 1
+        return callback
+    
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """aiohttp session dùng chung"""
+        if not self._session or self._session.closed:
+            self._create_session()
+        return self._session
+    
+    @property
+    def fresh_session(self) -> aiohttp.ClientSession:
+        """
+        Session không giữ kết nối (mỗi request một kết nối mới)
+        
+        Dùng cho request hedge để không rơi vào đúng kết nối keep-alive đang treo.
+        """
+        if not self._fresh_session or self._fresh_session.closed:
+            self._fresh_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(ssl=False, force_close=True),
+                headers=Config.DEFAULT_HEADERS,
+                timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT)
+            )
+        return self._fresh_session
+    
+    @property
+    def public_session(self) -> aiohttp.ClientSession:
+        """
+        Session chỉ kết nối tới địa chỉ công khai
+        
+        Dùng cho URL do người dùng/playlist bên ngoài quyết định (tải HLS), để
+        không bị lợi dụng đọc localhost, metadata cloud hay mạng nội bộ.
+        """
+        if not self._public_session or self._public_session.closed:
+            self._public_session = aiohttp.ClientSession(
+                connector=public_connector(
+                    ssl=False,
+                    limit=self.limit,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                    keepalive_timeout=self.keepalive_timeout
+                ),
+                headers=Config.DEFAULT_HEADERS,
+                timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT),
+                trace_configs=[public_trace_config()]
+            )
+        return self._public_session
+    
+    @property
+    def sync_session(self) -> requests.Session:
+        """requests session dùng chung cho các đường đi blocking"""
+        if not self._sync_session:
+            adapter = HTTPAdapter(
+                pool_connections=self.limit_per_host,
+                pool_maxsize=self.limit_per_host
+            )
+            self._sync_session = requests.Session()
+            self._sync_session.verify = False
+            self._sync_session.headers.update(Config.DEFAULT_HEADERS)
+            self._sync_session.mount('http://', adapter)
+            self._sync_session.mount('https://', adapter)
+        return self._sync_session
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Thống kê connection pool
+        
+        Returns:
+            Dict gồm số kết nối open/idle/in_use, created/reused và tỉ lệ reuse
+        """
+        idle = 0
+        in_use = 0
+        if self._connector is not None:
+            idle = sum(len(conns) for conns in self._connector._conns.values())
+            in_use = len(self._connector._acquired)
+        
+        created = self._counters['connections_created']
+        reused = self._counters['connections_reused']
+        total = created + reused
+        
+        return {
+            'open': idle + in_use,
+            'idle': idle,
+            'in_use': in_use,
+            **self._counters,
+            'reuse_rate': round(reused / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hàng đợi job có giới hạn với số worker cố định
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+from config import Config
+
+PositionCallback = Callable[[int], Optional[Awaitable[None]]]
+
+class QueueFullError(Exception):
+    """Hàng đợi đã đầy, job bị từ chối"""
+
+class _Job:
+    """Một job đang chờ hoặc đang chạy"""
+    
+    __slots__ = ('func', 'future', 'on_position', 'position', 'enqueued_at', 'context')
+    
+    def __init__(self, func: Callable[[], Awaitable[Any]], future: asyncio.Future,
+                 on_position: Optional[PositionCallback]):
+        self.func = func
+        self.future = future
+        self.on_position = on_position
+        self.position: Optional[int] = None
+        self.enqueued_at = time.monotonic()
+        # Context của người gửi (vd: deadline của yêu cầu) để job chạy trong đó
+        self.context = contextvars.copy_context()
+
+def _summary(samples: Deque[float]) -> Dict[str, float]:
+    """Trung bình và p95 (mili giây) của các mẫu gần đây"""
+    if not samples:
+        return {'avg_ms': 0.0, 'p95_ms': 0.0}
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        'avg_ms': round(sum(ordered) / len(ordered) * 1000, 1),
+        'p95_ms': round(p95 * 1000, 1),
+    }
+
+class JobQueue:
+    """
+    Hàng đợi FIFO đứng giữa handlers và scrapers
+    
+    `workers` job chạy đồng thời, tối đa `maxsize` job chờ; job vượt quá bị
+    từ chối ngay bằng QueueFullError thay vì dồn thêm request ra ngoài.
+    Job đang chờ được báo vị trí (1 = kế tiếp, 0 = bắt đầu chạy) mỗi khi
+    vị trí thay đổi.
+    """
+    
+    def __init__(self, workers: int = None, maxsize: int = None, samples: int = 1000):
+        """
+        Args:
+            workers: Số job chạy đồng thời
+            maxsize: Số job chờ tối đa
+            samples: Số mẫu thời gian giữ lại để tính thống kê
+        """
+        self.logger = logging.getLogger(__name__)
+        self.workers = workers if workers is not None else Config.EXTRACTION_WORKERS
+        self.maxsize = maxsize if maxsize is not None else Config.EXTRACTION_QUEUE_SIZE
+        
+        self._waiting: Deque[_Job] = deque()
+        self._condition: Optional[asyncio.Condition] = None
+        self._worker_tasks: Set[asyncio.Task] = set()
+        self._callback_tasks: Set[asyncio.Task] = set()
+        self._running = 0
+        
+        self._wait_times: Deque[float] = deque(maxlen=samples)
+        self._service_times: Deque[float] = deque(maxlen=samples)
+        self._counters = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'abandoned': 0,
+            'max_depth': 0,
+        }
+    
+    @property
+    def depth(self) -> int:
+        """Số job đang chờ"""
+        return len(self._waiting)
+    
+    def _start(self):
+        """Tạo worker (lần đầu có job, trong event loop)"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        while len(self._worker_tasks) < self.workers:
+            task = asyncio.create_task(self._worker())
+            self._worker_tasks.add(task)
+            task.add_done_callback(self._worker_tasks.discard)
+    
+    async def submit(self, func: Callable[[], Awaitable[Any]],
+                     on_position: Optional[PositionCallback] = None) -> Any:
+        """
+        Đưa job vào hàng đợi và chờ kết quả
+        
+        Args:
+            func: Coroutine function không tham số
+            on_position: Callback (có thể là coroutine) nhận vị trí trong hàng đợi
+        
+        Returns:
+            Kết quả của func
+        
+        Raises:
+            QueueFullError: Hàng đợi đã đầy
+        """
+        self._start()
+        if len(self._waiting) - self._free_workers() >= self.maxsize:
+            self._counters['rejected'] += 1
+            raise QueueFullError(f"Hàng đợi đầy ({self.maxsize} job đang chờ)")
+        
+        job = _Job(func, asyncio.get_running_loop().create_future(), on_position)
+        async with self._condition:
+            self._waiting.append(job)
+            self._counters['submitted'] += 1
+            self._counters['max_depth'] = max(self._counters['max_depth'], len(self._waiting))
+            self._notify_positions()
+            self._condition.notify()
+        
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            # Người gửi bỏ đi khi job còn chờ: không cần chạy nữa
+            if job in self._waiting:
+                self._waiting.remove(job)
+                self._counters['abandoned'] += 1
+                self._notify_positions()
+            raise
+    
+    async def _worker(self):
+        """Lấy job theo thứ tự FIFO và chạy"""
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(lambda: self._waiting)
+                job = self._waiting.popleft()
+            
+            self._running += 1
+            started = time.monotonic()
+            self._wait_times.append(started - job.enqueued_at)
+            self._notify(job, 0)
+            self._notify_positions()
+            
+            try:
+                result = await job.context.run(asyncio.ensure_future, job.func())
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                self._counters['failed'] += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self._counters['completed'] += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._running -= 1
+                self._service_times.append(time.monotonic() - started)
+    
+    def _free_workers(self) -> int:
+        """Số worker chưa chạy job nào"""
+        return max(0, self.workers - self._running)
+    
+    def _notify_positions(self):
+        """
+        Cập nhật vị trí cho các job còn chờ
+        
+        Job sẽ được worker đang rảnh nhận ngay thì không bị báo vị trí.
+        """
+        free_workers = self._free_workers()
+        for index, job in enumerate(self._waiting, 1):
+            if index > free_workers:
+                self._notify(job, index - free_workers)
+    
+    def _notify(self, job: _Job, position: int):
+        """Gọi callback vị trí nếu vị trí đã đổi (đã từng báo thì mới báo 0)"""
+        if job.on_position is None or job.position == position:
+            return
+        if position == 0 and job.position is None:
+            return
+        job.position = position
+        
+        try:
+            result = job.on_position(position)
+        except Exception as e:
+            self.logger.warning(f"Lỗi callback vị trí hàng đợi: {e}")
+            return
+        if asyncio.iscoroutine(result):
+            task = asyncio.create_task(result)
+            self._callback_tasks.add(task)
+            task.add_done_callback(self._callback_tasks.discard)
+    
+    def close(self):
+        """Dừng các worker"""
+        for task in list(self._worker_tasks):
+            task.cancel()
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê hàng đợi
+        
+        Returns:
+            Dict gồm độ sâu, số job đang chạy, các counter và thời gian chờ/xử lý
+        """
+        wait = _summary(self._wait_times)
+        service = _summary(self._service_times)
+        return {
+            'workers': self.workers,
+            'depth': len(self._waiting),
+            'running': self._running,
+            **self._counters,
+            'wait_avg_ms': wait['avg_ms'],
+            'wait_p95_ms': wait['p95_ms'],
+            'service_avg_ms': service['avg_ms'],
+            'service_p95_ms': service['p95_ms'],
+        }
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Theo dõi live playlist HLS: poll theo TARGETDURATION, chỉ parse phần segment mới
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional
+from urllib.parse import urljoin
+import aiohttp
+from config import Config
+from utils.http_client import HttpClient
+from utils.m3u8_parser import M3U8Error, M3U8Parser, Playlist, Segment
+
+# Tag trong vùng segment đã thấy vẫn áp dụng cho segment mới phía sau
+CARRIED_TAGS = ('#EXT-X-KEY', '#EXT-X-MAP')
+
+# Tag gắn với segment: dòng đầu tiên có một trong các tag này (hoặc URI) kết thúc header
+SEGMENT_TAGS = frozenset((
+    '#EXTINF', '#EXT-X-KEY', '#EXT-X-MAP', '#EXT-X-BYTERANGE',
+    '#EXT-X-DISCONTINUITY', '#EXT-X-PROGRAM-DATE-TIME',
+))
+
+class LivePlaylistTracker:
+    """
+    Theo dõi một media playlist đang phát trực tiếp
+    
+    Mỗi lần poll, header được đọc tới segment đầu tiên để lấy MEDIA-SEQUENCE;
+    các segment đã thấy chỉ được đếm (không parse), phần đuôi mới được đưa vào
+    M3U8Parser. Segment gần nhất nằm trong ring buffer có kích thước cố định.
+    Playlist không đổi (304 hoặc cùng nội dung) không tốn công parse; không
+    có segment mới quá `stall_factor` × TARGETDURATION thì coi là stall.
+    """
+    
+    def __init__(self, url: str, http_client: Optional[HttpClient] = None,
+                 window: int = None, stall_factor: float = None):
+        """
+        Args:
+            url: URL media playlist
+            http_client: HTTP client dùng chung
+            window: Số segment gần nhất được giữ
+            stall_factor: Số lần TARGETDURATION không có segment mới thì coi là stall
+        """
+        self.logger = logging.getLogger(__name__)
+        self.url = url
+        self.http_client = http_client
+        self.segments: Deque[Segment] = deque(maxlen=window if window is not None else Config.LIVE_WINDOW)
+        self.stall_factor = stall_factor if stall_factor is not None else Config.LIVE_STALL_FACTOR
+        
+        self.target_duration: Optional[float] = None
+        self.last_sequence: Optional[int] = None
+        self.endlist = False
+        self.last_new_segment_at = time.monotonic()
+        self._last_body: Optional[bytes] = None
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._counters = {
+            'polls': 0,
+            'unchanged': 0,
+            'new_segments': 0,
+            'lines_parsed': 0,
+            'lines_skipped': 0,
+            'gaps': 0,
+            'resets': 0,
+        }
+    
+    @property
+    def stalled(self) -> bool:
+        """Không có segment mới quá lâu (chưa biết TARGETDURATION thì chưa xét)"""
+        if self.endlist or self.target_duration is None:
+            return False
+        return time.monotonic() - self.last_new_segment_at > self.stall_factor * self.target_duration
+    
+    async def poll(self, session: Optional[aiohttp.ClientSession] = None) -> List[Segment]:
+        """
+        Tải playlist một lần và cập nhật trạng thái
+        
+        Args:
+            session: aiohttp session (None = session của http_client)
+        
+        Returns:
+            Các segment mới kể từ lần poll trước
+        
+        Raises:
+            aiohttp.ClientError: Không tải được playlist
+            M3U8Error: Nội dung không phải media playlist
+        """
+        session = session or self.http_client.session
+        self._counters['polls'] += 1
+        
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+        
+        async with session.get(self.url, headers=headers) as response:
+            if response.status == 304:
+                self._counters['unchanged'] += 1
+                return []
+            response.raise_for_status()
+            body = await response.read()
+            self.url = str(response.url)
+            self._etag = response.headers.get('ETag')
+            self._last_modified = response.headers.get('Last-Modified')
+        
+        if body == self._last_body:
+            self._counters['unchanged'] += 1
+            return []
+        self._last_body = body
+        return self.apply(body)
+    
+    def apply(self, body: bytes) -> List[Segment]:
+        """
+        Cập nhật từ nội dung playlist vừa tải
+        
+        Args:
+            body: Nội dung playlist
+        
+        Returns:
+            Các segment mới
+        """
+        lines = body.decode('utf-8', errors='replace').split('\n')
+        if lines[0].strip().lstrip('\ufeff') != '#EXTM3U':
+            raise M3U8Error("Thiếu header #EXTM3U")
+        
+        # Header: tới segment đầu tiên
+        media_sequence = 0
+        start = len(lines)
+        for index, line in enumerate(lines):
+            line = line.strip()
+            if line and (line[0] != '#' or line.partition(':')[0] in SEGMENT_TAGS):
+                start = index
+                break
+            if line.startswith('#EXT-X-MEDIA-SEQUENCE:'):
+                media_sequence = int(line[22:])
+            elif line.startswith('#EXT-X-TARGETDURATION:'):
+                self.target_duration = float(line[22:])
+            elif line.startswith('#EXT-X-STREAM-INF'):
+                raise M3U8Error("Master playlist, cần URL của media playlist")
+        
+        # ENDLIST luôn nằm cuối, không cần parse cả playlist để biết
+        tail = body.rstrip()[-32:]
+        self.endlist = tail.endswith(b'#EXT-X-ENDLIST')
+        
+        skip = 0
+        if self.last_sequence is not None:
+            skip = self.last_sequence + 1 - media_sequence
+            if skip < 0:
+                # Poll chậm hơn cửa sổ của server, đã lỡ một số segment
+                self._counters['gaps'] += 1
+                skip = 0
+        
+        # Đếm qua các segment đã thấy, chỉ giữ KEY/MAP còn hiệu lực
+        carried: Dict[str, str] = {}
+        position = start
+        remaining = skip
+        while remaining and position < len(lines):
+            line = lines[position].strip()
+            position += 1
+            if not line:
+                continue
+            if line[0] != '#':
+                remaining -= 1
+            elif line.startswith(CARRIED_TAGS):
+                carried[line.partition(':')[0]] = line
+        if remaining:
+            # Sequence lùi lại (stream khởi động lại): bắt đầu lại từ đầu
+            self._counters['resets'] += 1
+            self.segments.clear()
+            carried, position, skip = {}, start, 0
+        self._counters['lines_skipped'] += position - start
+        
+        playlist = Playlist(self.url)
+        playlist.segments.first_sequence = media_sequence + skip
+        parser = M3U8Parser(playlist=playlist)
+        new_lines = list(carried.values()) + lines[position:]
+        parser.feed_lines(new_lines)
+        parser.close()
+        self._counters['lines_parsed'] += len(new_lines)
+        
+        new_segments = list(playlist.segments)
+        if new_segments:
+            self.segments.extend(new_segments)
+            self.last_sequence = new_segments[-1].sequence
+            self.last_new_segment_at = time.monotonic()
+            self._counters['new_segments'] += len(new_segments)
+        return new_segments
+    
+    def absolute(self, segment: Segment) -> str:
+        """URL tuyệt đối của một segment"""
+        return urljoin(self.url, segment.uri)
+    
+    def reload_interval(self, changed: bool) -> float:
+        """
+        Thời gian chờ trước lần poll kế tiếp (theo RFC 8216: TARGETDURATION nếu
+        playlist vừa thay đổi, một nửa nếu không)
+        """
+        target = self.target_duration or Config.LIVE_DEFAULT_TARGET_DURATION
+        return target if changed else target / 2
+    
+    async def follow(self, session: Optional[aiohttp.ClientSession] = None) -> AsyncIterator[List[Segment]]:
+        """
+        Poll liên tục, trả về từng lô segment mới
+        
+        Dừng khi gặp ENDLIST hoặc stall.
+        
+        Args:
+            session: aiohttp session (None = session của http_client)
+        """
+        while True:
+            new_segments = await self.poll(session)
+            if new_segments:
+                yield new_segments
+            if self.endlist:
+                self.logger.info(f"Live playlist đã kết thúc (ENDLIST): {self.url}")
+                return
+            if self.stalled:
+                self.logger.warning(f"Live playlist bị stall (không có segment mới): {self.url}")
+                return
+            await asyncio.sleep(self.reload_interval(bool(new_segments)))
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm số lần poll, số segment mới, số dòng đã parse/bỏ qua và trạng thái
+        """
+        return {
+            **self._counters,
+            'window': len(self.segments),
+            'last_sequence': self.last_sequence,
+            'endlist': self.endlist,
+            'stalled': self.stalled,
+        }
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Đo thời gian event loop bị chặn (độ trễ của một timer định kỳ)
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+from config import Config
+
+class LoopLagMonitor:
+    """
+    Task nền ngủ `interval` giây rồi đo xem thực tế bị trễ bao lâu
+    
+    Độ trễ vượt `threshold` được tính là loop bị chặn (một callback chạy quá
+    lâu, ví dụ parse trang lớn inline); tổng thời gian bị chặn và độ trễ lớn
+    nhất cho biết các lệnh như /start phải chờ bao lâu.
+    """
+    
+    def __init__(self, interval: float = None, threshold: float = None, history: int = 600):
+        """
+        Args:
+            interval: Chu kỳ lấy mẫu (giây)
+            threshold: Độ trễ tối thiểu để tính là bị chặn (giây)
+            history: Số mẫu gần đây giữ lại để tính p99
+        """
+        self.logger = logging.getLogger(__name__)
+        self.interval = interval if interval is not None else Config.LOOP_MONITOR_INTERVAL
+        self.threshold = threshold if threshold is not None else Config.LOOP_BLOCK_THRESHOLD
+        self._samples: Deque[float] = deque(maxlen=history)
+        self._task: Optional[asyncio.Task] = None
+        self.blocked_seconds = 0.0
+        self.blocks = 0
+        self.max_lag = 0.0
+    
+    def start(self):
+        """Bắt đầu đo (gọi trong event loop)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def stop(self):
+        """Dừng đo"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.record(time.monotonic() - started - self.interval)
+    
+    def record(self, lag: float):
+        """Ghi một mẫu độ trễ (giây)"""
+        lag = max(0.0, lag)
+        self._samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.threshold:
+            self.blocks += 1
+            self.blocked_seconds += lag
+            self.logger.debug(f"Event loop bị chặn {lag * 1000:.0f} ms")
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm số lần bị chặn, tổng thời gian bị chặn, độ trễ lớn nhất và p99 gần đây
+        """
+        p99 = 0.0
+        if self._samples:
+            ordered = sorted(self._samples)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return {
+            'blocks': self.blocks,
+            'blocked_seconds': round(self.blocked_seconds, 3),
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+            'p99_lag_ms': round(p99 * 1000, 1),
+        }
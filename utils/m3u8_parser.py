@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parser M3U8 (HLS) dạng streaming: nhận từng chunk bytes, parse theo dòng
+
+Hỗ trợ master playlist (EXT-X-STREAM-INF, EXT-X-MEDIA) và media playlist
+(EXTINF, EXT-X-KEY, EXT-X-BYTERANGE, EXT-X-MAP, discontinuity...). Danh sách
+segment lưu dạng bảng cột (array) thay vì một object cho mỗi segment, nên
+playlist VOD hàng chục nghìn segment vẫn gọn (xem benchmarks/bench_m3u8_parser.py).
+"""
+
+import re
+from array import array
+from typing import AsyncIterable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urljoin
+
+_ATTRIBUTE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+# Số đầu tiên của #EXTINF (phía sau có thể là attribute kiểu IPTV: -1 tvg-id="..." ,title)
+_INFINITY = float('inf')
+_EXTINF_DURATION = re.compile(r'\s*(-?(?:\d+(?:\.\d*)?|\.\d+))(?=[\s,]|$)')
+
+class M3U8Error(ValueError):
+    """Nội dung không phải playlist M3U8 hợp lệ"""
+
+def parse_attributes(value: str) -> Dict[str, str]:
+    """
+    Parse attribute list của một tag (vd: BANDWIDTH=800000,CODECS="avc1,mp4a")
+    
+    Args:
+        value: Phần sau dấu ':' của tag
+    
+    Returns:
+        Dict tên -> giá trị (đã bỏ dấu ngoặc kép)
+    """
+    return {name: raw[1:-1] if raw.startswith('"') else raw
+            for name, raw in _ATTRIBUTE.findall(value)}
+
+def _parse_byterange(value: str) -> Tuple[int, Optional[int]]:
+    """'<length>[@<offset>]' -> (length, offset hoặc None)"""
+    length, _, offset = value.partition('@')
+    return int(length), int(offset) if offset else None
+
+def _parse_extinf(value: str) -> Tuple[float, Optional[str]]:
+    """
+    '<duration>[ attributes],[title]' -> (duration, title hoặc None)
+    
+    Duration âm (-1: không rõ, hay gặp ở playlist IPTV) tính là 0.
+    
+    Raises:
+        M3U8Error: Không bắt đầu bằng một số
+    """
+    duration, _, title = value.partition(',')
+    try:
+        seconds = float(duration)
+    except ValueError:
+        pass
+    else:
+        # Dạng thường gặp '<số>,<title>' (so sánh thay cho isfinite/max cho nhanh, NaN trượt cả hai)
+        if 0.0 <= seconds < _INFINITY:
+            return seconds, title or None
+        if -_INFINITY < seconds < 0.0:
+            return 0.0, title or None
+        raise M3U8Error(f"#EXTINF không hợp lệ: {value}")
+    
+    match = _EXTINF_DURATION.match(value)
+    if match is None:
+        raise M3U8Error(f"#EXTINF không hợp lệ: {value}")
+    rest = value[match.end():]
+    if '"' not in rest:
+        title = rest.partition(',')[2]
+    else:
+        # Dấu phẩy trong attribute có ngoặc kép không phải dấu tách title
+        title, quoted = '', False
+        for index, char in enumerate(rest):
+            if char == '"':
+                quoted = not quoted
+            elif char == ',' and not quoted:
+                title = rest[index + 1:]
+                break
+    return max(0.0, float(match.group(1))), title or None
+
+class Variant:
+    """Một variant trong master playlist (EXT-X-STREAM-INF)"""
+    
+    __slots__ = ('uri', 'bandwidth', 'average_bandwidth', 'resolution', 'codecs',
+                 'frame_rate', 'audio', 'video', 'subtitles')
+    
+    def __init__(self, uri: str, attributes: Dict[str, str]):
+        self.uri = uri
+        self.bandwidth = int(attributes.get('BANDWIDTH') or 0)
+        average = attributes.get('AVERAGE-BANDWIDTH')
+        self.average_bandwidth = int(average) if average else None
+        self.resolution: Optional[Tuple[int, int]] = None
+        resolution = attributes.get('RESOLUTION')
+        if resolution and 'x' in resolution:
+            width, _, height = resolution.lower().partition('x')
+            if width.isdigit() and height.isdigit():
+                self.resolution = (int(width), int(height))
+        self.codecs = attributes.get('CODECS')
+        frame_rate = attributes.get('FRAME-RATE')
+        self.frame_rate = float(frame_rate) if frame_rate else None
+        self.audio = attributes.get('AUDIO')
+        self.video = attributes.get('VIDEO')
+        self.subtitles = attributes.get('SUBTITLES')
+    
+    @property
+    def height(self) -> Optional[int]:
+        """Chiều cao khung hình (None nếu playlist không ghi RESOLUTION)"""
+        return self.resolution[1] if self.resolution else None
+    
+    def __repr__(self):
+        return f"Variant(bandwidth={self.bandwidth}, resolution={self.resolution}, uri={self.uri!r})"
+
+class Media:
+    """Một rendition phụ (EXT-X-MEDIA: audio, phụ đề...)"""
+    
+    __slots__ = ('type', 'group_id', 'name', 'language', 'uri', 'default', 'autoselect')
+    
+    def __init__(self, attributes: Dict[str, str], uri: Optional[str]):
+        self.type = attributes.get('TYPE')
+        self.group_id = attributes.get('GROUP-ID')
+        self.name = attributes.get('NAME')
+        self.language = attributes.get('LANGUAGE')
+        self.uri = uri
+        self.default = attributes.get('DEFAULT') == 'YES'
+        self.autoselect = attributes.get('AUTOSELECT') == 'YES'
+    
+    def __repr__(self):
+        return f"Media(type={self.type}, group_id={self.group_id!r}, name={self.name!r})"
+
+class Key:
+    """Khoá mã hoá (EXT-X-KEY)"""
+    
+    __slots__ = ('method', 'uri', 'iv', 'keyformat')
+    
+    def __init__(self, attributes: Dict[str, str], uri: Optional[str]):
+        self.method = attributes.get('METHOD', 'NONE')
+        self.uri = uri
+        iv = attributes.get('IV')
+        self.iv = bytes.fromhex(iv[2:]) if iv and iv[:2].lower() == '0x' else None
+        self.keyformat = attributes.get('KEYFORMAT', 'identity')
+    
+    def __repr__(self):
+        return f"Key(method={self.method}, uri={self.uri!r})"
+
+class InitSection:
+    """Media initialization section (EXT-X-MAP)"""
+    
+    __slots__ = ('uri', 'byterange')
+    
+    def __init__(self, uri: str, byterange: Optional[Tuple[int, int]]):
+        self.uri = uri
+        self.byterange = byterange
+    
+    def __repr__(self):
+        return f"InitSection(uri={self.uri!r}, byterange={self.byterange})"
+
+class Segment(NamedTuple):
+    """Một dòng của SegmentTable (chỉ tạo khi được truy cập)"""
+    uri: str
+    duration: float
+    sequence: int
+    byterange: Optional[Tuple[int, int]]
+    key: Optional[Key]
+    init_section: Optional[InitSection]
+    discontinuity: bool
+    title: Optional[str]
+
+class SegmentTable:
+    """
+    Danh sách segment lưu theo cột
+    
+    Mỗi thuộc tính là một array kiểu số (duration, byterange, chỉ số key/map,
+    cờ discontinuity); key/map được lưu một lần và segment chỉ giữ chỉ số.
+    Title (hiếm dùng) nằm trong dict thưa.
+    """
+    
+    __slots__ = ('uris', 'durations', 'range_lengths', 'range_offsets',
+                 'key_indexes', 'map_indexes', 'discontinuities', 'titles',
+                 'keys', 'init_sections', 'first_sequence')
+    
+    def __init__(self, first_sequence: int = 0):
+        self.uris: List[str] = []
+        self.durations = array('d')
+        self.range_lengths = array('q')
+        self.range_offsets = array('q')
+        self.key_indexes = array('i')
+        self.map_indexes = array('i')
+        self.discontinuities = array('b')
+        self.titles: Dict[int, str] = {}
+        self.keys: List[Key] = []
+        self.init_sections: List[InitSection] = []
+        self.first_sequence = first_sequence
+    
+    def append(self, uri: str, duration: float, byterange: Optional[Tuple[int, int]],
+               key_index: int, map_index: int, discontinuity: bool, title: Optional[str]):
+        """Thêm một segment (-1 = không có key/map/byterange)"""
+        if title:
+            self.titles[len(self.uris)] = title
+        self.uris.append(uri)
+        self.durations.append(duration)
+        if byterange:
+            self.range_lengths.append(byterange[0])
+            self.range_offsets.append(byterange[1])
+        else:
+            self.range_lengths.append(-1)
+            self.range_offsets.append(-1)
+        self.key_indexes.append(key_index)
+        self.map_indexes.append(map_index)
+        self.discontinuities.append(1 if discontinuity else 0)
+    
+    def __len__(self) -> int:
+        return len(self.uris)
+    
+    def __getitem__(self, index: int) -> Segment:
+        if index < 0:
+            index += len(self.uris)
+        if not 0 <= index < len(self.uris):
+            raise IndexError(index)
+        key_index = self.key_indexes[index]
+        map_index = self.map_indexes[index]
+        length = self.range_lengths[index]
+        return Segment(
+            uri=self.uris[index],
+            duration=self.durations[index],
+            sequence=self.first_sequence + index,
+            byterange=(length, self.range_offsets[index]) if length >= 0 else None,
+            key=self.keys[key_index] if key_index >= 0 else None,
+            init_section=self.init_sections[map_index] if map_index >= 0 else None,
+            discontinuity=bool(self.discontinuities[index]),
+            title=self.titles.get(index),
+        )
+    
+    def __iter__(self) -> Iterator[Segment]:
+        for index in range(len(self.uris)):
+            yield self[index]
+    
+    @property
+    def total_duration(self) -> float:
+        """Tổng thời lượng (giây)"""
+        return sum(self.durations)
+
+class Playlist:
+    """Kết quả parse một playlist (master hoặc media)"""
+    
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = base_url
+        self.version: Optional[int] = None
+        self.is_master = False
+        self.independent_segments = False
+        # Master playlist
+        self.variants: List[Variant] = []
+        self.media: List[Media] = []
+        # Media playlist
+        self.target_duration: Optional[float] = None
+        self.media_sequence = 0
+        self.discontinuity_sequence = 0
+        self.playlist_type: Optional[str] = None
+        self.endlist = False
+        self.segments = SegmentTable()
+    
+    @property
+    def keys(self) -> List[Key]:
+        """Các EXT-X-KEY khác nhau trong playlist"""
+        return self.segments.keys
+    
+    @property
+    def init_sections(self) -> List[InitSection]:
+        """Các EXT-X-MAP khác nhau trong playlist"""
+        return self.segments.init_sections
+    
+    @property
+    def total_duration(self) -> float:
+        """Tổng thời lượng các segment (giây)"""
+        return self.segments.total_duration
+    
+    def absolute(self, uri: str) -> str:
+        """URL tuyệt đối của một URI trong playlist"""
+        return urljoin(self.base_url, uri) if self.base_url else uri
+    
+    def segment_url(self, index: int) -> str:
+        """URL tuyệt đối của segment thứ `index`"""
+        return self.absolute(self.segments.uris[index])
+
+class M3U8Parser:
+    """
+    Parser nhận dữ liệu từng phần
+    
+    Gọi `feed()` với từng chunk bytes khi tải về, rồi `close()` để lấy
+    Playlist; chỉ phần dòng chưa trọn vẹn được giữ lại giữa các chunk.
+    Có thể gọi `feed_line()` trực tiếp khi đã có sẵn từng dòng.
+    """
+    
+    def __init__(self, base_url: Optional[str] = None, playlist: Optional[Playlist] = None):
+        """
+        Args:
+            base_url: URL của playlist (để tính URL tuyệt đối)
+            playlist: Playlist có sẵn để parse tiếp (vd: phần mới của live playlist)
+        """
+        self.playlist = playlist if playlist is not None else Playlist(base_url)
+        self._buffer = b''
+        self._started = playlist is not None
+        
+        # Trạng thái chờ cho segment/variant kế tiếp
+        self._pending_duration: Optional[float] = None
+        self._pending_title: Optional[str] = None
+        self._pending_byterange: Optional[Tuple[int, Optional[int]]] = None
+        self._pending_variant: Optional[Dict[str, str]] = None
+        self._discontinuity = False
+        table = self.playlist.segments
+        self._key_index = table.key_indexes[-1] if len(table) else -1
+        self._map_index = table.map_indexes[-1] if len(table) else -1
+        self._next_offset: Dict[str, int] = {}
+    
+    def feed(self, chunk: bytes):
+        """
+        Parse thêm một chunk
+        
+        Args:
+            chunk: Bytes tiếp theo của playlist
+        """
+        data = self._buffer + chunk if self._buffer else chunk
+        end = data.rfind(b'\n')
+        if end == -1:
+            self._buffer = data
+            return
+        self._buffer = data[end + 1:]
+        # Ký tự nhiều byte không bao giờ chứa b'\n' nên decode cả đoạn một lần là an toàn
+        self.feed_lines(data[:end].decode('utf-8', errors='replace').split('\n'))
+    
+    def close(self) -> Playlist:
+        """
+        Kết thúc dữ liệu
+        
+        Returns:
+            Playlist đã parse
+        
+        Raises:
+            M3U8Error: Không có header #EXTM3U
+        """
+        if self._buffer:
+            self.feed_line(self._buffer.decode('utf-8', errors='replace'))
+            self._buffer = b''
+        if not self._started:
+            raise M3U8Error("Thiếu header #EXTM3U")
+        return self.playlist
+    
+    def feed_line(self, line: str):
+        """Parse một dòng"""
+        self.feed_lines((line,))
+    
+    def feed_lines(self, lines: Iterable[str]):
+        """
+        Parse nhiều dòng đã decode
+        
+        Args:
+            lines: Các dòng (có thể còn '\r' hoặc khoảng trắng)
+        """
+        tags = self._TAGS
+        parse_extinf = _parse_extinf
+        on_uri = self._on_uri
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            
+            if not self._started:
+                if line.lstrip('\ufeff') != '#EXTM3U':
+                    raise M3U8Error("Thiếu header #EXTM3U")
+                self._started = True
+                continue
+            
+            if line[0] != '#':
+                on_uri(line)
+                continue
+            
+            tag, _, value = line.partition(':')
+            if tag == '#EXTINF':
+                # Tag phổ biến nhất, xử lý ngay tại chỗ
+                self._pending_duration, self._pending_title = parse_extinf(value)
+                continue
+            
+            handler = tags.get(tag)
+            if handler is not None:
+                try:
+                    handler(self, value)
+                except M3U8Error:
+                    raise
+                except ValueError as e:
+                    raise M3U8Error(f"Giá trị không hợp lệ ở {tag}: {value}") from e
+    
+    def _on_uri(self, uri: str):
+        playlist = self.playlist
+        if self._pending_variant is not None:
+            playlist.is_master = True
+            playlist.variants.append(Variant(playlist.absolute(uri), self._pending_variant))
+            self._pending_variant = None
+            return
+        
+        byterange = None
+        if self._pending_byterange is not None:
+            length, offset = self._pending_byterange
+            if offset is None:
+                offset = self._next_offset.get(uri, 0)
+            self._next_offset[uri] = offset + length
+            byterange = (length, offset)
+        
+        playlist.segments.append(
+            uri, self._pending_duration or 0.0, byterange,
+            self._key_index, self._map_index, self._discontinuity, self._pending_title
+        )
+        self._pending_duration = None
+        self._pending_title = None
+        self._pending_byterange = None
+        self._discontinuity = False
+    
+    def _on_stream_inf(self, value: str):
+        self._pending_variant = parse_attributes(value)
+    
+    def _on_media(self, value: str):
+        attributes = parse_attributes(value)
+        uri = attributes.get('URI')
+        self.playlist.is_master = True
+        self.playlist.media.append(Media(attributes, self.playlist.absolute(uri) if uri else None))
+    
+    def _on_key(self, value: str):
+        attributes = parse_attributes(value)
+        if attributes.get('METHOD', 'NONE') == 'NONE':
+            self._key_index = -1
+            return
+        uri = attributes.get('URI')
+        keys = self.playlist.segments.keys
+        keys.append(Key(attributes, self.playlist.absolute(uri) if uri else None))
+        self._key_index = len(keys) - 1
+    
+    def _on_map(self, value: str):
+        attributes = parse_attributes(value)
+        byterange = None
+        if attributes.get('BYTERANGE'):
+            length, offset = _parse_byterange(attributes['BYTERANGE'])
+            byterange = (length, offset or 0)
+        sections = self.playlist.segments.init_sections
+        sections.append(InitSection(self.playlist.absolute(attributes.get('URI', '')), byterange))
+        self._map_index = len(sections) - 1
+    
+    def _on_byterange(self, value: str):
+        self._pending_byterange = _parse_byterange(value)
+    
+    def _on_discontinuity(self, value: str):
+        self._discontinuity = True
+    
+    def _on_version(self, value: str):
+        self.playlist.version = int(value)
+    
+    def _on_target_duration(self, value: str):
+        self.playlist.target_duration = float(value)
+    
+    def _on_media_sequence(self, value: str):
+        self.playlist.media_sequence = int(value)
+        self.playlist.segments.first_sequence = int(value)
+    
+    def _on_discontinuity_sequence(self, value: str):
+        self.playlist.discontinuity_sequence = int(value)
+    
+    def _on_playlist_type(self, value: str):
+        self.playlist.playlist_type = value
+    
+    def _on_endlist(self, value: str):
+        self.playlist.endlist = True
+    
+    def _on_independent_segments(self, value: str):
+        self.playlist.independent_segments = True
+    
+    _TAGS = {
+        '#EXT-X-STREAM-INF': _on_stream_inf,
+        '#EXT-X-MEDIA': _on_media,
+        '#EXT-X-KEY': _on_key,
+        '#EXT-X-MAP': _on_map,
+        '#EXT-X-BYTERANGE': _on_byterange,
+        '#EXT-X-DISCONTINUITY': _on_discontinuity,
+        '#EXT-X-VERSION': _on_version,
+        '#EXT-X-TARGETDURATION': _on_target_duration,
+        '#EXT-X-MEDIA-SEQUENCE': _on_media_sequence,
+        '#EXT-X-DISCONTINUITY-SEQUENCE': _on_discontinuity_sequence,
+        '#EXT-X-PLAYLIST-TYPE': _on_playlist_type,
+        '#EXT-X-ENDLIST': _on_endlist,
+        '#EXT-X-INDEPENDENT-SEGMENTS': _on_independent_segments,
+    }
+
+def parse_m3u8(data, base_url: Optional[str] = None) -> Playlist:
+    """
+    Parse playlist đã có sẵn trong bộ nhớ
+    
+    Args:
+        data: bytes, str hoặc iterable các chunk bytes
+        base_url: URL của playlist
+    
+    Returns:
+        Playlist
+    """
+    parser = M3U8Parser(base_url)
+    if isinstance(data, str):
+        parser.feed_lines(data.splitlines())
+    elif isinstance(data, (bytes, bytearray)):
+        parser.feed(bytes(data))
+    else:
+        for chunk in data:
+            parser.feed(chunk)
+    return parser.close()
+
+async def parse_m3u8_stream(chunks: AsyncIterable[bytes], base_url: Optional[str] = None) -> Playlist:
+    """
+    Parse playlist trong khi đang tải (vd: `response.content.iter_chunked(65536)`)
+    
+    Args:
+        chunks: Async iterable các chunk bytes
+        base_url: URL của playlist
+    
+    Returns:
+        Playlist
+    """
+    parser = M3U8Parser(base_url)
+    async for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
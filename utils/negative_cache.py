@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache kết quả thất bại (không có link, 404, bị chặn, domain không hỗ trợ)
+để yêu cầu lặp lại được trả lời ngay mà không scrape lại
+"""
+
+import time
+from typing import Dict, NamedTuple, Optional
+from config import Config
+from utils.ttl_cache import TTLCache
+
+REASON_NO_STREAMS = 'no_streams'
+REASON_NOT_FOUND = 'not_found'
+REASON_BLOCKED = 'blocked'
+REASON_UNSUPPORTED = 'unsupported'
+REASONS = (REASON_NO_STREAMS, REASON_NOT_FOUND, REASON_BLOCKED, REASON_UNSUPPORTED)
+
+class NegativeEntry(NamedTuple):
+    """Lý do thất bại và thời điểm hết hạn (monotonic)"""
+    reason: str
+    expires_at: float
+    
+    @property
+    def retry_in(self) -> float:
+        """Số giây tới khi được thử lại"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+class NegativeCache:
+    """
+    TTLCache các lần thất bại, TTL theo lý do
+    
+    Khoá là URL trang đã chuẩn hoá (hoặc domain với lý do unsupported).
+    Trang bị chặn chỉ nhớ ngắn vì host có thể mở lại; 404 và domain không
+    hỗ trợ nhớ lâu hơn.
+    """
+    
+    def __init__(self, capacity: int = None, ttls: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            capacity: Số mục tối đa
+            ttls: TTL (giây) theo lý do, mặc định lấy từ Config
+        """
+        self.ttls = {
+            REASON_NO_STREAMS: Config.NEGATIVE_TTL_NO_STREAMS,
+            REASON_NOT_FOUND: Config.NEGATIVE_TTL_NOT_FOUND,
+            REASON_BLOCKED: Config.NEGATIVE_TTL_BLOCKED,
+            REASON_UNSUPPORTED: Config.NEGATIVE_TTL_UNSUPPORTED,
+            **(ttls or {}),
+        }
+        self._cache = TTLCache(
+            capacity if capacity is not None else Config.NEGATIVE_CACHE_SIZE,
+            self.ttls[REASON_NO_STREAMS]
+        )
+        self._stored = dict.fromkeys(REASONS, 0)
+        self.purged = 0
+    
+    def get(self, key: str) -> Optional[NegativeEntry]:
+        """Lần thất bại còn hạn của khoá (None nếu không có)"""
+        return self._cache.get(key)
+    
+    def add(self, key: str, reason: str, ttl: float = None):
+        """
+        Ghi một lần thất bại
+        
+        Args:
+            key: URL đã chuẩn hoá hoặc domain
+            reason: Một trong REASONS
+            ttl: TTL riêng (mặc định theo lý do); <= 0 thì không ghi
+        """
+        ttl = ttl if ttl is not None else self.ttls[reason]
+        if ttl <= 0:
+            return
+        self._cache.set(key, NegativeEntry(reason, time.monotonic() + ttl), ttl)
+        self._stored[reason] += 1
+    
+    def purge(self, pattern: str = '') -> int:
+        """
+        Xoá các mục có khoá chứa `pattern` (rỗng = xoá hết)
+        
+        Returns:
+            Số mục đã xoá
+        """
+        if not pattern:
+            count = len(self._cache)
+            self._cache.clear()
+        else:
+            keys = [key for key in self._cache.keys() if pattern in key]
+            for key in keys:
+                self._cache.pop(key)
+            count = len(keys)
+        self.purged += count
+        return count
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm hit/miss/size của cache, số lần ghi theo lý do và số mục đã xoá
+        """
+        return {
+            **self._cache.stats(),
+            **{f'stored_{reason}': count for reason, count in self._stored.items()},
+            'purged': self.purged,
+        }
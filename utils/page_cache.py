@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP cache cho trang gốc: body nén trên đĩa (SQLite) kèm ETag/Last-Modified
+để tải lại có điều kiện, và kết quả trích xuất gần nhất theo hash nội dung
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Mapping, Optional
+from config import Config
+from utils.html_reader import HtmlBody
+
+def content_hash(body: bytes) -> str:
+    """Hash nội dung trang (so sánh hai lần tải có giống hệt nhau không)"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def _guarded(method):
+    """Lỗi đĩa/SQLite chỉ làm mất cache (trả None) chứ không làm hỏng lượt tải"""
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        try:
+            return method(self, *args)
+        except (sqlite3.Error, OSError, zlib.error) as e:
+            self.logger.warning(f"Lỗi page cache: {e}")
+            return None
+    return wrapper
+
+class CachedPage:
+    """Một trang trong cache (body giải nén khi cần)"""
+    
+    __slots__ = ('url', 'etag', 'last_modified', 'encoding', 'hash', 'validated_at', '_compressed', '_body')
+    
+    def __init__(self, url: str, etag: Optional[str], last_modified: Optional[str], encoding: str,
+                 hash: str, validated_at: float, compressed: bytes):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.encoding = encoding
+        self.hash = hash
+        self.validated_at = validated_at
+        self._compressed = compressed
+        self._body: Optional[bytes] = None
+    
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = zlib.decompress(self._compressed)
+        return self._body
+    
+    @property
+    def text(self) -> str:
+        try:
+            return self.body.decode(self.encoding, errors='replace')
+        except LookupError:
+            return self.body.decode('utf-8', errors='replace')
+    
+    def html_body(self) -> HtmlBody:
+        """Dùng như body vừa tải"""
+        return HtmlBody(self.body, self.text, self.encoding)
+    
+    def conditional_headers(self) -> Dict[str, str]:
+        """Header để hỏi origin trang có đổi không (rỗng nếu trang không có validator)"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+class PageCache:
+    """
+    Cache trang HTML theo URL, giới hạn theo tổng số bytes đã nén
+    
+    - Trang vừa tải/xác nhận trong `fresh_for` giây được dùng lại luôn mà không
+      gửi request (các bước của cùng một lượt trích xuất không tải lại trang).
+    - Sau đó tải lại có điều kiện (If-None-Match/If-Modified-Since); 304 được
+      tính là hit và dùng body trong cache.
+    - Lưu kèm link trích xuất được từ trang theo hash nội dung, để lượt sau bỏ
+      qua trích xuất khi trang giống hệt.
+    
+    Mọi thao tác có bản sync (cho thread của executor) và bản async chạy
+    SQLite trong thread pool.
+    """
+    
+    def __init__(self, path: str = None, max_bytes: int = None, fresh_for: float = None):
+        """
+        Args:
+            path: File SQLite (rỗng = tắt cache)
+            max_bytes: Tổng số bytes body (đã nén) tối đa
+            fresh_for: Thời gian dùng lại trang mà không hỏi origin (giây)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path if path is not None else Config.PAGE_CACHE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else Config.PAGE_CACHE_MAX_BYTES
+        self.fresh_for = fresh_for if fresh_for is not None else Config.PAGE_CACHE_FRESH
+        
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._bytes = 0
+        self._counters = {
+            'fresh_hits': 0,
+            'revalidated': 0,
+            'refetched': 0,
+            'changed': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'extractions_skipped': 0,
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+    
+    def is_fresh(self, page: CachedPage) -> bool:
+        """True nếu trang vừa được tải/xác nhận, dùng được mà không cần request"""
+        return time.time() - page.validated_at < self.fresh_for
+    
+    # Các thao tác sync (gọi từ thread của executor hoặc qua _run_db)
+    
+    @_guarded
+    def lookup(self, url: str) -> Optional[CachedPage]:
+        """Trang trong cache (None nếu chưa có); trang còn fresh được tính là hit"""
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT etag, last_modified, encoding, hash, validated_at, body FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if row is None:
+            self._counters['misses'] += 1
+            return None
+        page = CachedPage(url, *row)
+        if self.is_fresh(page):
+            self._counters['fresh_hits'] += 1
+            self._touch(url)
+        return page
+    
+    @_guarded
+    def revalidated(self, page: CachedPage, headers: Mapping[str, str]) -> CachedPage:
+        """
+        Origin trả 304: trang không đổi
+        
+        Args:
+            page: Trang trong cache
+            headers: Header của response 304 (có thể mang validator mới)
+        
+        Returns:
+            Chính trang đó (đã cập nhật validator)
+        """
+        self._counters['revalidated'] += 1
+        page.etag = headers.get('ETag') or page.etag
+        page.last_modified = headers.get('Last-Modified') or page.last_modified
+        page.validated_at = time.time()
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "UPDATE pages SET etag = ?, last_modified = ?, validated_at = ?, used_at = ? WHERE url = ?",
+                (page.etag, page.last_modified, page.validated_at, page.validated_at, page.url)
+            )
+            db.commit()
+        return page
+    
+    @_guarded
+    def store(self, url: str, body: bytes, encoding: str, headers: Mapping[str, str],
+              previous: Optional[CachedPage] = None) -> Optional[str]:
+        """
+        Lưu trang vừa tải đầy đủ (HTTP 200)
+        
+        Args:
+            url: URL trang
+            body: Toàn bộ body (không lưu phần đã bị cắt)
+            encoding: Encoding của body
+            headers: Header của response
+            previous: Bản cũ trong cache (để đếm số lần trang thay đổi)
+        
+        Returns:
+            Hash nội dung, None nếu trang không được phép cache
+        """
+        if 'no-store' in headers.get('Cache-Control', '').lower():
+            return None
+        digest = content_hash(body)
+        if previous is not None:
+            # Trang cũ không có validator hoặc origin không hỗ trợ 304
+            self._counters['refetched'] += 1
+            self._counters['changed'] += previous.hash != digest
+        compressed = zlib.compress(body, 6)
+        if len(compressed) > self.max_bytes:
+            return digest
+        
+        now = time.time()
+        with self._db_lock:
+            db = self._connect()
+            old = db.execute("SELECT length(body) FROM pages WHERE url = ?", (url,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, encoding, hash, validated_at, used_at, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, headers.get('ETag'), headers.get('Last-Modified'), encoding, digest, now, now, compressed)
+            )
+            self._bytes += len(compressed) - (old[0] if old else 0)
+            self._evict(db)
+            db.commit()
+        self._counters['stores'] += 1
+        return digest
+    
+    @_guarded
+    def links_for(self, url: str, digest: str) -> Optional[List[Dict[str, str]]]:
+        """Link đã trích xuất từ đúng nội dung này của trang (None nếu chưa có hoặc trang đã đổi)"""
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT links FROM extractions WHERE url = ? AND hash = ?", (url, digest)
+            ).fetchone()
+        if row is None:
+            return None
+        self._counters['extractions_skipped'] += 1
+        return json.loads(row[0])
+    
+    @_guarded
+    def remember_links(self, url: str, digest: str, links: List[Dict[str, str]]):
+        """Ghi link trích xuất được từ nội dung có hash `digest`"""
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO extractions (url, hash, links, stored_at) VALUES (?, ?, ?, ?)",
+                (url, digest, json.dumps(links, ensure_ascii=False), time.time())
+            )
+            db.commit()
+    
+    # Bản async cho event loop
+    
+    async def get(self, url: str) -> Optional[CachedPage]:
+        return await self._run_db(self.lookup, url)
+    
+    async def mark_revalidated(self, page: CachedPage, headers: Mapping[str, str]) -> CachedPage:
+        await self._run_db(self.revalidated, page, headers)
+        return page
+    
+    async def put(self, url: str, body: bytes, encoding: str, headers: Mapping[str, str],
+                  previous: Optional[CachedPage] = None) -> Optional[str]:
+        return await self._run_db(self.store, url, body, encoding, headers, previous)
+    
+    async def get_links(self, url: str, digest: str) -> Optional[List[Dict[str, str]]]:
+        return await self._run_db(self.links_for, url, digest)
+    
+    async def put_links(self, url: str, digest: str, links: List[Dict[str, str]]):
+        await self._run_db(self.remember_links, url, digest, links)
+    
+    async def _run_db(self, func, *args):
+        """Chạy thao tác SQLite trong thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    
+    def _touch(self, url: str):
+        """Cập nhật thời điểm dùng gần nhất (thứ tự bỏ khi đầy)"""
+        with self._db_lock:
+            db = self._connect()
+            db.execute("UPDATE pages SET used_at = ? WHERE url = ?", (time.time(), url))
+            db.commit()
+    
+    def _evict(self, db: sqlite3.Connection):
+        """Bỏ các trang lâu không dùng nhất cho tới khi tổng dung lượng dưới giới hạn"""
+        while self._bytes > self.max_bytes:
+            rows = db.execute("SELECT url, length(body) FROM pages ORDER BY used_at LIMIT 32").fetchall()
+            if not rows:
+                self._bytes = 0
+                return
+            for url, size in rows:
+                db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                db.execute("DELETE FROM extractions WHERE url = ?", (url,))
+                self._bytes -= size
+                self._counters['evictions'] += 1
+                if self._bytes <= self.max_bytes:
+                    return
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Mở (một lần) file SQLite, gọi khi đang giữ _db_lock"""
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, encoding TEXT NOT NULL, "
+                "hash TEXT NOT NULL, validated_at REAL NOT NULL, used_at REAL NOT NULL, body BLOB NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS extractions ("
+                "url TEXT PRIMARY KEY, hash TEXT NOT NULL, links TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            db.commit()
+            self._bytes = db.execute("SELECT COALESCE(SUM(length(body)), 0) FROM pages").fetchone()[0]
+            self._db = db
+        return self._db
+    
+    def close(self):
+        """Đóng file SQLite"""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm hit (fresh + 304), số lần tải lại toàn bộ/trang đổi, miss,
+            số lần bỏ qua trích xuất và dung lượng đang dùng
+        """
+        hits = self._counters['fresh_hits'] + self._counters['revalidated']
+        lookups = hits + self._counters['refetched'] + self._counters['misses']
+        return {
+            'hits': hits,
+            **self._counters,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+        }
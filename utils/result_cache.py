@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache kết quả trích xuất: LRU trong bộ nhớ + SQLite trên đĩa (còn sau khi restart)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+from config import Config
+
+# Query params chứa thời điểm hết hạn (unix timestamp) trên URL của CDN
+EXPIRY_PARAMS = ('expires', 'expire', 'exp', 'e')
+
+# Trừ hao để không trả về link sắp hết hạn (giây)
+EXPIRY_MARGIN = 30
+
+def link_expiry(url: str) -> Optional[float]:
+    """
+    Đọc thời điểm hết hạn từ query của link (vd: ?expires=1700000000, ?e=...)
+    
+    Args:
+        url: Link stream
+    
+    Returns:
+        Unix timestamp (giây) hoặc None nếu link không ghi hạn
+    """
+    try:
+        query = parse_qsl(urlparse(url).query)
+    except ValueError:
+        return None
+    
+    for key, value in query:
+        if key.lower() in EXPIRY_PARAMS and value.isdigit():
+            timestamp = int(value)
+            if timestamp > 10 ** 12:
+                # Một số CDN dùng mili giây
+                timestamp //= 1000
+            # Giá trị nhỏ là bộ đếm/độ dài chứ không phải timestamp
+            if timestamp > 10 ** 9:
+                return float(timestamp)
+    return None
+
+class ResultCache:
+    """
+    Cache link stream theo URL trang đã chuẩn hoá
+    
+    Tầng nóng là LRU trong bộ nhớ; mọi kết quả cũng được ghi vào SQLite để
+    dùng lại sau khi bot khởi động lại. TTL của một kết quả lấy theo link
+    hết hạn sớm nhất (query `expires=`/`e=`), nếu không có thì dùng mặc định.
+    Thao tác SQLite chạy trong thread pool để không chặn event loop.
+    """
+    
+    def __init__(self, path: str = None, capacity: int = None, default_ttl: float = None,
+                 min_ttl: float = None, max_ttl: float = None):
+        """
+        Khởi tạo cache
+        
+        Args:
+            path: File SQLite (rỗng = chỉ cache trong bộ nhớ)
+            capacity: Số trang tối đa trong bộ nhớ
+            default_ttl: TTL khi link không ghi hạn (giây)
+            min_ttl: Kết quả sống ngắn hơn mức này thì không cache (giây)
+            max_ttl: TTL tối đa (giây)
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path if path is not None else Config.RESULT_CACHE_PATH
+        self.capacity = capacity if capacity is not None else Config.RESULT_CACHE_SIZE
+        self.default_ttl = default_ttl if default_ttl is not None else Config.RESULT_CACHE_TTL
+        self.min_ttl = min_ttl if min_ttl is not None else Config.RESULT_CACHE_MIN_TTL
+        self.max_ttl = max_ttl if max_ttl is not None else Config.RESULT_CACHE_MAX_TTL
+        
+        self._memory: 'OrderedDict[str, Tuple[float, List[Dict[str, str]]]]' = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        
+        self._counters = {
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'stores': 0,
+        }
+    
+    def ttl_for(self, links: List[Dict[str, str]], now: float = None) -> float:
+        """
+        Tính TTL cho một danh sách link
+        
+        Args:
+            links: Các link stream
+            now: Thời điểm hiện tại (mặc định time.time())
+        
+        Returns:
+            TTL (giây); <= 0 nghĩa là không nên cache
+        """
+        now = now if now is not None else time.time()
+        expiries = [expiry for expiry in (link_expiry(link.get('url', '')) for link in links) if expiry]
+        if not expiries:
+            return self.default_ttl
+        
+        ttl = min(min(expiries) - now - EXPIRY_MARGIN, self.max_ttl)
+        return ttl if ttl >= self.min_ttl else 0
+    
+    async def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """
+        Lấy kết quả còn hạn
+        
+        Args:
+            key: URL trang đã chuẩn hoá
+        
+        Returns:
+            Danh sách link hoặc None nếu miss/hết hạn
+        """
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, links = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self._counters['hits'] += 1
+                self._counters['memory_hits'] += 1
+                return links
+            del self._memory[key]
+            self._counters['expired'] += 1
+        
+        if self.path:
+            row = await self._run_db(self._db_get, key)
+            if row is not None:
+                expires_at, links = row
+                if expires_at > now:
+                    self._remember(key, expires_at, links)
+                    self._counters['hits'] += 1
+                    self._counters['disk_hits'] += 1
+                    return links
+                self._counters['expired'] += 1
+        
+        self._counters['misses'] += 1
+        return None
+    
+    async def set(self, key: str, links: List[Dict[str, str]]) -> bool:
+        """
+        Lưu kết quả (bỏ qua nếu rỗng hoặc link sắp hết hạn)
+        
+        Args:
+            key: URL trang đã chuẩn hoá
+            links: Các link stream
+        
+        Returns:
+            True nếu đã lưu
+        """
+        if not links:
+            return False
+        
+        now = time.time()
+        ttl = self.ttl_for(links, now)
+        if ttl <= 0:
+            self.logger.debug(f"Không cache {key}: link sắp hết hạn")
+            return False
+        
+        expires_at = now + ttl
+        self._remember(key, expires_at, links)
+        self._counters['stores'] += 1
+        
+        if self.path:
+            await self._run_db(self._db_set, key, expires_at, links)
+        return True
+    
+    def _remember(self, key: str, expires_at: float, links: List[Dict[str, str]]):
+        """Đưa vào LRU bộ nhớ, đẩy ra mục cũ nhất nếu đầy"""
+        self._memory[key] = (expires_at, links)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+            self._counters['evictions'] += 1
+    
+    async def _run_db(self, func, *args):
+        """Chạy thao tác SQLite trong thread pool, lỗi đĩa không làm hỏng lượt xử lý"""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+        except (sqlite3.Error, OSError) as e:
+            self.logger.warning(f"Lỗi SQLite cache: {e}")
+            return None
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Mở (một lần) file SQLite và dọn các mục đã hết hạn"""
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, links TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            db.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+            self._db = db
+        return self._db
+    
+    def _db_get(self, key: str) -> Optional[Tuple[float, List[Dict[str, str]]]]:
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT expires_at, links FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+    
+    def _db_set(self, key: str, expires_at: float, links: List[Dict[str, str]]):
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO results (key, links, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(links, ensure_ascii=False), expires_at)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                db.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+    
+    def close(self):
+        """Đóng file SQLite"""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê cache
+        
+        Returns:
+            Dict gồm hit/miss/eviction, kích thước và tỉ lệ hit
+        """
+        lookups = self._counters['hits'] + self._counters['misses']
+        return {
+            **self._counters,
+            'size': len(self._memory),
+            'capacity': self.capacity,
+            'hit_rate': round(self._counters['hits'] / lookups, 3) if lookups else 0.0,
+        }
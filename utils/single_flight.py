@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single-flight: gộp các lời gọi đồng thời cùng khoá vào một lần thực thi
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar('T')
+
+class _Flight:
+    """Một lần thực thi đang chạy và số caller đang chờ nó"""
+    
+    __slots__ = ('task', 'waiters')
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Gộp các lời gọi đồng thời cùng khoá
+    
+    Caller đầu tiên khởi chạy `func()` trong một task riêng; các caller đến
+    sau khi task chưa xong chỉ chờ cùng kết quả (hoặc cùng exception). Một
+    caller bị huỷ không làm hỏng những caller khác; task chỉ bị huỷ khi
+    không còn ai chờ.
+    """
+    
+    def __init__(self, name: str = 'single-flight'):
+        """
+        Args:
+            name: Tên dùng trong log
+        """
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+    
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Chạy `func()` hoặc chờ lần chạy đang diễn ra cho cùng khoá
+        
+        Args:
+            key: Khoá gộp (vd: URL đã chuẩn hoá)
+            func: Coroutine function không tham số
+        
+        Returns:
+            Kết quả của func
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+            self.logger.debug(f"[{self.name}] Gộp request cho {key} ({flight.waiters} đang chờ)")
+        
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Không còn ai chờ kết quả
+                self._forget(key, flight)
+                flight.task.cancel()
+    
+    def __contains__(self, key: Hashable) -> bool:
+        """True nếu đang có lần thực thi cho khoá"""
+        return key in self._flights
+    
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm số lần thực thi, số request được gộp và số khoá đang chạy
+        """
+        total = self.leaders + self.coalesced
+        return {
+            'executions': self.leaders,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._flights),
+            'coalesce_rate': round(self.coalesced / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache LRU trong bộ nhớ với TTL cho từng mục
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+_MISSING = object()
+
+class TTLCache:
+    """LRU có giới hạn số mục, mỗi mục có thời hạn riêng"""
+    
+    def __init__(self, capacity: int, default_ttl: float):
+        """
+        Args:
+            capacity: Số mục tối đa
+            default_ttl: TTL mặc định (giây)
+        """
+        self.capacity = capacity
+        self.default_ttl = default_ttl
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Lấy giá trị còn hạn
+        
+        Args:
+            key: Khoá
+            default: Giá trị trả về khi miss
+        
+        Returns:
+            Giá trị đã lưu hoặc default
+        """
+        entry = self._entries.get(key, _MISSING)
+        if entry is not _MISSING:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return default
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Lưu giá trị
+        
+        Args:
+            key: Khoá
+            value: Giá trị
+            ttl: Thời hạn (giây), mặc định default_ttl
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Xoá và trả về giá trị (không tính hit/miss)"""
+        entry = self._entries.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+    
+    def keys(self) -> List[Hashable]:
+        """Các khoá đang lưu (kể cả mục đã hết hạn nhưng chưa bị dọn)"""
+        return list(self._entries)
+    
+    def clear(self):
+        """Xoá tất cả"""
+        self._entries.clear()
+    
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Thống kê
+        
+        Returns:
+            Dict gồm hits, misses, evictions, size và tỉ lệ hit
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
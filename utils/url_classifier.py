@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Phân loại URL video: extension, host, chất lượng, nguồn và loại stream
+
+Classifier được dựng một lần từ Config (trie hậu tố domain + regex compile
+sẵn cho extension/chất lượng), phân loại một URL trong một lượt và nhớ các
+kết quả gần đây. Classifier dùng chung không tự theo dõi Config: sau khi đổi
+Config.VIDEO_FORMATS / VIDEO_HOSTS / SOURCE_NAMES lúc đang chạy phải gọi
+`reset_classifier()` để lần phân loại sau dựng lại (kể cả bộ nhớ kết quả).
+"""
+
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+from config import Config
+
+# Nhãn chất lượng theo thứ tự ưu tiên, kèm các token nhận diện trong URL
+QUALITY_TOKENS = (
+    ('4K', ('2160p', '4k', 'uhd')),
+    ('1080p', ('1080p', 'fhd', 'fullhd')),
+    ('720p', ('720p', 'hd')),
+    ('480p', ('480p', 'sd')),
+    ('360p', ('360p',)),
+    ('240p', ('240p',)),
+)
+
+UNKNOWN_QUALITY = 'Unknown'
+
+# Thứ tự sắp xếp theo chất lượng (dùng chung cho mọi scraper)
+QUALITY_ORDER = {label: rank for rank, (label, _) in enumerate(QUALITY_TOKENS)}
+QUALITY_ORDER[UNKNOWN_QUALITY] = len(QUALITY_TOKENS)
+
+# Chiều cao khung hình tối thiểu cho từng nhãn chất lượng
+QUALITY_HEIGHTS = (
+    (2160, '4K'),
+    (1080, '1080p'),
+    (720, '720p'),
+    (480, '480p'),
+    (360, '360p'),
+    (0, '240p'),
+)
+
+# Extension -> loại stream
+STREAM_TYPES = {'.m3u8': 'HLS', '.mp4': 'MP4', '.mkv': 'MKV'}
+
+def quality_for_height(height: Optional[int]) -> str:
+    """
+    Nhãn chất lượng theo chiều cao thật của video (vd: RESOLUTION trong master playlist)
+    
+    Args:
+        height: Chiều cao (pixel)
+    
+    Returns:
+        Nhãn chất lượng ('Unknown' nếu không có)
+    """
+    if not height:
+        return UNKNOWN_QUALITY
+    for min_height, label in QUALITY_HEIGHTS:
+        if height >= min_height:
+            return label
+    return UNKNOWN_QUALITY
+
+def stream_sort_key(link: Dict[str, object]) -> Tuple[int, int]:
+    """
+    Khoá sắp xếp link: chất lượng trước, cùng chất lượng thì bandwidth cao hơn trước
+    
+    Args:
+        link: Dict thông tin stream (có thể có 'bandwidth' từ master playlist)
+    
+    Returns:
+        Tuple dùng làm key cho sorted()
+    """
+    rank = QUALITY_ORDER.get(link.get('quality'), QUALITY_ORDER[UNKNOWN_QUALITY])
+    return rank, -int(link.get('bandwidth') or 0)
+
+class UrlInfo(NamedTuple):
+    """Kết quả phân loại một URL"""
+    is_video: bool
+    extension: Optional[str]
+    file_extension: Optional[str]
+    host: Optional[str]
+    source: Optional[str]
+    quality: str
+    type: str
+
+class DomainTrie:
+    """Trie theo nhãn domain đảo ngược để tìm host khớp hậu tố"""
+
+    def __init__(self, domains: Iterable[str]):
+        self._root: Dict[str, dict] = {}
+        for domain in domains:
+            node = self._root
+            for label in reversed(domain.lower().strip('.').split('.')):
+                node = node.setdefault(label, {})
+            node[''] = domain.lower()
+
+    def lookup(self, hostname: str) -> Optional[str]:
+        """
+        Tìm domain đã đăng ký dài nhất là hậu tố của hostname
+
+        Args:
+            hostname: Hostname (vd: www.streamtape.com)
+
+        Returns:
+            Domain khớp (vd: streamtape.com) hoặc None
+        """
+        node = self._root
+        match = None
+        for label in reversed(hostname.split('.')):
+            node = node.get(label)
+            if node is None:
+                break
+            match = node.get('', match)
+        return match
+
+class UrlClassifier:
+    """Classifier dựng sẵn từ danh sách extension, host và tên nguồn"""
+
+    def __init__(self, video_formats: Iterable[str], video_hosts: Iterable[str],
+                 source_names: Dict[str, str], cache_size: int = 4096):
+        """
+        Args:
+            video_formats: Các extension video (vd: '.mp4')
+            video_hosts: Các domain hosting video
+            source_names: Domain -> tên nguồn hiển thị
+            cache_size: Số kết quả gần đây được nhớ
+        """
+        formats = sorted({fmt.lower().lstrip('.') for fmt in video_formats}, key=len, reverse=True)
+        self._extension_re = re.compile(
+            r'\.(' + '|'.join(map(re.escape, formats)) + r')(?![a-z0-9])'
+        )
+        self._file_extensions = {f'.{fmt}' for fmt in formats}
+
+        self.video_hosts = frozenset(host.lower() for host in video_hosts)
+        self.source_names = {host.lower(): name for host, name in source_names.items()}
+        self._trie = DomainTrie(self.video_hosts | set(self.source_names))
+
+        quality_by_token = {}
+        for label, tokens in QUALITY_TOKENS:
+            for token in tokens:
+                quality_by_token[token] = label
+        self._quality_by_token = quality_by_token
+        self._quality_re = re.compile(
+            r'(?<![a-z0-9])(' + '|'.join(sorted(quality_by_token, key=len, reverse=True)) + r')(?![a-z0-9])'
+        )
+
+        self._cache: 'OrderedDict[str, UrlInfo]' = OrderedDict()
+        self._cache_size = cache_size
+
+    def classify(self, url: str) -> UrlInfo:
+        """
+        Phân loại URL (kết quả gần đây được nhớ)
+
+        Args:
+            url: URL cần phân loại
+
+        Returns:
+            UrlInfo
+        """
+        info = self._cache.get(url)
+        if info is not None:
+            self._cache.move_to_end(url)
+            return info
+
+        info = self._classify(url or '')
+        self._cache[url] = info
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return info
+
+    def _classify(self, url: str) -> UrlInfo:
+        url_lower = url.lower()
+
+        extension_match = self._extension_re.search(url_lower)
+        extension = f'.{extension_match.group(1)}' if extension_match else None
+
+        try:
+            parts = urlsplit(url_lower)
+            hostname = parts.hostname or ''
+            path = parts.path
+        except ValueError:
+            hostname, path = '', ''
+
+        file_extension = None
+        dot = path.rfind('.')
+        if dot != -1 and path[dot:] in self._file_extensions:
+            file_extension = path[dot:]
+
+        matched = self._trie.lookup(hostname) if hostname else None
+        host = matched if matched in self.video_hosts else None
+        source = self.source_names.get(matched) if matched else None
+
+        quality = UNKNOWN_QUALITY
+        best_rank = QUALITY_ORDER[UNKNOWN_QUALITY]
+        for token in self._quality_re.findall(url_lower):
+            label = self._quality_by_token[token]
+            if QUALITY_ORDER[label] < best_rank:
+                quality, best_rank = label, QUALITY_ORDER[label]
+
+        return UrlInfo(
+            is_video=extension is not None or host is not None,
+            extension=extension,
+            file_extension=file_extension,
+            host=host,
+            source=source,
+            quality=quality,
+            type=STREAM_TYPES.get(extension, 'Stream'),
+        )
+
+_classifier: Optional[UrlClassifier] = None
+
+def get_classifier() -> UrlClassifier:
+    """
+    Lấy classifier dùng chung (dựng một lần từ Config cho cả process)
+
+    Returns:
+        UrlClassifier
+    """
+    global _classifier
+
+    if _classifier is None:
+        _classifier = UrlClassifier(Config.VIDEO_FORMATS, Config.VIDEO_HOSTS, Config.SOURCE_NAMES)
+    return _classifier
+
+def reset_classifier():
+    """Bỏ classifier dùng chung để lần gọi sau dựng lại (sau khi đổi danh sách trong Config)"""
+    global _classifier
+
+    _classifier = None
+
+def classify_url(url: str) -> UrlInfo:
+    """Phân loại URL bằng classifier dùng chung"""
+    return get_classifier().classify(url)
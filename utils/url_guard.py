@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chặn request tới địa chỉ nội bộ (loopback, mạng riêng, link-local, metadata
+cloud) cho các URL do người dùng hoặc playlist bên ngoài quyết định
+"""
+
+import ipaddress
+import socket
+from typing import List, Optional
+from urllib.parse import urlparse
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+
+class BlockedAddressError(OSError):
+    """URL trỏ tới địa chỉ không công khai"""
+
+def is_public_ip(address: str) -> bool:
+    """
+    Địa chỉ IP có định tuyến công khai được không
+    
+    Args:
+        address: IPv4/IPv6 dạng chuỗi
+    
+    Returns:
+        False với loopback, mạng riêng, link-local, CGNAT, multicast, địa chỉ
+        dành riêng và IPv4-mapped của chúng (hoặc chuỗi không phải IP)
+    """
+    try:
+        ip = ipaddress.ip_address(address.split('%', 1)[0])
+    except ValueError:
+        return False
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+def _ip_literal(host: str) -> Optional[str]:
+    """Host nếu nó là IP viết trực tiếp (None nếu là tên miền)"""
+    try:
+        ipaddress.ip_address(host.split('%', 1)[0])
+    except ValueError:
+        return None
+    return host
+
+def check_public_url(url: str):
+    """
+    Kiểm tra nhanh URL trước khi gửi (không phân giải DNS: tên miền được
+    PublicResolver kiểm tra lúc kết nối)
+    
+    Raises:
+        BlockedAddressError: Scheme không phải http(s), thiếu host hoặc host là
+                             IP không công khai
+    """
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    if parsed.scheme not in ('http', 'https') or not host:
+        raise BlockedAddressError(f"URL không được phép: {url}")
+    if _ip_literal(host) and not is_public_ip(host):
+        raise BlockedAddressError(f"Địa chỉ không công khai: {host}")
+
+class PublicResolver(AbstractResolver):
+    """
+    Resolver chỉ trả địa chỉ công khai
+    
+    Kiểm tra ngay lúc kết nối (cả sau redirect) nên tên miền đổi bản ghi DNS
+    giữa lần kiểm tra và lần kết nối cũng không lọt qua. Tên miền có bất kỳ
+    bản ghi nào không công khai thì bị từ chối cả.
+    """
+    
+    def __init__(self, resolver: Optional[AbstractResolver] = None):
+        self._resolver = resolver or DefaultResolver()
+    
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[dict]:
+        addresses = await self._resolver.resolve(host, port, family)
+        for address in addresses:
+            if not is_public_ip(address['host']):
+                raise BlockedAddressError(f"{host} trỏ tới địa chỉ không công khai {address['host']}")
+        return addresses
+    
+    async def close(self):
+        await self._resolver.close()
+
+def public_trace_config() -> aiohttp.TraceConfig:
+    """
+    Trace kiểm tra URL của mọi request (kể cả từng bước redirect) bằng
+    `check_public_url`; IP viết trực tiếp không đi qua resolver nên phải
+    chặn ở đây
+    """
+    async def on_request_start(session, trace_config_ctx, params):
+        check_public_url(str(params.url))
+    
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    return trace_config
+
+def public_connector(**kwargs) -> aiohttp.TCPConnector:
+    """TCPConnector chỉ kết nối tới địa chỉ công khai"""
+    return aiohttp.TCPConnector(resolver=PublicResolver(), **kwargs)
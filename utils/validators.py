@@ -6,12 +6,20 @@ Validators cho URL và các input khác
 
 import re
 import logging
-from urllib.parse import urlparse
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 from typing import List
 from config import Config
+from utils.url_classifier import classify_url
 
 logger = logging.getLogger(__name__)
 
+# Các pattern gợi ý URL streaming
+STREAMING_PATTERNS = ('/hls/', '/dash/', 'stream', 'play')
+
+# Query params chỉ dùng để tracking, bỏ khi chuẩn hoá URL
+TRACKING_PARAMS = ('fbclid', 'gclid', 'ref')
+TRACKING_PREFIXES = ('utm_',)
+
 def is_valid_url(url: str) -> bool:
     """
     Kiểm tra URL có hợp lệ không
@@ -85,6 +93,24 @@ def is_supported_site(url: str) -> bool:
         logger.error(f"Lỗi khi kiểm tra site support cho {url}: {e}")
         return False
 
+def is_allowed_download_host(url: str) -> bool:
+    """
+    Kiểm tra host của link m3u8 trực tiếp có được phép tải không
+    
+    Args:
+        url: URL playlist
+        
+    Returns:
+        True nếu là trang được hỗ trợ hoặc nằm trong DOWNLOAD_ALLOWED_HOSTS
+        (kể cả subdomain)
+    """
+    domain = extract_domain(url)
+    if not domain or not is_valid_url(url):
+        return False
+    if is_supported_site(url):
+        return True
+    return any(domain == host or domain.endswith('.' + host) for host in Config.DOWNLOAD_ALLOWED_HOSTS)
+
 def extract_domain(url: str) -> str:
     """
     Trích xuất domain từ URL
@@ -109,6 +135,39 @@ def extract_domain(url: str) -> str:
         logger.error(f"Lỗi khi extract domain từ {url}: {e}")
         return ""
 
+def normalize_url(url: str) -> str:
+    """
+    Chuẩn hoá URL trang để làm khoá cache (cùng một trang -> cùng một khoá)
+    
+    Bỏ 'www.', fragment, dấu '/' cuối, các query param tracking (utm_*,
+    fbclid...) và sắp xếp lại các query param còn lại.
+    
+    Args:
+        url: URL cần chuẩn hoá
+        
+    Returns:
+        URL đã chuẩn hoá (URL gốc nếu không parse được)
+    """
+    try:
+        parsed = urlparse(url.strip())
+        
+        domain = parsed.netloc.lower()
+        if domain.startswith('www.'):
+            domain = domain[4:]
+        
+        path = parsed.path.rstrip('/') or '/'
+        
+        query = sorted(
+            (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+            if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+        )
+        
+        return urlunparse((parsed.scheme.lower(), domain, path, '', urlencode(query), ''))
+        
+    except Exception as e:
+        logger.error(f"Lỗi khi chuẩn hoá URL {url}: {e}")
+        return url
+
 def is_video_file_url(url: str) -> bool:
     """
     Kiểm tra URL có phải là file video không
@@ -122,14 +181,8 @@ def is_video_file_url(url: str) -> bool:
     if not url:
         return False
     
-    url_lower = url.lower()
-    
-    # Kiểm tra extension
-    for ext in Config.VIDEO_FORMATS:
-        if url_lower.endswith(ext) or f"{ext}?" in url_lower:
-            return True
-    
-    return False
+    # Kiểm tra extension ở cuối đường dẫn
+    return classify_url(url).file_extension is not None
 
 def is_streaming_url(url: str) -> bool:
     """
@@ -144,29 +197,14 @@ def is_streaming_url(url: str) -> bool:
     if not url:
         return False
     
-    url_lower = url.lower()
-    
-    # Kiểm tra các host streaming
-    for host in Config.VIDEO_HOSTS:
-        if host in url_lower:
-            return True
+    # Kiểm tra các host streaming và HLS
+    info = classify_url(url)
+    if info.host or info.type == 'HLS':
+        return True
     
     # Kiểm tra các pattern streaming
-    streaming_patterns = [
-        '.m3u8',
-        'master.m3u8',
-        'playlist.m3u8',
-        '/hls/',
-        '/dash/',
-        'stream',
-        'play'
-    ]
-    
-    for pattern in streaming_patterns:
-        if pattern in url_lower:
-            return True
-    
-    return False
+    url_lower = url.lower()
+    return any(pattern in url_lower for pattern in STREAMING_PATTERNS)
 
 def validate_telegram_user_id(user_id) -> bool:
     """